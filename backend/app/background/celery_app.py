@@ -0,0 +1,39 @@
+from celery import Celery
+from kombu import Queue
+
+from app.config import settings
+
+celery_app = Celery(
+    "fan_engagement",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["app.background.tasks"],
+)
+
+celery_app.conf.update(
+    # Separate queues so ingestion and scraping get their own worker pools
+    task_queues=(
+        Queue("ingestion", queue_arguments={"x-max-priority": 10}),
+        Queue("scraping", queue_arguments={"x-max-priority": 10}),
+    ),
+    task_routes={
+        "app.background.tasks.ingest_documents": {"queue": "ingestion"},
+        "app.background.tasks.scrape_urls": {"queue": "scraping"},
+    },
+    task_default_priority=5,
+    broker_transport_options={"priority_steps": list(range(10)), "queue_order_strategy": "priority"},
+    # Durability: a job is only acknowledged once it has finished
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_track_started=True,
+    result_extended=True,
+    result_expires=7 * 24 * 60 * 60,
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    # Eager mode runs jobs inline (tests, local development without Redis)
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_eager_propagates=False,
+    task_store_eager_result=True,
+)
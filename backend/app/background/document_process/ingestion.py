@@ -0,0 +1,153 @@
+import asyncio
+import random
+import time
+from itertools import islice
+from typing import AsyncIterator, Callable, Iterable, Iterator, List
+
+import openai
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.config import settings
+from app.services.clients import clients
+
+# Errors worth retrying; anything else fails the ingestion
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+ProgressCallback = Callable[[int, int | None], None]
+
+
+def _batched(chunks: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    iterator = iter(chunks)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+async def _batches_from_thread(chunks: Iterable[Document], batch_size: int) -> AsyncIterator[List[Document]]:
+    """
+    Batches of `chunks`, each pulled in a worker thread.
+
+    Producing chunks means parsing files, writing chunk rows and counting
+    tokens; doing that on the event loop would stall every in-flight batch.
+    """
+    batches = _batched(chunks, batch_size)
+    while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+        yield batch
+
+
+def _retry_after_seconds(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ChunkIngestor:
+    """
+    Embeds document chunks in batches and upserts them into a persona's collection.
+
+    Up to `concurrency` batches are embedded at once; each batch is written to
+    Chroma as soon as its embeddings arrive. Chunks are consumed lazily in a
+    worker thread, so a generator keeps at most `concurrency` batches in memory
+    and never blocks the event loop. Without explicit `embeddings`, each run
+    creates its own embeddings client for the loop it runs on. A rate-limit error
+    on any batch pauses every batch until the backoff (or the server's
+    Retry-After) has elapsed, instead of letting the others keep hammering the API.
+    """
+
+    def __init__(
+        self,
+        persona_name: str,
+        embeddings: Embeddings | None = None,
+        batch_size: int = settings.INGEST_EMBED_BATCH_SIZE,
+        concurrency: int = settings.INGEST_EMBED_CONCURRENCY,
+        max_retries: int = settings.INGEST_EMBED_MAX_RETRIES,
+        on_progress: ProgressCallback | None = None,
+    ):
+        self.persona_name = persona_name
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.on_progress = on_progress
+        self.embedded = 0
+        self.total: int | None = None
+        self._resume_at = 0.0
+
+    async def _embed_with_backoff(self, embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            try:
+                return await embeddings.aembed_documents(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_after_seconds(e) or min(60.0, 2 ** attempt) + random.uniform(0, 1)
+                if isinstance(e, openai.RateLimitError):
+                    # Shared pause: back off every in-flight batch, not just this one
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                print(f"Embedding batch failed ({type(e).__name__}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries}).")
+                await asyncio.sleep(delay)
+
+    async def _process_batch(self, embeddings: Embeddings, collection, batch: List[Document]) -> None:
+        vectors = await self._embed_with_backoff(embeddings, [chunk.page_content for chunk in batch])
+        await asyncio.to_thread(
+            collection.upsert,
+            ids=[chunk.id for chunk in batch],
+            embeddings=vectors,
+            documents=[chunk.page_content for chunk in batch],
+            metadatas=[chunk.metadata or None for chunk in batch],
+        )
+        self.embedded += len(batch)
+        if self.on_progress:
+            self.on_progress(self.embedded, self.total)
+
+    async def run(self, chunks: Iterable[Document], total: int | None = None) -> int:
+        """Embeds and upserts all chunks, returning how many were written."""
+        self.total = total
+        http_client = None
+        embeddings = self.embeddings
+        if embeddings is None:
+            http_client = openai.DefaultAsyncHttpxClient()
+            embeddings = clients.create_embeddings(http_async_client=http_client)
+        collection = await asyncio.to_thread(clients.get_collection, self.persona_name)
+        pending: set[asyncio.Task] = set()
+        try:
+            async for batch in _batches_from_thread(chunks, self.batch_size):
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()  # surface failures early
+                pending.add(asyncio.create_task(self._process_batch(embeddings, collection, batch)))
+            if pending:
+                await asyncio.gather(*pending)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+        finally:
+            if http_client is not None:
+                await http_client.aclose()
+        return self.embedded
+
+
+def print_progress(embedded: int, total: int | None) -> None:
+    print(f"Embedded {embedded}/{total if total is not None else '?'} chunks.")
+
+
+def ingest_chunks(persona_name: str, chunks: Iterable[Document], total: int | None = None, **kwargs) -> int:
+    """Sync entry point for background workers; every chunk must carry an `id`."""
+    kwargs.setdefault("on_progress", print_progress)
+    ingestor = ChunkIngestor(persona_name, **kwargs)
+    return asyncio.run(ingestor.run(chunks, total=total))
@@ -0,0 +1,270 @@
+import codecs
+import hashlib
+import mmap
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby
+from typing import Iterable, Iterator
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+# Plain text is read and split in segments of about this many bytes
+TEXT_SEGMENT_BYTES = 1024 * 1024
+# PDF pages handed to a parse worker at a time
+PDF_PAGES_PER_PART = 8
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+# Below this much input, starting a process pool costs more than it saves
+PARALLEL_PARSE_MIN_BYTES = 4 * 1024 * 1024
+
+
+def is_supported(path: str) -> bool:
+    return path.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+@contextmanager
+def _mapped(path: str):
+    """Memory-maps a file read-only, so pages are read from the page cache on demand."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _iter_pdf_pages(path: str, first: int = 0, last: int | None = None) -> Iterator[Document]:
+    with _mapped(path) as mapped:
+        if not mapped:
+            return
+        reader = PdfReader(mapped)
+        for page_number in range(first, len(reader.pages) if last is None else last):
+            text = reader.pages[page_number].extract_text() or ""
+            yield Document(page_content=text, metadata={"source": path, "page": page_number})
+
+
+def _text_segment_bounds(mapped) -> Iterator[tuple[int, int]]:
+    """
+    Byte ranges of about TEXT_SEGMENT_BYTES that tile the file, each cut at a
+    paragraph (or line) break so the splitter sees natural boundaries. A line
+    break byte never occurs inside a UTF-8 sequence, so each range decodes on its own.
+    """
+    size = len(mapped)
+    start = 0
+    while start < size:
+        end = start + TEXT_SEGMENT_BYTES
+        while end < size:
+            cut = mapped.rfind(b"\n\n", start + 1, end)
+            if cut < 0:
+                cut = mapped.rfind(b"\n", start + 1, end)
+            if cut > 0:
+                end = cut
+                break
+            end += TEXT_SEGMENT_BYTES  # no line break yet, grow the segment
+        end = min(end, size)
+        yield start, end
+        start = end
+
+
+def _iter_text_segments(
+    path: str, bounds: Iterable[tuple[int, int]] | None = None, first_segment: int = 0
+) -> Iterator[Document]:
+    with _mapped(path) as mapped:
+        for segment, (start, end) in enumerate(bounds or _text_segment_bounds(mapped), first_segment):
+            text = codecs.decode(mapped[start:end], "utf-8", errors="replace")
+            yield Document(page_content=text, metadata={"source": path, "page": segment})
+
+
+def _page_separator(path: str) -> int:
+    """Characters between consecutive pages in the document text: text segments are contiguous."""
+    return 1 if path.lower().endswith(".pdf") else 0
+
+
+def probe_document(path: str) -> None:
+    """Raises if a document cannot be opened, before any of it is ingested."""
+    if path.lower().endswith(".pdf"):
+        with _mapped(path) as mapped:
+            if mapped:
+                PdfReader(mapped)
+
+
+def iter_pages(path: str) -> Iterator[Document]:
+    """Yields a document one page (PDF) or text segment (TXT) at a time."""
+    if path.lower().endswith(".pdf"):
+        return _iter_pdf_pages(path)
+    if path.lower().endswith(".txt"):
+        return _iter_text_segments(path)
+    raise ValueError(f"Unsupported file type: {path}")
+
+
+def iter_chunks(path: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[Document]:
+    """
+    Lazily parses and splits a document, so only one page is held in memory.
+
+    Each chunk carries its page and its start/end character offsets in the
+    document text: PDF pages joined by a single separator, or the text file's
+    segments as they are in the file.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+    )
+    separator = _page_separator(path)
+    page_offset = 0
+    for page in iter_pages(path):
+        for chunk in text_splitter.split_documents([page]):
+            start = page_offset + chunk.metadata.pop("start_index")
+            chunk.metadata.update(start_position=start, end_position=start + len(chunk.page_content))
+            yield chunk
+        page_offset += len(page.page_content) + separator
+
+
+def split_text(text: str, metadata: dict | None = None, chunk_size: int = CHUNK_SIZE,
+               chunk_overlap: int = CHUNK_OVERLAP) -> list[Document]:
+    """Splits an in-memory text (e.g. a scraped post) the same way documents are split."""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+    )
+    chunks = text_splitter.create_documents([text], [dict(metadata or {})])
+    for chunk in chunks:
+        start = chunk.metadata.pop("start_index")
+        chunk.metadata.update(start_position=start, end_position=start + len(chunk.page_content))
+    return chunks
+
+
+def document_parts(path: str) -> list[tuple[int, int]]:
+    """Splits a document into parts that parse independently: PDF page ranges or text byte ranges."""
+    with _mapped(path) as mapped:
+        if not mapped:
+            return []
+        if path.lower().endswith(".pdf"):
+            page_count = len(PdfReader(mapped).pages)
+            return [
+                (first, min(first + PDF_PAGES_PER_PART, page_count))
+                for first in range(0, page_count, PDF_PAGES_PER_PART)
+            ]
+        return list(_text_segment_bounds(mapped))
+
+
+def parse_part(
+    path: str,
+    part_index: int,
+    part: tuple[int, int],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> list[tuple]:
+    """
+    Parses and splits one part of a document in a worker process.
+
+    Returns (page, page length, [(chunk text, start in page)]) per page as
+    plain tuples to keep pickling cheap; the consumer turns page-relative
+    starts into document offsets as the parts arrive in order.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+    )
+    if path.lower().endswith(".pdf"):
+        pages = _iter_pdf_pages(path, *part)
+    else:
+        pages = _iter_text_segments(path, [part], part_index)
+    return [
+        (
+            page.metadata["page"],
+            len(page.page_content),
+            [(chunk.page_content, chunk.metadata["start_index"]) for chunk in text_splitter.split_documents([page])],
+        )
+        for page in pages
+    ]
+
+
+def _chunks_from_parts(path: str, parsed_parts: Iterable[list[tuple]]) -> Iterator[Document]:
+    separator = _page_separator(path)
+    page_offset = 0
+    for pages in parsed_parts:
+        for page, page_length, chunks in pages:
+            for text, start in chunks:
+                start += page_offset
+                yield Document(
+                    page_content=text,
+                    metadata={"source": path, "page": page, "start_position": start, "end_position": start + len(text)},
+                )
+            page_offset += page_length + separator
+
+
+def _iter_parsed_parts(
+    pool: ProcessPoolExecutor,
+    documents: list[tuple[str, list[tuple[int, int]]]],
+    queue_size: int,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> Iterator[tuple[int, str, list[tuple]]]:
+    """(document index, path, parsed part) in document order, with up to `queue_size` parts submitted ahead."""
+    def submissions():
+        for index, (path, parts) in enumerate(documents):
+            if not parts:
+                yield index, path, None  # still report empty documents
+            for part_index, part in enumerate(parts):
+                yield index, path, pool.submit(parse_part, path, part_index, part, chunk_size, chunk_overlap)
+
+    pending = submissions()
+    queued = deque()
+    for submission in pending:
+        queued.append(submission)
+        if len(queued) >= queue_size:
+            break
+    while queued:
+        index, path, future = queued.popleft()
+        submission = next(pending, None)
+        if submission is not None:
+            queued.append(submission)
+        yield index, path, future.result() if future is not None else []
+
+
+def iter_document_chunks(
+    paths: Iterable[str],
+    max_workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> Iterator[tuple[str, Iterator[Document]]]:
+    """
+    Yields (path, chunks) for each document, in the order given.
+
+    Documents are cut into parts (a few PDF pages or one text segment) that are
+    parsed and split in a process pool, with at most one worker per part, so a
+    single large PDF is spread over the workers as well.
+    Up to 2 * `max_workers` parts are submitted ahead of the consumer, so
+    workers stay busy while it catches up yet memory stays bounded by parts,
+    not documents. Parts are yielded in submission order and split exactly as
+    sequential parsing splits them, so chunks, their offsets and order (and
+    chunk_index) are the same either way. A small upload, or one that makes a
+    single part, is streamed page by page in-process instead.
+    """
+    paths = list(paths)
+    documents = []
+    if sum(os.path.getsize(path) for path in paths) >= PARALLEL_PARSE_MIN_BYTES:
+        documents = [(path, document_parts(path)) for path in paths]
+        max_workers = min(max_workers or os.cpu_count() or 1, sum(len(parts) for _, parts in documents))
+    if not documents or max_workers <= 1:
+        for path in paths:
+            yield path, iter_chunks(path, chunk_size, chunk_overlap)
+        return
+
+    # Spawned workers do not inherit DB connections or client threads of the parent
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        parsed = _iter_parsed_parts(pool, documents, max_workers * 2, chunk_size, chunk_overlap)
+        for (_, path), group in groupby(parsed, key=lambda item: item[:2]):
+            yield path, _chunks_from_parts(path, (pages for _, _, pages in group))
@@ -1,12 +1,10 @@
-from openai import OpenAI
-from app.config import settings
+from app.services.clients import clients
+from app.services.usage import TokenUsage, usage_recorder
 
 def extract_persona_from_docs(docs_text: str, persona_name: str) -> str:
     """
     Sends the concatenated document text to an AI model to generate a detailed persona description.
     """
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
     # Limit docs_text to first 4000 characters safely to respect token limits
     snippet = docs_text[:4000] if len(docs_text) > 4000 else docs_text
 
@@ -18,12 +16,13 @@ def extract_persona_from_docs(docs_text: str, persona_name: str) -> str:
         f"Content:\n{snippet}"
     )
 
-    response = client.chat.completions.create(
+    response = clients.openai.chat.completions.create(
         model="gpt-4o",
         messages=[{"role": "system", "content": system_prompt}],
         temperature=0.7,
         max_tokens=500,
     )
+    usage_recorder.record(TokenUsage.from_response(response.model, response.usage))
 
     persona_description = response.choices[0].message.content.strip()
     return persona_description
@@ -81,118 +81,403 @@
 #         print(f"Cleaning up temporary directory: {temp_dir}")
 #         shutil.rmtree(temp_dir)
 
+import hashlib
+import json
 import os
 import shutil
-from langchain_community.document_loaders import TextLoader, PyPDFLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from app.background.document_process.persona_builder import extract_persona_from_docs
+from typing import Callable, Iterable
+from sqlalchemy import delete, insert, update
 from app.config import settings
-from langchain_chroma import Chroma
+from app.background.document_process.ingestion import ProgressCallback, ingest_chunks, print_progress
+from app.background.document_process.loaders import (
+    file_sha256,
+    is_supported,
+    iter_document_chunks,
+    iter_pages,
+    probe_document,
+    split_text,
+)
+from app.background.document_process.persona_builder import extract_persona_from_docs
+from app.services.clients import clients, persona_collection_name
+from app.services.invalidation import notify_persona_changed
+from app.services.lexical_index import add_to_persona_index, lexical_indexes, rebuild_persona_index
+from app.services.tokens import count_tokens
 
 from app.database import SessionLocal
 from app.models import ContentStatus, ContentType, Persona, Content, ContentChunk
 
+# Characters of the corpus the persona builder sees (it truncates to this anyway)
+PERSONA_SAMPLE_CHARS = 4000
+
+
+def _chunk_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _read_preview(path: str, max_chars: int) -> str:
+    parts = []
+    remaining = max_chars
+    for page in iter_pages(path):
+        parts.append(page.page_content[:remaining])
+        remaining -= len(parts[-1])
+        if remaining <= 0:
+            break
+    return " ".join(parts)
+
+
+def _get_or_create_persona(db, persona_name: str, load_sample_text: Callable[[], str]) -> Persona:
+    """Loads the persona, extracting a description only the first time it is onboarded."""
+    persona = db.query(Persona).filter(Persona.name == persona_name).first()
+    if persona and persona.description:
+        print(f"Persona '{persona_name}' already exists in database.")
+        return persona
+
+    # The persona builder only looks at the beginning of the corpus
+    docs_text = load_sample_text()
+    persona_description = extract_persona_from_docs(docs_text, persona_name)
+    print(f"Extracted persona description:\n{persona_description}")
+    if persona:
+        # Created bare by the media pipeline before any text was ingested
+        persona.description = persona_description
+    else:
+        persona = Persona(name=persona_name, description=persona_description)
+        db.add(persona)
+    db.commit()
+    db.refresh(persona)
+    print(f"Persona '{persona_name}' saved to database.")
+    return persona
+
+
+class _DocumentSync:
+    """
+    Streams the chunks of changed documents that need embedding, while keeping
+    the DB rows of each document in step.
+
+    Chunks are parsed page by page and their rows are bulk inserted one embedding
+    batch at a time (a single multi-row INSERT .. RETURNING per batch instead of a
+    flush per row), so only one batch of chunk texts (plus the set of chunk
+    hashes) is held at a time.
+    """
+
+    # Chunk rows returned IDs in the order they were given
+    insert_chunks = insert(ContentChunk).returning(ContentChunk.id, sort_by_parameter_order=True)
+
+    def __init__(self, db, persona_name: str):
+        self.db = db
+        self.persona_name = persona_name
+        self.added = 0
+        self.stale_chunk_ids: list[str] = []
+
+    def iter_new_chunks(self, documents: list[tuple[str, Content]]):
+        contents = dict(documents)
+        parsed_documents = iter_document_chunks(contents, max_workers=settings.INGEST_PARSE_WORKERS or None)
+        for path, chunks in parsed_documents:
+            yield from self._sync_document(contents[path], chunks)
+
+    def _flush(self, pending: list):
+        rows = [row for _, row in pending]
+        chunk_ids = self.db.scalars(self.insert_chunks, rows).all()  # Assign IDs before commit
+        for (chunk, row), chunk_id in zip(pending, chunk_ids):
+            # Attach metadata linking this chunk to DB
+            chunk.metadata = {
+                "content_chunk_id": str(chunk_id),
+                "content_id": str(row["content_id"]),
+                "persona_name": self.persona_name,
+                "content_hash": row["content_hash"],
+            }
+        self.added += len(pending)
+        return [chunk for chunk, _ in pending]
 
-def add_documents_to_vectorstore(document_paths: list[str], persona_name: str = "Unknown"):
+    def _sync_document(self, content: Content, chunks):
+        stored_chunks = {
+            content_hash: (chunk_id, chroma_chunk_id)
+            for content_hash, chunk_id, chroma_chunk_id in self.db.query(
+                ContentChunk.content_hash, ContentChunk.id, ContentChunk.chroma_chunk_id
+            ).filter(ContentChunk.content_id == content.id)
+        }
+        kept_hashes = set()
+        index_updates = []
+        pending = []
+        preview = []
+        preview_chars = 0
+
+        for i, chunk in enumerate(chunks):
+            positions = {
+                "start_position": chunk.metadata["start_position"],
+                "end_position": chunk.metadata["end_position"],
+            }
+            if preview_chars < settings.CONTENT_TEXT_PREVIEW_CHARS:
+                preview.append(chunk.page_content)
+                preview_chars += len(chunk.page_content)
+
+            content_hash = _chunk_sha256(chunk.page_content)
+            if content_hash in kept_hashes:
+                continue  # repeated boilerplate within one document adds nothing
+            kept_hashes.add(content_hash)
+
+            stored = stored_chunks.get(content_hash)
+            if stored:
+                index_updates.append({"id": stored[0], "chunk_index": i, **positions})
+                continue
+
+            chunk.id = f"{content.id}-{content_hash}"
+            pending.append((chunk, {
+                "content_id": content.id,
+                "chunk_text": chunk.page_content,
+                "chunk_index": i,
+                "chroma_chunk_id": chunk.id,
+                "content_hash": content_hash,
+                "token_count": count_tokens(chunk.page_content, settings.EMBEDDING_MODEL),
+                **positions,
+            }))
+            if len(pending) >= settings.INGEST_EMBED_BATCH_SIZE:
+                yield from self._flush(pending)
+                pending = []
+
+        if pending:
+            yield from self._flush(pending)
+
+        if index_updates:
+            self.db.execute(update(ContentChunk), index_updates)
+
+        stale = [(chunk_id, chroma_chunk_id) for content_hash, (chunk_id, chroma_chunk_id) in stored_chunks.items()
+                 if content_hash not in kept_hashes]
+        if stale:
+            self.db.execute(delete(ContentChunk).where(ContentChunk.id.in_([chunk_id for chunk_id, _ in stale])))
+            self.stale_chunk_ids.extend(chroma_chunk_id for _, chroma_chunk_id in stale if chroma_chunk_id)
+
+        # Chunks hold the full text; the Content row keeps a bounded excerpt
+        content.content_text = " ".join(preview)[:settings.CONTENT_TEXT_PREVIEW_CHARS]
+
+
+def add_documents_to_vectorstore(
+    document_paths: list[str],
+    persona_name: str = "Unknown",
+    on_progress: ProgressCallback | None = None,
+    remove_documents: Iterable[str] = (),
+    full_resync: bool = False,
+):
+    """
+    Incrementally syncs a persona's uploaded documents into the DB and its Chroma collection.
+
+    An upload adds to the persona's document corpus:
+    - documents whose file hash is unchanged are skipped entirely,
+    - within changed documents only chunks with a new content hash are embedded
+      and chunks that disappeared are deleted,
+    - documents from earlier uploads are removed only when named (by file name)
+      in `remove_documents`, or, with `full_resync`, when the upload is the
+      full corpus and they are not part of it.
+
+    Documents are parsed from memory-mapped files (in a process pool when there
+    are several) and chunks flow straight into the embedding batches, so peak
+    memory does not grow with the size of the upload.
+    """
     print(f"Processing {len(document_paths)} documents for embedding...")
-    all_docs = []
+    collection_name = persona_collection_name(persona_name)
+    remove_documents = set(remove_documents)
 
-    # 1. Load documents based on their file extension
+    # 1. Check and hash the supported source files
+    sources = {}
     for path in document_paths:
+        if not is_supported(path):
+            print(f"Skipping unsupported file type: {path}")
+            continue
         try:
-            if path.endswith(".txt"):
-                loader = TextLoader(path)
-                all_docs.extend(loader.load())
-            elif path.endswith(".pdf"):
-                loader = PyPDFLoader(path)
-                all_docs.extend(loader.load())
-            else:
-                print(f"Skipping unsupported file type: {path}")
+            probe_document(path)
+            sources[path] = file_sha256(path)
         except Exception as e:
             print(f"Error loading document {path}: {e}")
 
-    if not all_docs:
+    if not sources and not remove_documents:
         print("No documents were loaded successfully. Aborting embedding process.")
         return
 
-    # 2. Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.split_documents(all_docs)
-    print(f"Split documents into {len(chunks)} chunks.")
-
-    full_text = " ".join([doc.page_content for doc in all_docs])
-
     db = SessionLocal()
     try:
-        # Extract or load persona description and save Persona in DB
-        persona_description = extract_persona_from_docs(full_text, persona_name)
-        print(f"Extracted persona description:\n{persona_description}")
-        persona = db.query(Persona).filter(Persona.name == persona_name).first()
-        if not persona:
-            persona = Persona(name=persona_name, description=persona_description)
-            db.add(persona)
-            db.commit()
-            db.refresh(persona)
-            print(f"Persona '{persona_name}' saved to database.")
+        # 2. Load or create the persona
+        if sources:
+            first_document = next(iter(sources))
+            persona = _get_or_create_persona(
+                db, persona_name, lambda: _read_preview(first_document, PERSONA_SAMPLE_CHARS)
+            )
         else:
-            print(f"Persona '{persona_name}' already exists in database.")
-
-        # Create Content record linked to Persona/influencer
-        content = Content(
-            title=f"Documents for {persona_name}",
-            content_text=full_text,
-            content_type=ContentType.DOCUMENT,
-            status=ContentStatus.PUBLISHED,
-            influencer_id=persona.id
-        )
-        db.add(content)
-        db.commit()
-        db.refresh(content)
+            persona = db.query(Persona).filter(Persona.name == persona_name).first()
+            if persona is None:
+                print(f"Persona '{persona_name}' has no documents to remove.")
+                return
 
-        # Save chunks as ContentChunk records with metadata
-        for i, chunk in enumerate(chunks):
-            content_chunk = ContentChunk(
-                content_id=content.id,
-                chunk_text=chunk.page_content,
-                chunk_index=i,
-                # Optionally estimate token count here
+        existing_contents = {
+            content.chroma_document_id: content
+            for content in db.query(Content).filter(
+                Content.influencer_id == persona.id,
+                Content.content_type == ContentType.DOCUMENT,
             )
-            db.add(content_chunk)
-            db.flush()  # Assign ID before commit
-            # Attach metadata linking this chunk to DB
-            chunk.metadata = {
-                "content_chunk_id": str(content_chunk.id),
-                "content_id": str(content.id),
-                "persona_name": persona_name
-            }
+        }
+
+        # 3. Pick out documents that are new or whose file changed
+        changed_documents = []
+        for path, source_hash in sources.items():
+            file_name = os.path.basename(path)
+            document_id = f"{collection_name}:{file_name}"
+            content = existing_contents.get(document_id)
+            if content and content.source_hash == source_hash:
+                print(f"Document '{file_name}' is unchanged, skipping.")
+                continue
+
+            if content:
+                content.source_hash = source_hash
+            else:
+                # Content record linked to Persona/influencer, one per source document
+                content = Content(
+                    title=file_name,
+                    content_text="",
+                    content_type=ContentType.DOCUMENT,
+                    status=ContentStatus.PUBLISHED,
+                    chroma_document_id=document_id,
+                    source_hash=source_hash,
+                    influencer_id=persona.id
+                )
+                db.add(content)
+                db.flush()  # Assign content ID for chunk ids
+            changed_documents.append((path, content))
 
+        # Documents asked to be removed; on a full resync also those missing from the upload.
+        # Every submitted file counts as present, so one that failed to load is kept.
+        uploaded_names = {os.path.basename(path) for path in document_paths}
+        removed_contents = [
+            content for content in existing_contents.values()
+            if content.title not in uploaded_names
+            and (content.title in remove_documents or full_resync)
+        ]
+
+        if not changed_documents and not removed_contents:
+            db.rollback()
+            if not lexical_indexes.exists(persona_name):
+                rebuild_persona_index(db, persona)  # personas ingested before the lexical index existed
+            print(f"Collection '{collection_name}' is already up to date.")
+            return
+
+        # 4. Embed only the new chunks as they are parsed; commit rows only once their
+        # vectors exist, so a failed run is retried in full instead of skipped as unchanged
+        document_sync = _DocumentSync(db, persona_name)
+        ingest_chunks(
+            persona_name,
+            document_sync.iter_new_chunks(changed_documents),
+            on_progress=on_progress or print_progress,
+        )
+
+        for content in removed_contents:
+            print(f"Removing document '{content.title}'.")
+            db.execute(delete(ContentChunk).where(ContentChunk.content_id == content.id))
+            db.delete(content)
         db.commit()
 
+        # 5. Drop vectors of removed chunks and documents from the collection
+        collection = clients.get_collection(persona_name)
+        if document_sync.stale_chunk_ids:
+            collection.delete(ids=document_sync.stale_chunk_ids)
+        for content in removed_contents:
+            collection.delete(where={"content_id": str(content.id)})
+
+        # 6. Rebuild the persona's BM25 index from the committed chunks
+        indexed_chunks = rebuild_persona_index(db, persona)
+        print(f"Rebuilt lexical index for '{persona_name}' over {indexed_chunks} chunks.")
+
+        print(
+            f"✅ Synced collection '{collection_name}': {document_sync.added} chunks added, "
+            f"{len(document_sync.stale_chunk_ids)} chunks and {len(removed_contents)} documents removed."
+        )
+
+        # Cached answers were grounded in the old documents
+        if document_sync.added or document_sync.stale_chunk_ids or removed_contents:
+            notify_persona_changed(persona_name)
+
     except Exception as e:
-        print(f"Error extracting or saving persona/content/chunks: {e}")
+        print(f"Error ingesting documents for persona '{persona_name}': {e}")
         db.rollback()
+        raise
     finally:
         db.close()
 
-    # 3. Initialize embeddings model
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large", openai_api_key=settings.OPENAI_API_KEY)
 
-    # 4. Add document chunks to Chroma vectorstore with collection per persona
-    persist_directory = "db"
-    collection_name = f"persona_{persona_name.lower().replace(' ', '_')}"
+def _social_post_id(collection_name: str, post: dict) -> str:
+    digest = hashlib.sha256(f"{post.get('user')}\0{post['text']}".encode("utf-8")).hexdigest()[:32]
+    return f"{collection_name}:post:{digest}"
 
-    Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        collection_name=collection_name,
-        persist_directory=persist_directory
-    )
 
-    print(f"✅ Successfully added {len(chunks)} chunks to collection '{collection_name}'.")
+def add_social_posts_to_vectorstore(posts: list[dict], persona_name: str = "Unknown") -> int:
+    """
+    Stores a micro-batch of scraped posts as Content rows and embeds their chunks.
+
+    Each post is a dict with `text` and optionally `user` and `source_url`.
+    Posts already stored for the persona (same author and text) are skipped, so
+    re-scraping a profile only adds what is new. Returns the number of chunks added.
+    """
+    collection_name = persona_collection_name(persona_name)
+    posts_by_id = {_social_post_id(collection_name, post): post for post in posts if post.get("text")}
+    if not posts_by_id:
+        return 0
+
+    db = SessionLocal()
+    try:
+        persona = _get_or_create_persona(
+            db, persona_name, lambda: "\n\n".join(post["text"] for post in posts_by_id.values())[:PERSONA_SAMPLE_CHARS]
+        )
+        stored_ids = {
+            document_id for (document_id,) in db.query(Content.chroma_document_id)
+            .filter(Content.chroma_document_id.in_(list(posts_by_id)))
+        }
+
+        new_posts = []
+        for document_id, post in posts_by_id.items():
+            if document_id in stored_ids:
+                continue
+            author = post.get("user") or persona_name
+            content = Content(
+                title=f"{author}: {post['text'][:80]}",
+                content_text="",
+                content_type=ContentType.SOCIAL_POST,
+                status=ContentStatus.PUBLISHED,
+                chroma_document_id=document_id,
+                source_hash=_chunk_sha256(post["text"]),
+                extra_metadata=json.dumps({"user": post.get("user"), "source_url": post.get("source_url")}),
+                influencer_id=persona.id,
+            )
+            db.add(content)
+            new_posts.append((content, post))
+        if not new_posts:
+            db.rollback()
+            return 0
+        db.flush()  # Assign content IDs for chunk ids
+
+        # Same chunk rows, metadata and embedding path as documents
+        document_sync = _DocumentSync(db, persona_name)
+
+        def iter_new_chunks():
+            for content, post in new_posts:
+                chunks = split_text(post["text"], {"source": post.get("source_url")})
+                yield from document_sync._sync_document(content, chunks)
+
+        ingest_chunks(persona_name, iter_new_chunks(), on_progress=None)
+        db.commit()
+
+        # Only the new posts' chunks are tokenized; the rest of the index is reused
+        add_to_persona_index(db, persona, [content.id for content, _ in new_posts])
+        notify_persona_changed(persona_name)
+        print(f"✅ Added {len(new_posts)} scraped posts ({document_sync.added} chunks) to '{collection_name}'.")
+        return document_sync.added
+
+    except Exception as e:
+        print(f"Error ingesting scraped posts for persona '{persona_name}': {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 
-    # 5. Clean up the temporary directory that stored the files
+def cleanup_uploaded_documents(document_paths: list[str]):
+    """Removes the upload directory that stored the files."""
     if document_paths:
-        temp_dir = os.path.dirname(document_paths[0])
-        print(f"Cleaning up temporary directory: {temp_dir}")
-        shutil.rmtree(temp_dir)
+        upload_dir = os.path.dirname(document_paths[0])
+        print(f"Cleaning up upload directory: {upload_dir}")
+        shutil.rmtree(upload_dir, ignore_errors=True)
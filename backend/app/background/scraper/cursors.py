@@ -0,0 +1,94 @@
+import datetime
+from dataclasses import dataclass, replace
+
+from app.database import SessionLocal, upsert_insert
+from app.models import SourceCursor, utcnow
+
+
+@dataclass(frozen=True)
+class CursorState:
+    """How far a source has been crawled: its newest ingested item and its HTTP validators."""
+    last_item_id: int | None = None
+    last_item_at: datetime.datetime | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    items_seen: int = 0
+
+    def is_seen(self, item_id: int | None = None, posted_at: datetime.datetime | None = None) -> bool:
+        """True for items at or below the high-water mark (tweet IDs grow over time)."""
+        if item_id is not None and self.last_item_id is not None:
+            return item_id <= self.last_item_id
+        if posted_at is not None and self.last_item_at is not None:
+            return posted_at <= self.last_item_at
+        return False
+
+    def advance(self, item_id: int | None = None, posted_at: datetime.datetime | None = None) -> "CursorState":
+        return replace(
+            self,
+            last_item_id=max(filter(None, (self.last_item_id, item_id)), default=None),
+            last_item_at=max(filter(None, (self.last_item_at, posted_at)), default=None),
+            items_seen=self.items_seen + 1,
+        )
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def load_cursors(persona_id: int, urls: list[str]) -> dict[str, CursorState]:
+    db = SessionLocal()
+    try:
+        rows = db.query(SourceCursor).filter(
+            SourceCursor.persona_id == persona_id, SourceCursor.source_url.in_(urls)
+        )
+        return {
+            row.source_url: CursorState(
+                last_item_id=int(row.last_item_id) if row.last_item_id else None,
+                last_item_at=row.last_item_at,
+                etag=row.etag,
+                last_modified=row.last_modified,
+                items_seen=row.items_seen or 0,
+            )
+            for row in rows
+        }
+    finally:
+        db.close()
+
+
+def save_cursors(persona_id: int, cursors: dict[str, CursorState]) -> None:
+    """Upserts the cursors of the sources a crawl finished, in one statement."""
+    if not cursors:
+        return
+    now = utcnow()
+    rows = [
+        {
+            "persona_id": persona_id,
+            "source_url": source_url,
+            "last_item_id": str(cursor.last_item_id) if cursor.last_item_id is not None else None,
+            "last_item_at": cursor.last_item_at,
+            "etag": cursor.etag,
+            "last_modified": cursor.last_modified,
+            "items_seen": cursor.items_seen,
+            "last_crawled_at": now,
+        }
+        for source_url, cursor in cursors.items()
+    ]
+    insert = upsert_insert()
+    statement = insert(SourceCursor).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["persona_id", "source_url"],
+        set_={
+            column: statement.excluded[column]
+            for column in ("last_item_id", "last_item_at", "etag", "last_modified", "items_seen", "last_crawled_at")
+        },
+    )
+    db = SessionLocal()
+    try:
+        db.execute(statement)
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,218 @@
+import hashlib
+import io
+import os
+import posixpath
+import tempfile
+import threading
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from PIL import Image
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal, upsert_insert
+from app.models import MediaAsset, Persona
+
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+
+def media_source_key(url: str) -> str:
+    """
+    Identifies an image across CDN URL variants.
+
+    Instagram serves the same file from many hosts with per-request signed
+    query strings, but the file name in the path stays the same.
+    """
+    file_name = posixpath.basename(urlsplit(url).path)
+    if file_name:
+        return file_name.lower()[:255]
+    return hashlib.sha256(url.split("?", 1)[0].encode("utf-8")).hexdigest()
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """64-bit difference hash: survives re-encoding, resizing and small edits."""
+    pixels = list(image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            value = (value << 1) | (left > pixels[row * (size + 1) + col + 1])
+    return value
+
+
+@dataclass
+class KnownMedia:
+    id: int | None
+    sha256: str
+    dhash: int
+    storage_path: str
+    thumbnail_path: str | None
+
+
+class MediaIndex:
+    """A persona's stored media, looked up by source key, content hash and perceptual hash."""
+
+    def __init__(self, near_duplicate_bits: int):
+        self.near_duplicate_bits = near_duplicate_bits
+        self._lock = threading.Lock()
+        self._by_source: dict[str, KnownMedia] = {}
+        self._by_sha256: dict[str, KnownMedia] = {}
+
+    def add(self, source_key: str, media: KnownMedia) -> None:
+        with self._lock:
+            self._by_source[source_key] = media
+            self._by_sha256.setdefault(media.sha256, media)
+
+    def get_source(self, source_key: str) -> KnownMedia | None:
+        with self._lock:
+            return self._by_source.get(source_key)
+
+    def find_duplicate(self, sha256: str, image_dhash: int) -> KnownMedia | None:
+        """The stored copy of an identical or perceptually near-identical image, if any."""
+        with self._lock:
+            media = self._by_sha256.get(sha256)
+            if media is not None:
+                return media
+            for media in self._by_sha256.values():
+                if (media.dhash ^ image_dhash).bit_count() <= self.near_duplicate_bits:
+                    return media
+        return None
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def get_or_create_persona_id(persona_name: str) -> int:
+    """The persona's id, creating a bare persona (its description is extracted later) if needed."""
+    db = SessionLocal()
+    try:
+        persona_id = db.query(Persona.id).filter(Persona.name == persona_name).scalar()
+        if persona_id is None:
+            db.add(Persona(name=persona_name))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # created concurrently by another crawl or an upload
+            persona_id = db.query(Persona.id).filter(Persona.name == persona_name).scalar()
+        return persona_id
+    finally:
+        db.close()
+
+
+def load_media_index(persona_id: int, near_duplicate_bits: int) -> MediaIndex:
+    index = MediaIndex(near_duplicate_bits)
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            MediaAsset.id, MediaAsset.source_key, MediaAsset.sha256, MediaAsset.dhash,
+            MediaAsset.storage_path, MediaAsset.thumbnail_path, MediaAsset.duplicate_of_id,
+        ).filter(MediaAsset.persona_id == persona_id).order_by(MediaAsset.id)
+        for media_id, source_key, sha256, media_dhash, storage_path, thumbnail_path, duplicate_of_id in rows:
+            index.add(source_key, KnownMedia(
+                id=duplicate_of_id or media_id,
+                sha256=sha256,
+                dhash=int(media_dhash, 16),
+                storage_path=storage_path,
+                thumbnail_path=thumbnail_path,
+            ))
+    finally:
+        db.close()
+    return index
+
+
+def store_image(
+    body: bytes,
+    url: str,
+    persona_id: int,
+    index: MediaIndex,
+    store_dir: str,
+    thumbnail_size: int,
+) -> dict:
+    """
+    Hashes a downloaded image and records it for the persona, writing files only for new images.
+
+    Files are content addressed (full/<sha256[:2]>/<sha256>.<ext> and a JPEG
+    thumbnail under thumbs/), so the same bytes are never stored twice. Images
+    identical or perceptually near-identical to one already stored (a repost,
+    a re-encode) only get a row pointing at the existing files.
+    Runs in a worker thread; Pillow and hashlib release the GIL for the heavy parts.
+    """
+    sha256 = hashlib.sha256(body).hexdigest()
+    with Image.open(io.BytesIO(body)) as image:
+        image.load()
+        image_dhash = dhash(image)
+        width, height, image_format = image.width, image.height, image.format
+
+        duplicate = index.find_duplicate(sha256, image_dhash)
+        if duplicate is not None:
+            storage_path, thumbnail_path = duplicate.storage_path, duplicate.thumbnail_path
+        else:
+            extension = IMAGE_EXTENSIONS.get(image_format, "bin")
+            storage_path = posixpath.join("full", sha256[:2], f"{sha256}.{extension}")
+            thumbnail_path = posixpath.join("thumbs", sha256[:2], f"{sha256}.jpg")
+            if not os.path.exists(os.path.join(store_dir, storage_path)):
+                _write_atomic(os.path.join(store_dir, storage_path), body)
+            if not os.path.exists(os.path.join(store_dir, thumbnail_path)):
+                thumbnail = image.convert("RGB")
+                thumbnail.thumbnail((thumbnail_size, thumbnail_size))
+                buffer = io.BytesIO()
+                thumbnail.save(buffer, "JPEG", quality=85)
+                _write_atomic(os.path.join(store_dir, thumbnail_path), buffer.getvalue())
+
+    source_key = media_source_key(url)
+    row = {
+        "persona_id": persona_id,
+        "source_url": url[:2048],
+        "source_key": source_key,
+        "sha256": sha256,
+        "dhash": f"{image_dhash:016x}",
+        "width": width,
+        "height": height,
+        "image_format": image_format,
+        "file_size": len(body),
+        "storage_path": storage_path,
+        "thumbnail_path": thumbnail_path,
+        "duplicate_of_id": duplicate.id if duplicate is not None else None,
+    }
+    insert = upsert_insert()
+    statement = (
+        insert(MediaAsset).values(row)
+        .on_conflict_do_nothing(index_elements=["persona_id", "source_key"])
+        .returning(MediaAsset.id)
+    )
+    db = SessionLocal()
+    try:
+        media_id = db.execute(statement).scalar()
+        if media_id is None:
+            # Already recorded (e.g. by a concurrent crawl); link later duplicates to that row's original
+            existing_id, existing_duplicate_of_id = db.query(MediaAsset.id, MediaAsset.duplicate_of_id).filter(
+                MediaAsset.persona_id == persona_id, MediaAsset.source_key == source_key
+            ).one()
+            media_id = existing_duplicate_of_id or existing_id
+        db.commit()
+    finally:
+        db.close()
+
+    index.add(source_key, KnownMedia(
+        id=duplicate.id if duplicate is not None else media_id,
+        sha256=sha256,
+        dhash=image_dhash,
+        storage_path=storage_path,
+        thumbnail_path=thumbnail_path,
+    ))
+    return {
+        "url": url,
+        "sha256": sha256,
+        "path": storage_path,
+        "thumbnail": thumbnail_path,
+        "duplicate": duplicate is not None,
+    }
@@ -3,7 +3,10 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import random
+
 from scrapy import signals
+from scrapy.utils.httpobj import urlparse_cached
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
@@ -98,3 +101,29 @@ class SocialScraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class RotatingUserAgentMiddleware:
+    """
+    Sends each site a browser User-Agent from USER_AGENTS instead of one static
+    header. The choice is kept per host for the whole crawl, so a site sees a
+    consistent client and its cached responses revalidate cleanly.
+    """
+
+    def __init__(self, user_agents):
+        self.user_agents = list(user_agents)
+        self.by_host = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.getlist("USER_AGENTS") or [crawler.settings.get("USER_AGENT")])
+
+    def process_request(self, request):
+        if b"User-Agent" in request.headers:
+            return None
+        host = urlparse_cached(request).hostname
+        user_agent = self.by_host.get(host)
+        if user_agent is None:
+            user_agent = self.by_host[host] = random.choice(self.user_agents)
+        request.headers[b"User-Agent"] = user_agent
+        return None
@@ -0,0 +1,111 @@
+import datetime
+import json
+import re
+from typing import Iterator
+from urllib.parse import urlsplit
+
+from lxml import etree
+
+# --- Compiled once per process, evaluated against the page's lxml tree ---
+TWEETS = etree.XPath('//article[@data-testid="tweet"]')
+TWEET_TEXT = etree.XPath('.//div[@data-testid="tweetText"]//text()')
+TWEET_HANDLE = etree.XPath('(.//div[@data-testid="User-Name"]//span[contains(text(), "@")])[1]/text()')
+TWEET_PERMALINK = etree.XPath('(.//a[contains(@href, "/status/")]/@href)[1]')
+TWEET_TIME = etree.XPath('(.//time/@datetime)[1]')
+NEXT_PAGE = etree.XPath('(//a[@rel="next"]/@href | //link[@rel="next"]/@href)[1]')
+INSTAGRAM_MEDIA_SCRIPT = etree.XPath(
+    '//script[contains(text(), "xdt_api__v1__media__shortcode__web_info")]/text()', smart_strings=False
+)
+
+_json_decoder = json.JSONDecoder()
+STATUS_ID_RE = re.compile(r"/status/(\d+)")
+
+
+def site_of(url: str, sites: dict) -> str | None:
+    """The key of `sites` matching the URL's host or one of its parent domains (m.x.com -> x.com)."""
+    host = urlsplit(url).hostname or ""
+    while host:
+        if host in sites:
+            return sites[host]
+        _, _, host = host.partition(".")
+    return None
+
+
+def extract_json_value(text: str, key: str, start: int = 0):
+    """
+    Decodes only the value of the first `"key":` at or after `start`.
+
+    Pages embed large JSON blobs of which we need one field; decoding from the
+    key onwards with raw_decode stops at the end of that value instead of
+    parsing (and building objects for) the whole blob. Raises ValueError if
+    the key is missing or its value is not valid JSON.
+    """
+    needle = f'"{key}"'
+    index = text.find(needle, start)
+    if index < 0:
+        raise ValueError(f"Key '{key}' not found")
+    index = text.index(":", index + len(needle)) + 1
+    while text[index].isspace():
+        index += 1
+    value, _ = _json_decoder.raw_decode(text, index)
+    return value
+
+
+def parse_timestamp(value) -> datetime.datetime | None:
+    """ISO 8601 strings and unix timestamps as naive UTC datetimes (how the DB stores them)."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            parsed = datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+        else:
+            parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except (ValueError, OverflowError, OSError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def next_page_url(root) -> str | None:
+    links = NEXT_PAGE(root)
+    return str(links[0]) if links else None
+
+
+def parse_tweets(root) -> Iterator[dict]:
+    """Tweets on an X/Twitter page, as {tweet_text, user, tweet_id, posted_at} dicts."""
+    for tweet in TWEETS(root):
+        text = "".join(TWEET_TEXT(tweet)).strip()
+        if text:
+            handle = TWEET_HANDLE(tweet)
+            permalink = TWEET_PERMALINK(tweet)
+            status_id = STATUS_ID_RE.search(permalink[0]) if permalink else None
+            posted_at = TWEET_TIME(tweet)
+            yield {
+                "tweet_text": text,
+                "user": str(handle[0]) if handle else None,
+                "tweet_id": int(status_id.group(1)) if status_id else None,
+                "posted_at": parse_timestamp(posted_at[0]) if posted_at else None,
+            }
+
+
+def instagram_media(root) -> list[tuple[datetime.datetime | None, list[str]]]:
+    """
+    (post time, image URLs) of every item in an Instagram post page, taking the
+    highest resolution image of the item or of each carousel entry.
+    """
+    scripts = INSTAGRAM_MEDIA_SCRIPT(root)
+    if not scripts:
+        return []
+    script_text = scripts[0]
+    items = extract_json_value(script_text, "items", script_text.find("xdt_api__v1__media__shortcode__web_info"))
+
+    media_items = []
+    for item in items:
+        image_urls = []
+        # Carousel posts carry their images in carousel_media
+        for media in item.get("carousel_media") or [item]:
+            if "image_versions2" in media:
+                image_urls.append(media["image_versions2"]["candidates"][0]["url"])
+        media_items.append((parse_timestamp(item.get("taken_at")), image_urls))
+    return media_items
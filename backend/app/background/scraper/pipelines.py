@@ -4,10 +4,210 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from twisted.internet import task, threads
+from twisted.internet.defer import DeferredLock
+from scrapy import Request
+from scrapy.utils.defer import maybe_deferred_to_future
+
+from app.background.scraper.media import get_or_create_persona_id, load_media_index, media_source_key, store_image
+from app.services.usage import bill_usage_to, usage_recorder
 
 
 class SocialScraperPipeline:
     def process_item(self, item, spider):
         return item
+
+
+class SocialContentPipeline:
+    """
+    Streams scraped posts into the persona's RAG store while the crawl runs.
+
+    Posts are buffered and flushed through chunk -> embed -> upsert in small
+    batches, whenever SOCIAL_CONTENT_FLUSH_ITEMS posts are waiting or every
+    SOCIAL_CONTENT_FLUSH_SECONDS, whichever comes first. Flushes run in a thread
+    (one at a time) so the crawl keeps going; a crawl that outpaces embedding
+    waits on the size-based flush. Items pass through unchanged to the feed.
+    Model calls are billed to the spider's `user_id`, and each batch's usage is
+    written before the next one, since the crawl process is discarded afterwards.
+    """
+
+    def __init__(self, crawler, max_items: int, max_seconds: float):
+        self.crawler = crawler
+        self.max_items = max_items
+        self.max_seconds = max_seconds
+        self.buffer: list[dict] = []
+        self._lock = DeferredLock()
+        self._timer: task.LoopingCall | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            crawler,
+            max_items=crawler.settings.getint("SOCIAL_CONTENT_FLUSH_ITEMS", 50),
+            max_seconds=crawler.settings.getfloat("SOCIAL_CONTENT_FLUSH_SECONDS", 5.0),
+        )
+
+    @property
+    def persona_name(self) -> str:
+        return getattr(self.crawler.spider, "persona_name", None) or "Unknown"
+
+    @property
+    def user_id(self) -> int | None:
+        return getattr(self.crawler.spider, "user_id", None)
+
+    def open_spider(self):
+        self._timer = task.LoopingCall(self._flush)
+        self._timer.start(self.max_seconds, now=False)
+
+    async def close_spider(self):
+        if self._timer is not None and self._timer.running:
+            self._timer.stop()
+        pending = self._flush()
+        if pending is not None:
+            await maybe_deferred_to_future(pending)
+
+    async def process_item(self, item):
+        adapter = ItemAdapter(item)
+        text = adapter.get("tweet_text")
+        if text:
+            self.buffer.append({
+                "text": text,
+                "user": adapter.get("user"),
+                "source_url": adapter.get("source_url"),
+            })
+            if len(self.buffer) >= self.max_items:
+                await maybe_deferred_to_future(self._flush())
+        return item
+
+    def _flush(self):
+        if not self.buffer:
+            return None
+        posts, self.buffer = self.buffer, []
+        return self._lock.run(self._ingest, posts)
+
+    def _add_posts(self, posts: list[dict]) -> int:
+        from app.background.document_process.rag_builder import add_social_posts_to_vectorstore
+
+        try:
+            with bill_usage_to(self.user_id):
+                return add_social_posts_to_vectorstore(posts, self.persona_name)
+        finally:
+            usage_recorder.flush()
+
+    def _ingest(self, posts: list[dict]):
+        stats = self.crawler.stats
+        d = threads.deferToThread(self._add_posts, posts)
+
+        def ingested(chunks_added):
+            stats.inc_value("social_content/posts_flushed", len(posts))
+            stats.inc_value("social_content/chunks_added", chunks_added)
+
+        def failed(failure):
+            # The posts are still in the crawl's feed and can be ingested later
+            stats.inc_value("social_content/posts_failed", len(posts))
+            self.crawler.spider.logger.error(
+                f"Could not ingest {len(posts)} scraped posts for '{self.persona_name}': {failure.value}"
+            )
+
+        return d.addCallbacks(ingested, failed)
+
+
+class MediaStorePipeline:
+    """
+    Downloads the images of scraped posts into a content-addressed media store.
+
+    Image URLs whose CDN file name is already recorded for the persona are not
+    downloaded at all; downloaded images are hashed (sha256 and a perceptual
+    dHash), stored once, thumbnailed and recorded as MediaAsset rows in a pool
+    of MEDIA_WORKERS threads. Results are set on the item's `images` field.
+    An item with an image that could not be downloaded or stored marks its
+    source as failed, so the spider keeps that source's cursor where it was.
+    """
+
+    def __init__(self, crawler, store_dir: str, thumbnail_size: int, workers: int, near_duplicate_bits: int):
+        self.crawler = crawler
+        self.store_dir = store_dir
+        self.thumbnail_size = thumbnail_size
+        self.near_duplicate_bits = near_duplicate_bits
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media")
+        self.persona_id = None
+        self.index = None
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            crawler,
+            store_dir=crawler.settings.get("MEDIA_STORE", "media"),
+            thumbnail_size=crawler.settings.getint("MEDIA_THUMBNAIL_SIZE", 320),
+            workers=crawler.settings.getint("MEDIA_WORKERS", 4),
+            near_duplicate_bits=crawler.settings.getint("MEDIA_NEAR_DUPLICATE_BITS", 4),
+        )
+
+    async def _in_pool(self, fn, *args):
+        return await asyncio.wrap_future(self.executor.submit(fn, *args))
+
+    async def open_spider(self):
+        persona_name = getattr(self.crawler.spider, "persona_name", None) or "Unknown"
+        self.persona_id = await self._in_pool(get_or_create_persona_id, persona_name)
+        self.index = await self._in_pool(load_media_index, self.persona_id, self.near_duplicate_bits)
+
+    def close_spider(self):
+        self.executor.shutdown(wait=True)
+
+    async def process_item(self, item):
+        adapter = ItemAdapter(item)
+        urls = adapter.get("image_urls")
+        if not urls:
+            return item
+        results = await asyncio.gather(*(self._store(url) for url in urls))
+        adapter["images"] = [result for result in results if result is not None]
+        failed_sources = getattr(self.crawler.spider, "failed_sources", None)
+        if len(adapter["images"]) < len(results) and failed_sources is not None:
+            failed_sources.add(adapter.get("source_url"))
+        return item
+
+    async def _store(self, url: str) -> dict | None:
+        source_key = media_source_key(url)
+        known = self.index.get_source(source_key)
+        if known is not None:
+            self.crawler.stats.inc_value("media/known_skipped")
+            return {"url": url, "sha256": known.sha256, "path": known.storage_path,
+                    "thumbnail": known.thumbnail_path, "duplicate": True}
+
+        # Variants of one image within a crawl share a single download
+        in_flight = self._in_flight.get(source_key)
+        if in_flight is None:
+            in_flight = self._in_flight[source_key] = asyncio.ensure_future(self._download(url))
+            in_flight.add_done_callback(lambda _: self._in_flight.pop(source_key, None))
+        else:
+            self.crawler.stats.inc_value("media/known_skipped")
+        return await asyncio.shield(in_flight)
+
+    async def _download(self, url: str) -> dict | None:
+        stats = self.crawler.stats
+        try:
+            response = await self.crawler.engine.download_async(Request(url))
+        except Exception as e:
+            stats.inc_value("media/download_failed")
+            self.crawler.spider.logger.warning(f"Could not download image {url}: {e}")
+            return None
+        if response.status != 200:
+            stats.inc_value("media/download_failed")
+            return None
+        try:
+            result = await self._in_pool(
+                store_image, response.body, url, self.persona_id, self.index, self.store_dir, self.thumbnail_size
+            )
+        except Exception as e:
+            stats.inc_value("media/store_failed")
+            self.crawler.spider.logger.error(f"Could not store image {url}: {e}")
+            return None
+        stats.inc_value("media/duplicates" if result["duplicate"] else "media/stored")
+        stats.inc_value("media/downloaded_bytes", len(response.body))
+        return result
@@ -0,0 +1,75 @@
+"""
+Scraping profiles: how hard a crawl may hit each site.
+
+A profile is a set of Scrapy settings layered over settings.py for one crawl.
+DOWNLOAD_SLOTS gives each social site its own concurrency and starting delay
+(slots are keyed by host, so www. variants are listed too); AutoThrottle then
+adapts every slot's delay to the latency it observes, aiming at
+AUTOTHROTTLE_TARGET_CONCURRENCY requests in flight per site.
+"""
+
+from app.config import settings
+
+DEFAULT_PROFILE = "balanced"
+
+
+def _site_slots(policies: dict) -> dict:
+    slots = {}
+    for host, policy in policies.items():
+        slots[host] = policy
+        slots[f"www.{host}"] = policy
+    return slots
+
+
+SCRAPE_PROFILES = {
+    # One request at a time per site, for sites that block eagerly
+    "polite": {
+        "CONCURRENT_REQUESTS": 8,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 1,
+        "DOWNLOAD_DELAY": 1.0,
+        "AUTOTHROTTLE_START_DELAY": 2.0,
+        "AUTOTHROTTLE_MAX_DELAY": 30.0,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 1.0,
+        "DOWNLOAD_SLOTS": _site_slots({
+            "instagram.com": {"concurrency": 1, "delay": 2.0, "randomize_delay": True},
+            "x.com": {"concurrency": 1, "delay": 1.0, "randomize_delay": True},
+            "twitter.com": {"concurrency": 1, "delay": 1.0, "randomize_delay": True},
+        }),
+    },
+    "balanced": {
+        "CONCURRENT_REQUESTS": 32,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 4,
+        "DOWNLOAD_DELAY": 0.25,
+        "AUTOTHROTTLE_START_DELAY": 0.5,
+        "AUTOTHROTTLE_MAX_DELAY": 20.0,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 2.0,
+        "DOWNLOAD_SLOTS": _site_slots({
+            "instagram.com": {"concurrency": 2, "delay": 1.0, "randomize_delay": True},
+            "x.com": {"concurrency": 4, "delay": 0.25, "randomize_delay": True},
+            "twitter.com": {"concurrency": 4, "delay": 0.25, "randomize_delay": True},
+        }),
+    },
+    # For sources we control or that tolerate bulk fetching
+    "fast": {
+        "CONCURRENT_REQUESTS": 64,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+        "DOWNLOAD_DELAY": 0.0,
+        "AUTOTHROTTLE_START_DELAY": 0.1,
+        "AUTOTHROTTLE_MAX_DELAY": 10.0,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 4.0,
+        "DOWNLOAD_SLOTS": _site_slots({
+            "instagram.com": {"concurrency": 4, "delay": 0.5, "randomize_delay": True},
+            "x.com": {"concurrency": 8, "delay": 0.0},
+            "twitter.com": {"concurrency": 8, "delay": 0.0},
+        }),
+    },
+}
+
+
+def resolve_profile(name: str | None) -> str:
+    """The profile to use for a crawl (SCRAPE_PROFILE by default); unknown names fall back to "balanced"."""
+    name = name or settings.SCRAPE_PROFILE
+    if name not in SCRAPE_PROFILES:
+        print(f"Warning: Unknown scraping profile '{name}', using '{DEFAULT_PROFILE}'.")
+        return DEFAULT_PROFILE
+    return name
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
+
+from app.background.scraper.profiles import SCRAPE_PROFILES, resolve_profile
+from app.config import settings
+from app.services.clients import persona_collection_name
+
+SCRAPER_SETTINGS_MODULE = "app.background.scraper.settings"
+
+
+def get_scraper_settings() -> Settings:
+    """The project's Scrapy settings, loaded by module path (independent of scrapy.cfg and the cwd)."""
+    scraper_settings = Settings()
+    scraper_settings.setmodule(SCRAPER_SETTINGS_MODULE, priority="project")
+    return scraper_settings
+
+
+def crawl_job_key(urls: List[str]) -> str:
+    """Stable id for a set of URLs, so a retried job finds its own checkpoint and output."""
+    return hashlib.sha256("\n".join(sorted(set(urls))).encode("utf-8")).hexdigest()[:16]
+
+
+def crawl_paths(persona_name: str, urls: List[str]) -> tuple[str, str]:
+    """(feed file, JOBDIR) of a crawl, under the persona's own output directory."""
+    persona_dir = os.path.join(settings.SCRAPE_OUTPUT_DIR, persona_collection_name(persona_name))
+    job_key = crawl_job_key(urls)
+    return os.path.join(persona_dir, f"{job_key}.jsonl"), os.path.join(persona_dir, "jobs", job_key)
+
+
+def crawl_summary(stats: dict) -> dict:
+    """The figures of a crawl's Scrapy stats worth reporting per onboarding job."""
+    statuses = {
+        key.rsplit("/", 1)[1]: count for key, count in stats.items()
+        if key.startswith("downloader/response_status_count/")
+    }
+    return {
+        "finish_reason": stats.get("finish_reason"),
+        "elapsed_seconds": round(stats.get("elapsed_time_seconds", 0.0), 2),
+        "items": stats.get("item_scraped_count", 0),
+        "requests": stats.get("downloader/request_count", 0),
+        "response_bytes": stats.get("downloader/response_bytes", 0),
+        "statuses": statuses,
+        "retries": stats.get("retry/count", 0),
+        "cache_hits": stats.get("httpcache/hit", 0),  # still fresh, not requested at all
+        "cache_revalidations": stats.get("httpcache/revalidate", 0),  # answered 304 Not Modified
+        "cache_misses": stats.get("httpcache/miss", 0),
+        "not_modified": stats.get("incremental/not_modified", 0),
+        "seen_items_skipped": stats.get("incremental/seen_items", 0),
+        "cursors_saved": stats.get("incremental/cursors_saved", 0),
+        "posts_ingested": stats.get("social_content/posts_flushed", 0),
+        "posts_failed": stats.get("social_content/posts_failed", 0),
+        "media_stored": stats.get("media/stored", 0),
+        "media_duplicates": stats.get("media/duplicates", 0),
+        "media_skipped": stats.get("media/known_skipped", 0),
+        "errors": stats.get("log_count/ERROR", 0),
+    }
+
+
+def _run_crawl(persona_name: str, urls: List[str], profile: str | None = None, user_id: int | None = None) -> dict:
+    """
+    Runs one crawl to completion in the current (fresh) process.
+
+    The scheduler queue and seen-request filter are checkpointed in JOBDIR, so a
+    crawl that was interrupted picks up where it stopped when the same job runs
+    again, appending to its feed. The checkpoint is removed once the crawl
+    finishes cleanly; the next run of the job then starts a fresh feed.
+    The crawl's full Scrapy stats are written next to its feed. Model calls made
+    while ingesting scraped posts are billed to user_id.
+    """
+    from app.background.scraper.spiders.social import SocialSpider
+
+    feed_path, job_dir = crawl_paths(persona_name, urls)
+    resuming = os.path.isdir(job_dir) and bool(os.listdir(job_dir))
+    os.makedirs(job_dir, exist_ok=True)
+
+    profile = resolve_profile(profile)
+    scraper_settings = get_scraper_settings()
+    scraper_settings.setdict(SCRAPE_PROFILES[profile], priority="cmdline")
+    scraper_settings.set(
+        "HTTPCACHE_DIR", os.path.abspath(os.path.join(settings.SCRAPE_OUTPUT_DIR, "httpcache")), priority="cmdline"
+    )
+    scraper_settings.set(
+        "MEDIA_STORE", os.path.abspath(os.path.join(settings.SCRAPE_OUTPUT_DIR, "media")), priority="cmdline"
+    )
+    scraper_settings.set("JOBDIR", job_dir, priority="cmdline")
+    scraper_settings.set(
+        "FEEDS",
+        {feed_path: {"format": "jsonlines", "overwrite": not resuming}},
+        priority="cmdline",
+    )
+
+    process = CrawlerProcess(scraper_settings)
+    crawler = process.create_crawler(SocialSpider)
+    process.crawl(crawler, urls=urls, persona_name=persona_name, user_id=user_id)
+    process.start()  # blocks until the crawl is done; this process never starts another reactor
+
+    stats = crawler.stats.get_stats()
+    if stats.get("finish_reason") == "finished":
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    stats_path = os.path.splitext(feed_path)[0] + ".stats.json"
+    with open(stats_path, "w", encoding="utf-8") as f:
+        json.dump({"persona_name": persona_name, "profile": profile, "urls": urls, "stats": stats}, f, default=str, indent=2)
+    return {
+        "persona_name": persona_name,
+        "urls": len(urls),
+        "profile": profile,
+        **crawl_summary(stats),
+        "output": feed_path,
+        "stats_file": stats_path,
+    }
+
+
+class ScrapeRunner:
+    """
+    Runs Scrapy crawls in a pool of child processes.
+
+    A Twisted reactor cannot be restarted, so each crawl gets a fresh spawned
+    process (max_tasks_per_child=1) and the long-lived worker that submits it
+    never starts a reactor itself. Up to `max_parallel` crawls run at once;
+    further ones queue in the pool.
+    """
+
+    def __init__(self, max_parallel: int):
+        self.max_parallel = max_parallel
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_parallel,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        max_tasks_per_child=1,
+                    )
+        return self._executor
+
+    def submit(
+        self, persona_name: str, urls: List[str], profile: str | None = None, user_id: int | None = None
+    ) -> Future:
+        return self.executor.submit(_run_crawl, persona_name, urls, profile, user_id)
+
+    def run(self, persona_name: str, urls: List[str], profile: str | None = None, user_id: int | None = None) -> dict:
+        """Crawls the URLs for a persona with a scraping profile and returns the crawl's summary."""
+        return self.submit(persona_name, urls, profile, user_id).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+scrape_runner = ScrapeRunner(max_parallel=settings.SCRAPE_MAX_PARALLEL_CRAWLS)
@@ -9,8 +9,8 @@
 
 BOT_NAME = "social_scraper"
 
-SPIDER_MODULES = ["social_scraper.spiders"]
-NEWSPIDER_MODULE = "social_scraper.spiders"
+SPIDER_MODULES = ["app.background.scraper.spiders"]
+NEWSPIDER_MODULE = "app.background.scraper.spiders"
 
 ADDONS = {}
 
@@ -19,10 +19,21 @@ ADDONS = {}
 #USER_AGENT = "social_scraper (+http://www.yourdomain.com)"
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36'
 
+# Browser user agents, one picked per site for each crawl (RotatingUserAgentMiddleware)
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+]
+
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = False
 
 # Concurrency and throttling settings
+# These are the fallback; each crawl layers a scraping profile (profiles.py) with
+# per-site DOWNLOAD_SLOTS on top
 #CONCURRENT_REQUESTS = 16
 CONCURRENT_REQUESTS_PER_DOMAIN = 1
 DOWNLOAD_DELAY = 1
@@ -42,14 +53,17 @@ DOWNLOAD_DELAY = 1
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 #SPIDER_MIDDLEWARES = {
-#    "social_scraper.middlewares.SocialScraperSpiderMiddleware": 543,
+#    "app.background.scraper.middlewares.SocialScraperSpiderMiddleware": 543,
 #}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #DOWNLOADER_MIDDLEWARES = {
-#    "social_scraper.middlewares.SocialScraperDownloaderMiddleware": 543,
+#    "app.background.scraper.middlewares.SocialScraperDownloaderMiddleware": 543,
 #}
+DOWNLOADER_MIDDLEWARES = {
+    "app.background.scraper.middlewares.RotatingUserAgentMiddleware": 400, # before the built-in UserAgentMiddleware
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -60,12 +74,19 @@ DOWNLOAD_DELAY = 1
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
-   'scrapy.pipelines.images.ImagesPipeline': 1, # Enables the image downloading pipeline
+   # 'scrapy.pipelines.images.ImagesPipeline': 1, # Enables the image downloading pipeline
+   'app.background.scraper.pipelines.MediaStorePipeline': 1, # Content-addressed, deduplicated images per persona
+   'app.background.scraper.pipelines.SocialContentPipeline': 300, # Streams posts into the persona's RAG store
 }
 
+# Micro-batches of scraped posts sent to chunk -> embed -> upsert
+SOCIAL_CONTENT_FLUSH_ITEMS = 50
+SOCIAL_CONTENT_FLUSH_SECONDS = 5.0
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
+# Delays adapt to each site's latency; start, max and target come from the profile
+AUTOTHROTTLE_ENABLED = True
 # The initial download delay
 #AUTOTHROTTLE_START_DELAY = 5
 # The maximum download delay to be set in case of high latencies
@@ -83,8 +104,24 @@ ITEM_PIPELINES = {
 #HTTPCACHE_DIR = "httpcache"
 #HTTPCACHE_IGNORE_HTTP_CODES = []
 #HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# RFC2616Policy honours Cache-Control and revalidates stale pages with
+# If-None-Match / If-Modified-Since, so a re-scrape only downloads pages that
+# changed (a 304 is answered from the cache). The runner points HTTPCACHE_DIR
+# at SCRAPE_OUTPUT_DIR/httpcache, shared by all crawls.
+HTTPCACHE_ENABLED = True
+HTTPCACHE_POLICY = "scrapy.extensions.httpcache.RFC2616Policy"
+HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_IGNORE_HTTP_CODES = [401, 403, 429, 500, 502, 503, 504]
+HTTPCACHE_GZIP = True
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
 
 IMAGES_STORE = 'downloaded_images'
+
+# MediaStorePipeline; the runner points MEDIA_STORE at SCRAPE_OUTPUT_DIR/media
+MEDIA_STORE = 'media'
+MEDIA_THUMBNAIL_SIZE = 320
+MEDIA_WORKERS = 4
+# Images whose dHashes differ in at most this many of 64 bits are stored once
+MEDIA_NEAR_DUPLICATE_BITS = 4
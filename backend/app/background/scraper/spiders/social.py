@@ -1,10 +1,23 @@
 # In social_scraper/spiders/social.py
 
+import asyncio
+
 import scrapy
-import json
-import re
+
+from app.background.scraper.cursors import CursorState, load_cursors, save_cursors
+from app.background.scraper.media import get_or_create_persona_id
+from app.background.scraper.parsers import instagram_media, next_page_url, parse_tweets, site_of
 
 class SocialSpider(scrapy.Spider):
+    """
+    Crawls social profile and post pages incrementally.
+
+    Each start URL is a source with a cursor in the database (newest tweet ID
+    or post time, plus ETag/Last-Modified). Requests are conditional, items at
+    or below the high-water mark are dropped, and pagination stops at the first
+    page that ends in already-seen content. Cursors only move forward when the
+    crawl finished without losing items, so a failed run is simply redone.
+    """
     name = 'social'
     # We remove allowed_domains to handle any URL passed in.
 
@@ -15,76 +28,154 @@ class SocialSpider(scrapy.Spider):
         """
         # Get the urls passed in from our runner script
         urls = getattr(self, 'urls', [])
+        cursors = getattr(self, 'cursors', {})
         for url in urls:
-            yield scrapy.Request(url, callback=self.parse)
+            cursor = cursors.get(url, CursorState())
+            yield scrapy.Request(
+                url,
+                callback=self.parse,
+                errback=self.on_error,
+                headers=cursor.conditional_headers(),
+                meta={'source_url': url, 'handle_httpstatus_list': [304]},
+            )
+
+    async def start(self):
+        """Entry point on Scrapy 2.13+, which no longer calls start_requests by default."""
+        persona_name = getattr(self, 'persona_name', None) or 'Unknown'
+        self.persona_id = await asyncio.to_thread(get_or_create_persona_id, persona_name)
+        self.cursors = await asyncio.to_thread(load_cursors, self.persona_id, list(getattr(self, 'urls', [])))
+        self.updated_cursors = {}
+        self.failed_sources = set()
+        for request in self.start_requests():
+            yield request
+
+    # Site (host or parent domain) -> parser method, looked up once per response
+    parsers_by_site = {
+        'instagram.com': 'parse_instagram',
+        'x.com': 'parse_x',
+        'twitter.com': 'parse_x',
+    }
 
     def parse(self, response):
         """
         This is the main parsing method. It acts as a router, sending
         the response to the appropriate method based on the URL's domain.
         """
-        if 'instagram.com' in response.url:
-            yield from self.parse_instagram(response)
-        elif 'x.com' in response.url or 'twitter.com' in response.url:
-            yield from self.parse_x(response)
+        source_url = response.meta.get('source_url', response.url)
+        self._remember_validators(source_url, response)
+        if response.status == 304:
+            self.crawler.stats.inc_value('incremental/not_modified')
+            return
+
+        parser = site_of(response.url, self.parsers_by_site)
+        if parser is None:
+            self.logger.debug(f"No parser for {response.url}")
+            return
+        yield from getattr(self, parser)(response)
 
     def parse_instagram(self, response):
         """
         Parses an Instagram post page to download all images.
         Instagram embeds post data in a JSON object within a <script> tag.
         """
-        self.log(f"Processing Instagram URL: {response.url}")
-        
-        # Modern web pages often store data in JSON within script tags
-        script_text = response.xpath('//script[contains(., "xdt_api__v1__media__shortcode__web_info")]/text()').get()
-        
-        if not script_text:
-            self.log(f"Could not find Instagram data on {response.url}")
-            return
+        self.logger.debug(f"Processing Instagram URL: {response.url}")
+        source_url = response.meta.get('source_url', response.url)
+        cursor = self.cursors.get(source_url, CursorState())
 
         try:
-            # Extract the JSON part from the script
-            data_json = json.loads(script_text)
-            media_items = data_json['items']
-            
-            image_urls = []
-            for item in media_items:
-                # Check for multiple images in a carousel
-                if 'carousel_media' in item:
-                    for media in item['carousel_media']:
-                        # Get the highest resolution image
-                        image_url = media['image_versions2']['candidates'][0]['url']
-                        image_urls.append(image_url)
-                # Handle single image/video posts
-                else:
-                    if 'image_versions2' in item:
-                        image_url = item['image_versions2']['candidates'][0]['url']
-                        image_urls.append(image_url)
-
-            # Yield an item for the ImagesPipeline to process
-            if image_urls:
-                yield {
-                    'image_urls': image_urls,
-                    'source_url': response.url # For reference
-                }
-
-        except (json.JSONDecodeError, KeyError) as e:
-            self.log(f"Error parsing Instagram JSON on {response.url}: {e}")
+            # Only the post's "items" array is decoded, not the whole script blob
+            media_items = instagram_media(response.selector.root)
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            self.logger.warning(f"Error parsing Instagram JSON on {response.url}: {e}")
+            return
+
+        image_urls = []
+        for posted_at, item_image_urls in media_items:
+            if cursor.is_seen(posted_at=posted_at):
+                self.crawler.stats.inc_value('incremental/seen_items')
+                continue
+            self._advance(source_url, posted_at=posted_at)
+            image_urls.extend(item_image_urls)
+
+        # Yield an item for the media pipeline to process
+        if image_urls:
+            yield {
+                'image_urls': image_urls,
+                'source_url': source_url # The media pipeline holds this source back if an image fails
+            }
+        elif not media_items:
+            self.logger.debug(f"Could not find Instagram data on {response.url}")
 
     def parse_x(self, response):
         """
         Parses an X (Twitter) page to extract all tweets.
         """
-        self.log(f"Processing X/Twitter URL: {response.url}")
+        self.logger.debug(f"Processing X/Twitter URL: {response.url}")
+        source_url = response.meta.get('source_url', response.url)
+        cursor = self.cursors.get(source_url, CursorState())
 
         # X uses specific 'data-testid' attributes which are more stable than CSS classes
-        for tweet in response.css('article[data-testid="tweet"]'):
-            tweet_text_parts = tweet.css('div[data-testid="tweetText"] ::text').getall()
-            full_tweet_text = "".join(tweet_text_parts).strip()
-
-            if full_tweet_text:
-                yield {
-                    'tweet_text': full_tweet_text,
-                    'user': tweet.css('div[data-testid="User-Name"] span:contains("@")::text').get(),
-                    'source_url': response.url
-                }
\ No newline at end of file
+        last_seen = False
+        for tweet in parse_tweets(response.selector.root):
+            last_seen = cursor.is_seen(tweet['tweet_id'], tweet['posted_at'])
+            if last_seen:
+                self.crawler.stats.inc_value('incremental/seen_items')
+                continue
+            self._advance(source_url, tweet['tweet_id'], tweet['posted_at'])
+            tweet['source_url'] = response.url
+            yield tweet
+
+        # Pages run newest first: once a page ends in seen content (a pinned
+        # old tweet at the top does not count), older pages hold nothing new
+        next_url = next_page_url(response.selector.root)
+        if next_url and last_seen:
+            self.crawler.stats.inc_value('incremental/pagination_stopped')
+        elif next_url:
+            yield response.follow(
+                next_url, callback=self.parse, errback=self.on_error, meta={'source_url': source_url}
+            )
+
+    def on_error(self, failure):
+        source_url = failure.request.meta.get('source_url', failure.request.url)
+        self.failed_sources.add(source_url)
+        self.logger.warning(f"Request for {failure.request.url} failed: {failure.value}")
+
+    def _cursor(self, source_url: str) -> CursorState:
+        if source_url not in self.updated_cursors:
+            self.updated_cursors[source_url] = self.cursors.get(source_url, CursorState())
+        return self.updated_cursors[source_url]
+
+    def _advance(self, source_url: str, item_id=None, posted_at=None):
+        self.updated_cursors[source_url] = self._cursor(source_url).advance(item_id, posted_at)
+
+    def _remember_validators(self, source_url: str, response):
+        if response.request.url != source_url:
+            return  # validators belong to the start page, not to later pages
+        cursor = self._cursor(source_url)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        self.updated_cursors[source_url] = CursorState(
+            last_item_id=cursor.last_item_id,
+            last_item_at=cursor.last_item_at,
+            etag=etag.decode('latin-1') if etag else cursor.etag,
+            last_modified=last_modified.decode('latin-1') if last_modified else cursor.last_modified,
+            items_seen=cursor.items_seen,
+        )
+
+    def closed(self, reason):
+        """
+        Moves the cursors forward, unless items could have been lost (they are redone next time).
+        Sources whose requests or media failed keep their old cursor; failed post ingestion
+        holds back every source, since a flush mixes posts of all of them.
+        """
+        stats = self.crawler.stats
+        lost_items = stats.get_value('social_content/posts_failed', 0)
+        if reason != 'finished' or lost_items:
+            self.logger.warning(f"Not advancing source cursors (reason: {reason}, lost items: {lost_items}).")
+            return
+        cursors = {
+            source_url: cursor for source_url, cursor in getattr(self, 'updated_cursors', {}).items()
+            if source_url not in self.failed_sources
+        }
+        save_cursors(self.persona_id, cursors)
+        stats.set_value('incremental/cursors_saved', len(cursors))
@@ -1,26 +1,97 @@
 from typing import List
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
-from app.background.scraper.spiders.social import SocialSpider
+from app.background.celery_app import celery_app
+from app.background.document_process.rag_builder import add_documents_to_vectorstore, cleanup_uploaded_documents
+from app.background.scraper.runner import scrape_runner
+from app.services.usage import bill_usage_to, usage_recorder
 
-def process_all_urls(urls: List[str]):
+# def process_all_urls(urls: List[str]):
+#     print("\n--- Starting background URL processing ---")
+#     if not urls:
+#         print("No URLs to process.")
+#         return
+#
+#     process = CrawlerProcess(settings={
+#         "FEEDS": {
+#             "tweets.jsonl": {"format": "jsonlines", "overwrite": True},
+#         },
+#         **get_project_settings() # Use settings from settings.py
+#     })
+#
+#     # Start the crawler with our spider and pass the URLs
+#     process.crawl(SocialSpider, urls=urls)
+#
+#     # The script will block here until the crawling is finished
+#     process.start()
+#
+#     print("--- Finished background URL processing ---")
+
+def process_all_urls(
+    urls: List[str], persona_name: str = "Unknown", profile: str | None = None, user_id: int | None = None
+) -> dict | None:
     print("\n--- Starting background URL processing ---")
     if not urls:
         print("No URLs to process.")
-        return
-        
-    process = CrawlerProcess(settings={
-        "FEEDS": {
-            "tweets.jsonl": {"format": "jsonlines", "overwrite": True},
-        },
-        **get_project_settings() # Use settings from settings.py
-    })
-
-    # Start the crawler with our spider and pass the URLs
-    process.crawl(SocialSpider, urls=urls)
-    
-    # The script will block here until the crawling is finished
-    process.start()
-        
-        
-    print("--- Finished background URL processing ---")
+        return None
+
+    # Crawls run in child processes, so this works any number of times per worker
+    summary = scrape_runner.run(persona_name, urls, profile, user_id)
+    print(f"--- Finished background URL processing: {summary} ---")
+    return summary
+
+
+#####################
+# Queued jobs
+#####################
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=30)
+def ingest_documents(
+    self,
+    document_paths: List[str],
+    persona_name: str,
+    user_id: int | None = None,
+    remove_documents: List[str] | None = None,
+    full_resync: bool = False,
+):
+    """
+    Embeds uploaded onboarding documents into the persona's collection, billing model calls to user_id.
+    Earlier documents are removed only if named in remove_documents, or missing from a full_resync upload.
+    """
+    def report_progress(embedded: int, total: int | None):
+        self.update_state(state="PROGRESS", meta={"embedded_chunks": embedded, "total_chunks": total})
+
+    try:
+        with bill_usage_to(user_id):
+            add_documents_to_vectorstore(
+                document_paths,
+                persona_name,
+                on_progress=report_progress,
+                remove_documents=remove_documents or (),
+                full_resync=full_resync,
+            )
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            cleanup_uploaded_documents(document_paths)
+            raise
+        # Keep the uploaded files around for the retry, backing off exponentially
+        raise self.retry(exc=e, countdown=self.default_retry_delay * 2 ** self.request.retries)
+    finally:
+        # Workers have no periodic flush; write this job's usage before taking the next one
+        usage_recorder.flush()
+
+    cleanup_uploaded_documents(document_paths)
+    return {"persona_name": persona_name, "documents": len(document_paths)}
+
+
+@celery_app.task(bind=True, max_retries=2, default_retry_delay=60)
+def scrape_urls(
+    self, urls: List[str], persona_name: str = "Unknown", user_id: int | None = None, profile: str | None = None
+):
+    """
+    Scrapes the submitted social URLs for a persona, billing model calls to user_id; a retry resumes
+    from the crawl's checkpoint. The result is the job's crawl statistics.
+    """
+    try:
+        summary = process_all_urls(urls, persona_name, profile, user_id)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=self.default_retry_delay * 2 ** self.request.retries)
+    return summary or {"urls": 0}
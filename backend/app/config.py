@@ -14,6 +14,92 @@ class Settings(BaseSettings):
     PINECONE_INDEX_NAME: str
     DATABASE_URL: str
 
+    # Authentication: bearer JWTs verified locally with a shared secret
+    AUTH_JWT_SECRET: str | None = None
+    AUTH_JWT_ALGORITHM: str = "HS256"
+    AUTH_JWT_ISSUER: str | None = None
+    AUTH_JWT_AUDIENCE: str | None = None
+    AUTH_TOKEN_TTL_SECONDS: int = 60 * 60
+    AUTH_DEV_USER_ID: int | None = None  # acts as this user when no token is sent (development only)
+
+    # Connection pools (per process, per engine); SQLite runs in WAL mode
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 30 * 60
+    SQLITE_BUSY_TIMEOUT_SECONDS: int = 30
+
+    # Vector store / model clients shared across requests
+    CHROMA_PERSIST_DIRECTORY: str = "db"
+    CHROMA_COLLECTION_CACHE_SIZE: int = 32
+    EMBEDDING_MODEL: str = "text-embedding-3-large"
+
+    # Hybrid retrieval: per-persona BM25 index fused with the vector search
+    HYBRID_RETRIEVAL_ENABLED: bool = True
+    LEXICAL_INDEX_DIRECTORY: str | None = None  # defaults to <CHROMA_PERSIST_DIRECTORY>/lexical
+    HYBRID_CANDIDATES: int = 20  # results taken from each retriever before fusion
+    RRF_K: int = 60
+
+    # Query embedding cache (in-memory LRU, optionally backed by Redis)
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    EMBEDDING_CACHE_REDIS_URL: str | None = None
+
+    # Semantic answer cache for first turns, scoped per persona (opt-in)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    RESPONSE_CACHE_MAX_ENTRIES_PER_PERSONA: int = 500
+    RESPONSE_CACHE_TTL_SECONDS: int = 60 * 60
+
+    # Chat models; sessions pick one by name or tier, unknown names fall back to the default
+    CHAT_DEFAULT_MODEL: str = "gpt-4o"
+    CHAT_ALLOWED_MODELS: list[str] = ["gpt-4o", "gpt-4o-mini", "gpt-4.1", "gpt-4.1-mini"]
+    CHAT_MODEL_ALIASES: dict[str, str] = {
+        "fast": "gpt-4o-mini",
+        "standard": "gpt-4o",
+    }
+    # Legacy session defaults that were always served with the default model; they keep getting it
+    CHAT_LEGACY_MODELS: list[str] = ["gpt-3.5-turbo"]
+    CHAT_MAX_TOKENS_LIMIT: int = 4000
+    CHAT_MAX_RAG_K: int = 20
+
+    # Personas and their rendered system prompts, cached per process
+    PERSONA_CACHE_TTL_SECONDS: int = 10 * 60
+    PERSONA_CACHE_MAX_ENTRIES: int = 1000
+
+    # Conversation history sent to the model on each turn
+    HISTORY_MAX_MESSAGES: int = 20
+    HISTORY_TOKEN_BUDGET: int = 3000
+    HISTORY_SUMMARY_ENABLED: bool = False
+    HISTORY_SUMMARY_MODEL: str = "gpt-4o-mini"
+    HISTORY_SUMMARY_INPUT_TOKENS: int = 6000
+    HISTORY_SUMMARY_MAX_TOKENS: int = 300
+
+    # Document ingestion: embedding batches in flight and retry policy
+    INGEST_EMBED_BATCH_SIZE: int = 100
+    INGEST_EMBED_CONCURRENCY: int = 4
+    INGEST_EMBED_MAX_RETRIES: int = 6
+    INGEST_PARSE_WORKERS: int = 0  # processes for parsing/splitting documents; 0 = one per CPU
+    CONTENT_TEXT_PREVIEW_CHARS: int = 20000  # excerpt kept on Content; chunks hold the full text
+
+    # Token usage accounting, aggregated into daily Usage rows
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 30.0
+
+    # Background job queue (Celery on Redis)
+    CELERY_BROKER_URL: str = "redis://localhost:6379/0"
+    CELERY_RESULT_BACKEND: str = "redis://localhost:6379/1"
+    CELERY_TASK_ALWAYS_EAGER: bool = False
+    INGEST_JOB_PRIORITY: int = 7
+    SCRAPE_JOB_PRIORITY: int = 3
+    PERSONA_EVENTS_REDIS_URL: str | None = None  # defaults to the broker when it is Redis
+    # Uploaded files are handed to workers through this (shared) directory
+    UPLOAD_DIR: str = "uploads"
+
+    # Scraping: crawls run in child processes, output and checkpoints per persona
+    SCRAPE_MAX_PARALLEL_CRAWLS: int = 4
+    SCRAPE_OUTPUT_DIR: str = "scraped"
+    SCRAPE_PROFILE: str = "balanced"  # polite | balanced | fast, see scraper/profiles.py
+
     # This tells Pydantic to load variables from a .env file
     model_config = SettingsConfigDict(env_file=".env")
 
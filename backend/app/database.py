@@ -1,13 +1,130 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from app.config import settings
 
+# Async drivers used by the request path for each supported sync backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+# Driver for URLs that name only the backend (SQLAlchemy 2.1 would otherwise pick psycopg 3,
+# while requirements.txt ships psycopg2)
+SYNC_DRIVERS = {
+    "postgresql": "postgresql+psycopg2",
+}
+
+
+def get_sync_database_url(database_url: str) -> str:
+    """Pins the sync driver shipped in requirements.txt when the URL does not name one."""
+    url = make_url(database_url)
+    sync_driver = SYNC_DRIVERS.get(url.drivername)
+    if sync_driver is None:
+        return database_url
+    return url.set(drivername=sync_driver).render_as_string(hide_password=False)
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Maps a sync database URL onto the matching async driver."""
+    url = make_url(database_url)
+    async_driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if async_driver is None:
+        raise ValueError(f"No async driver configured for database backend '{url.get_backend_name()}'")
+    return url.set(drivername=async_driver).render_as_string(hide_password=False)
+
+
+# Applied to every new SQLite connection: WAL lets readers run alongside the single
+# writer, and the busy timeout makes writers wait for the lock instead of failing
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # safe with WAL, avoids an fsync per commit
+    "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_SECONDS * 1000,
+    "temp_store": "MEMORY",
+}
+
+
+def _is_sqlite_memory(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(database_url: str) -> dict:
+    """Pool and driver options for a database URL, depending on its backend."""
+    url = make_url(database_url)
+    options = {}
+    if url.get_backend_name() == "sqlite":
+        # Sessions are used from worker threads; sqlite3's timeout is in seconds
+        options["connect_args"] = {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_SECONDS}
+        if _is_sqlite_memory(url):
+            return options  # in-memory databases keep SQLAlchemy's single-connection pool
+    else:
+        options["pool_pre_ping"] = True  # drop connections the server or a proxy closed
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    )
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def make_engines(database_url: str):
+    """Creates the sync and async engines for a database URL, configured for its backend."""
+    sync_database_url = get_sync_database_url(database_url)
+    sync_engine = create_engine(sync_database_url, **engine_options(sync_database_url))
+    async_database_url = get_async_database_url(database_url)
+    async_engine = create_async_engine(async_database_url, **engine_options(async_database_url))
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return sync_engine, async_engine
+
+
+def _pool_stats(pool) -> dict:
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
+
+
+def pool_stats() -> dict:
+    """Connection pool usage of both engines, for /metrics."""
+    return {"sync": _pool_stats(engine.pool), "async": _pool_stats(async_engine.pool)}
+
+
+def upsert_insert():
+    """The dialect's insert(), which supports ON CONFLICT clauses."""
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Upserts are not supported for database backend '{dialect}'")
+    return insert
+
+
 DATABASE_URL = settings.DATABASE_URL
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine, async_engine = make_engines(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # --- Dependency to get a DB session ---
 def get_db():
     db = SessionLocal()
@@ -16,5 +133,10 @@ def get_db():
     finally:
         db.close()
 
+# --- Dependency to get an async DB session (used by the chat path) ---
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def create_db_and_tables():
     Base.metadata.create_all(bind=engine)
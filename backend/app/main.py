@@ -1,19 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict
 from app.routers import onboarding
 from app.routers import chat
 
-from app.database import create_db_and_tables
+from app.database import create_db_and_tables, pool_stats
+from app.services.auth import ensure_dev_user
+from app.services.clients import clients
+from app.services.invalidation import listen_for_persona_changes
+from app.services.persona_registry import persona_registry
+from app.services.response_cache import response_cache
+from app.services.usage import usage_recorder
 
 
 create_db_and_tables()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ensure_dev_user()
+    # Open the shared clients once and warm up the hottest persona collections
+    try:
+        clients.warm_up()
+    except Exception as e:
+        print(f"Warning: Client warm-up failed, collections will open on first use. Error: {e}")
+    # Drop cached persona state when background workers re-ingest a persona
+    persona_listener = asyncio.create_task(listen_for_persona_changes())
+    # Write buffered token usage to the daily Usage rows in batches
+    usage_flusher = asyncio.create_task(usage_recorder.run_periodic_flush())
+    yield
+    persona_listener.cancel()
+    usage_flusher.cancel()
+    await asyncio.gather(usage_flusher, return_exceptions=True)  # lets the final flush finish
+    await clients.aclose()
+
+
 # Create a new FastAPI app instance
 app = FastAPI(
     title="BACKEND: AI-Powered Fan Engagement Platform",
     description="This project is the backend for an AI-powered fan engagement platform. It allows users to create AI personas of public figures by scraping their social media content and documents. These AI personas can then be used for real-time chat interactions.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -30,4 +59,14 @@ app.include_router(chat.router)
 
 @app.get("/", tags=["Root"])
 def get_root() -> Dict[str, str]:
-    return {"message": "BACKEND: AI-Powered Fan Engagement Platform"}
\ No newline at end of file
+    return {"message": "BACKEND: AI-Powered Fan Engagement Platform"}
+
+@app.get("/metrics", tags=["Root"])
+def get_metrics() -> Dict[str, Dict]:
+    return {
+        "embedding_cache": clients.embedding_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "persona_registry": persona_registry.stats(),
+        "usage": usage_recorder.stats(),
+        "db_pools": pool_stats(),
+    }
\ No newline at end of file
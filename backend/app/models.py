@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum, ForeignKey, Text, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 import datetime
 from app.database import Base
 import enum
 
+
+def utcnow() -> datetime.datetime:
+    """Current time as naive UTC, matching the timezone-less DateTime columns (asyncpg rejects aware values)."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
 # Enum definitions
 class UserRole(enum.Enum):
     INFLUENCER = "influencer"
@@ -20,6 +26,7 @@ class ContentType(enum.Enum):
     DOCUMENT = "document"
     FAQ = "faq"
     KNOWLEDGE_BASE = "knowledge_base"
+    SOCIAL_POST = "social_post"
 
 class MessageType(enum.Enum):
     USER = "user"
@@ -66,8 +73,8 @@ class Influencer(Base):
     display_name = Column(String(100))
     bio = Column(Text)
     avatar_url = Column(String(500))
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
-    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
 
     contents = relationship("Content", back_populates="influencer")
     personas = relationship("Persona", back_populates="influencer")
@@ -84,8 +91,8 @@ class User(Base):
     display_name = Column(String(100))
     bio = Column(Text)
     avatar_url = Column(String(500))
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
-    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
 
     chat_sessions = relationship("ChatSession", back_populates="user")
     messages = relationship("Message", back_populates="user")
@@ -96,7 +103,7 @@ class Persona(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
     influencer_id = Column(Integer, ForeignKey("influencers.id"), nullable=True)
     influencer = relationship("Influencer", back_populates="personas")
 
@@ -110,10 +117,11 @@ class Content(Base):
     tags = Column(Text)
     extra_metadata = Column(Text)
     chroma_document_id = Column(String(255), unique=True, index=True)
+    source_hash = Column(String(64), index=True)  # sha256 of the source file, to skip unchanged re-uploads
     influencer_id = Column(Integer, ForeignKey("influencers.id"), nullable=False, index=True)
     influencer = relationship("Influencer", back_populates="contents")
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
-    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
     published_at = Column(DateTime, index=True)
     content_chunks = relationship("ContentChunk", back_populates="content", cascade="all, delete-orphan")
 
@@ -125,10 +133,11 @@ class ContentChunk(Base):
     chunk_text = Column(Text, nullable=False)
     chunk_index = Column(Integer, nullable=False)
     chroma_chunk_id = Column(String(255), unique=True, index=True)
+    content_hash = Column(String(64), index=True)  # sha256 of chunk_text
     start_position = Column(Integer)
     end_position = Column(Integer)
     token_count = Column(Integer)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
     content = relationship("Content", back_populates="content_chunks")
 
 class ChatSession(Base):
@@ -137,19 +146,25 @@ class ChatSession(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     session_name = Column(String(255))
     system_prompt = Column(Text)
-    model_name = Column(String(50), default="gpt-3.5-turbo")
+    model_name = Column(String(50), default="standard")  # model or tier, see CHAT_MODEL_ALIASES
     temperature = Column(Float, default=0.7)
     max_tokens = Column(Integer, default=1000)
     use_rag = Column(Boolean, default=True)
     rag_k = Column(Integer, default=5)
     is_active = Column(Boolean, default=True, index=True)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
-    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc))
+    history_summary = Column(Text)  # Rolling summary of turns that fell out of the history window
+    summary_through_message_id = Column(Integer)  # Last Message.id folded into history_summary
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
     user = relationship("User", back_populates="chat_sessions")
     messages = relationship("Message", back_populates="chat_session", cascade="all, delete-orphan")
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # History windows and pagination read one session's messages in time order
+        Index("ix_messages_session_created", "chat_session_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True)
     chat_session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -161,17 +176,60 @@ class Message(Base):
     model_used = Column(String(50))
     tokens_used = Column(Integer)
     finish_reason = Column(String(50))
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), index=True)
+    created_at = Column(DateTime, default=utcnow, index=True)
     chat_session = relationship("ChatSession", back_populates="messages")
     user = relationship("User", back_populates="messages")
 
 class Usage(Base):
     __tablename__ = "usage"
+    __table_args__ = (
+        # One aggregated row per user and day, upserted in batches by the usage recorder
+        UniqueConstraint("user_id", "date", name="uq_usage_user_date"),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     tokens_used = Column(Integer, default=0)
     api_calls = Column(Integer, default=0)
     cost_cents = Column(Integer, default=0)
-    date = Column(DateTime, nullable=False, index=True)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
-    user = relationship("User", back_populates="usage_entries")
\ No newline at end of file
+    date = Column(DateTime, nullable=False, index=True)  # UTC day
+    created_at = Column(DateTime, default=utcnow)
+    user = relationship("User", back_populates="usage_entries")
+
+
+class MediaAsset(Base):
+    __tablename__ = "media_assets"
+    __table_args__ = (
+        # A persona's media is keyed by the CDN file name, so URL variants of an image are fetched once
+        UniqueConstraint("persona_id", "source_key", name="uq_media_persona_source"),
+    )
+    id = Column(Integer, primary_key=True)
+    persona_id = Column(Integer, ForeignKey("personas.id"), nullable=False, index=True)
+    source_url = Column(String(2048), nullable=False)
+    source_key = Column(String(255), nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)  # of the downloaded bytes
+    dhash = Column(String(16), nullable=False, index=True)  # 64-bit perceptual difference hash, hex
+    width = Column(Integer)
+    height = Column(Integer)
+    image_format = Column(String(20))
+    file_size = Column(Integer)
+    storage_path = Column(String(255), nullable=False)  # relative to the media store; shared by duplicates
+    thumbnail_path = Column(String(255))
+    duplicate_of_id = Column(Integer, ForeignKey("media_assets.id"), nullable=True)  # set for reposts
+    created_at = Column(DateTime, default=utcnow)
+    persona = relationship("Persona")
+
+class SourceCursor(Base):
+    __tablename__ = "source_cursors"
+    __table_args__ = (
+        UniqueConstraint("persona_id", "source_url", name="uq_source_cursor_persona_url"),
+    )
+    id = Column(Integer, primary_key=True)
+    persona_id = Column(Integer, ForeignKey("personas.id"), nullable=False, index=True)
+    source_url = Column(String(2048), nullable=False)  # the URL a crawl starts from, e.g. a profile page
+    last_item_id = Column(String(64))  # newest tweet ID ingested from the source
+    last_item_at = Column(DateTime)  # newest post timestamp ingested from the source (UTC)
+    etag = Column(String(255))
+    last_modified = Column(String(64))
+    items_seen = Column(Integer, default=0)
+    last_crawled_at = Column(DateTime)
+    persona = relationship("Persona")
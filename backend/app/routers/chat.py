@@ -1,15 +1,30 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import base64
+import datetime
+import json
+from dataclasses import dataclass, field
 from typing import List
-from langchain_chroma import Chroma
+
+import anyio
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
 from app.config import settings
-from langchain_openai import OpenAIEmbeddings
-from sqlalchemy.orm import Session, relationship
-import datetime
-from openai import OpenAI
-from app.database import get_db, engine, Base
-from app.services.auth import get_current_user
-from app.models import User, ChatSession, Message, MessageType, Persona
+from app.database import AsyncSessionLocal, get_db, get_async_db
+from app.models import ChatSession, Message, MessageType, utcnow
+from app.services.auth import Principal, get_principal
+from app.services.chat_engine import ChatOptions, resolve_chat_options
+from app.services.clients import clients
+from app.services.history import HistoryWindow, load_history_window, summarize_older_turns
+from app.services.persona_registry import PersonaPrompt, persona_registry, render_context
+from app.services.response_cache import CachedResponse, response_cache, response_variant
+from app.services.retrieval import retrieve_context
+from app.services.tokens import count_message_tokens, count_tokens
+from app.services.usage import TokenUsage, usage_recorder, usage_user_id
 
 class ChatMessage(BaseModel):
     role: str
@@ -25,9 +40,22 @@ class ChatResponse(BaseModel):
     ai_response: str
     retrieved_context: List[str] = []
 
+class StartChatRequest(BaseModel):
+    model_name: str | None = Field(None, description="Model or tier ('fast', 'standard') for this session.")
+    temperature: float | None = Field(None, ge=0.0, le=2.0)
+    max_tokens: int | None = Field(None, ge=1)
+    use_rag: bool | None = Field(None, description="If false, replies use the persona only, without retrieval.")
+    rag_k: int | None = Field(None, ge=1, description="Number of context chunks to retrieve per turn.")
+    system_prompt: str | None = Field(None, description="Extra instructions appended to the persona prompt.")
+
 class HistoryResponse(BaseModel):
     conversation_id: int
     messages: List[ChatMessage]
+    next_cursor: str | None = Field(None, description="Cursor for the next page of history, if any.")
+
+DEFAULT_HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 500
+HISTORY_STREAM_BATCH_SIZE = 500
 
 router = APIRouter(
     prefix="/chat",
@@ -50,14 +78,18 @@ router = APIRouter(
 @router.post("/start", response_model=HistoryResponse)
 @router.post("/start/", response_model=HistoryResponse)
 def start_new_conversation(
+    request: StartChatRequest | None = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    principal: Principal = Depends(get_principal),
 ):
+    # Only settings given explicitly override the column defaults
+    session_settings = request.model_dump(exclude_none=True) if request else {}
     new_session = ChatSession(
-        user_id=current_user.id,
+        **session_settings,
+        user_id=principal.user_id,
         is_active=True,
-        created_at=datetime.datetime.now(datetime.timezone.utc),
-        updated_at=datetime.datetime.now(datetime.timezone.utc)
+        created_at=utcnow(),
+        updated_at=utcnow()
     )
     db.add(new_session)
     db.commit()
@@ -82,22 +114,85 @@ def start_new_conversation(
 #     messages = [ChatMessage(role=msg.role, content=msg.content) for msg in conversation.messages]
 #     return HistoryResponse(conversation_id=conversation.id, messages=messages)
 
-@router.get("/history/{conversation_id}", response_model=HistoryResponse)
-def get_conversation_history(conversation_id: int, db: Session = Depends(get_db)):
-    """Retrieves all messages for a given chat session."""
-    chat_session = db.query(ChatSession).filter(ChatSession.id == conversation_id).first()
-    if not chat_session:
-        raise HTTPException(status_code=404, detail="Chat session not found.")
-    
-    messages = []
-    for msg in chat_session.messages:
-        messages.append(
-            ChatMessage(
-                role=msg.message_type.value,  # Enum to string
-                content=msg.content
+def _encode_history_cursor(created_at: datetime.datetime, message_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{message_id}".encode()).decode()
+
+
+def _decode_history_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid history cursor.")
+
+
+def _history_page_query(conversation_id: int, cursor: str | None):
+    """Column-only query over a session's messages in (created_at, id) order, after the cursor."""
+    query = select(Message.id, Message.created_at, Message.message_type, Message.content).where(
+        Message.chat_session_id == conversation_id
+    )
+    if cursor:
+        cursor_created_at, cursor_id = _decode_history_cursor(cursor)
+        query = query.where(
+            or_(
+                Message.created_at > cursor_created_at,
+                and_(Message.created_at == cursor_created_at, Message.id > cursor_id),
             )
         )
-    return HistoryResponse(conversation_id=chat_session.id, messages=messages)
+    return query.order_by(Message.created_at, Message.id)
+
+
+@router.get("/history/{conversation_id}", response_model=HistoryResponse)
+async def get_conversation_history(
+    conversation_id: int,
+    cursor: str | None = Query(None, description="Opaque cursor from a previous page's next_cursor."),
+    limit: int | None = Query(None, ge=1, le=MAX_HISTORY_PAGE_SIZE, description="Page size (all remaining messages in ndjson mode if omitted)."),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="'ndjson' streams one message per line."),
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal),
+):
+    """
+    Retrieves the messages of a chat session, oldest first, one keyset page at a time.
+
+    Pages are addressed by an opaque (created_at, id) cursor, so every page costs
+    the same regardless of how deep into the session it is. With format=ndjson
+    the messages are streamed row by row instead of built into one response.
+    """
+    exists = await db.scalar(
+        select(ChatSession.id).where(ChatSession.id == conversation_id, ChatSession.user_id == principal.user_id)
+    )
+    if not exists:
+        raise HTTPException(status_code=404, detail="Chat session not found.")
+
+    query = _history_page_query(conversation_id, cursor)
+
+    if format == "ndjson":
+        if limit:
+            query = query.limit(limit)
+
+        async def ndjson_stream():
+            async with AsyncSessionLocal() as stream_db:
+                result = await stream_db.stream(query.execution_options(yield_per=HISTORY_STREAM_BATCH_SIZE))
+                async for row in result:
+                    yield json.dumps({
+                        "id": row.id,
+                        "role": row.message_type.value,  # Enum to string
+                        "content": row.content,
+                        "created_at": row.created_at.isoformat() if row.created_at else None,
+                        "cursor": _encode_history_cursor(row.created_at, row.id),
+                    }) + "\n"
+
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+    page_size = limit or DEFAULT_HISTORY_PAGE_SIZE
+    rows = (await db.execute(query.limit(page_size + 1))).all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_history_cursor(rows[-1].created_at, rows[-1].id)
+
+    messages = [ChatMessage(role=row.message_type.value, content=row.content) for row in rows]
+    return HistoryResponse(conversation_id=conversation_id, messages=messages, next_cursor=next_cursor)
 
 #####################
 # Chat Route
@@ -208,121 +303,334 @@ def get_conversation_history(conversation_id: int, db: Session = Depends(get_db)
 #         retrieved_context=retrieved_context_snippets
 #     )
 
-@router.post("/", response_model=ChatResponse)
-async def handle_chat_request(request: ChatRequest, db: Session = Depends(get_db)):
-    if not settings.OPENAI_API_KEY or "your_openai_key" in settings.OPENAI_API_KEY:
-        raise HTTPException(status_code=500, detail="OpenAI API key is not configured on the server.")
-    
-    # Load or create ChatSession
-    if request.conversation_id:
-        chat_session = db.query(ChatSession).filter(ChatSession.id == request.conversation_id).first()
-        if not chat_session:
+async def _load_or_create_chat_session(
+    db: AsyncSession, conversation_id: int | None, principal: Principal
+) -> ChatSession:
+    if conversation_id:
+        chat_session = await db.get(ChatSession, conversation_id)
+        # Other users' sessions look exactly like missing ones
+        if not chat_session or chat_session.user_id != principal.user_id:
             raise HTTPException(status_code=404, detail="Chat session not found.")
-    else:
-        chat_session = ChatSession(user_id=1, is_active=True)  # Modify user_id as needed or get current user context
-        db.add(chat_session)
-        db.commit()
-        db.refresh(chat_session)
-    
-    # Load Persona for the influencer name provided
-    persona = db.query(Persona).filter(Persona.name == request.influencer_name).first()
+        return chat_session
+
+    chat_session = ChatSession(user_id=principal.user_id, is_active=True)
+    db.add(chat_session)
+    await db.commit()
+    await db.refresh(chat_session)
+    return chat_session
+
+
+async def _load_persona(db: AsyncSession, influencer_name: str) -> PersonaPrompt:
+    persona = await persona_registry.get(db, influencer_name)  # cached with its rendered prompts
     if not persona:
         raise HTTPException(
             status_code=404,
-            detail=f"No persona found for influencer '{request.influencer_name}'"
-        )
-    
-    collection_name = f"persona_{request.influencer_name.lower().replace(' ', '_')}"
-    
-    # --- Retrieve chat history from DB ---
-    history_from_db = [{"role": msg.message_type.value, "content": msg.content} for msg in chat_session.messages]
-    
-    retrieved_context_snippets = []
-    try:
-        embeddings = OpenAIEmbeddings(model="text-embedding-3-large", openai_api_key=settings.OPENAI_API_KEY)
-        vectorstore = Chroma(
-            collection_name=collection_name,
-            persist_directory="db",
-            embedding_function=embeddings
+            detail=f"No persona found for influencer '{influencer_name}'"
         )
+    return persona
 
-        retrieved_docs = vectorstore.similarity_search(request.user_query, k=3)  # Top 3 chunks
-        retrieved_context_snippets = [doc.page_content for doc in retrieved_docs]
-        print(f"Retrieved {len(retrieved_context_snippets)} context snippets from ChromaDB.")
-        
-        for i, doc in enumerate(retrieved_docs):
-            if hasattr(doc, 'metadata') and doc.metadata:
-                print(f"Context {i+1} metadata: {doc.metadata}")
 
+async def _retrieve_snippets(persona_name: str, user_query: str, k: int) -> List[str]:
+    try:
+        retrieved_docs = await retrieve_context(persona_name, user_query, k=k)  # Top k chunks
     except Exception as e:
         print(f"Warning: Could not retrieve from ChromaDB. Proceeding without context. Error: {e}")
-    
-    # Construct system prompt incorporating persona and retrieved context
-    if retrieved_context_snippets:
-        system_prompt = (
-            f"You are an AI assistant embodying this persona:\n\n{persona.description}\n\n"
-            f"Base all your answers on the following retrieved context where possible."
-            f"If the context doesn't fully answer the user's question, respond using the tone, "
-            f"style, and personality of {persona.name}.\n\n"
-            "--- Relevant Context ---\n"
-            + "\n".join([f"Context {i+1}: {snippet}" for i, snippet in enumerate(retrieved_context_snippets)])
-            + "\n--- End Context ---\n"
-            "Instructions:\n"
-            f"- Stay in character as {persona.name}\n"
-            "- Answer primarily using the provided context\n"
-            "- If context is insufficient, acknowledge it and extrapolate\n"
-            "- Be conversational and engaging"
+        return []
+
+    print(f"Retrieved {len(retrieved_docs)} context snippets from ChromaDB.")
+    for i, doc in enumerate(retrieved_docs):
+        if hasattr(doc, 'metadata') and doc.metadata:
+            print(f"Context {i+1} metadata: {doc.metadata}")
+    return [doc.page_content for doc in retrieved_docs]
+
+
+@dataclass
+class ChatTurn:
+    """Everything loaded for one chat turn before the model is called."""
+    chat_session: ChatSession
+    persona: PersonaPrompt
+    options: ChatOptions
+    history: HistoryWindow
+    messages: List[dict] = field(default_factory=list)
+    retrieved_context: List[str] = field(default_factory=list)
+    query_vector: List[float] | None = None
+    cached_response: CachedResponse | None = None
+
+    @property
+    def cacheable(self) -> bool:
+        # Only first turns are answered from (and stored in) the response cache
+        return self.query_vector is not None and not self.history.messages and not self.history.summary
+
+    @property
+    def cache_variant(self) -> str:
+        # Cached answers are only reused for the same model and session prompt override
+        return response_variant(self.options.model, self.chat_session.system_prompt)
+
+
+async def _embed_query_for_cache(user_query: str) -> List[float] | None:
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    try:
+        # Goes through the query embedding cache, so retrieval reuses the vector
+        return await asyncio.to_thread(clients.embeddings.embed_query, user_query)
+    except Exception as e:
+        print(f"Warning: Could not embed query for the response cache. Error: {e}")
+        return None
+
+
+async def _prepare_chat_turn(request: ChatRequest, db: AsyncSession, principal: Principal) -> ChatTurn:
+    """Loads session, persona, history and context, and builds the model messages."""
+    if not settings.OPENAI_API_KEY or "your_openai_key" in settings.OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="OpenAI API key is not configured on the server.")
+
+    # Load or create ChatSession and the Persona for the influencer name provided
+    chat_session = await _load_or_create_chat_session(db, request.conversation_id, principal)
+    persona = await _load_persona(db, request.influencer_name)
+    # Query embeddings made for this request (also in worker threads) are billed to the session's user
+    usage_user_id.set(chat_session.user_id)
+    options = resolve_chat_options(chat_session)
+
+    # --- Load chat history while the query is embedded for the response cache ---
+    # Sessions without RAG never embed the query, so they also bypass the cache
+    history_window, query_vector = await asyncio.gather(
+        load_history_window(db, chat_session, model=options.model),
+        _embed_query_for_cache(request.user_query) if options.use_rag else asyncio.sleep(0),
+    )
+    turn = ChatTurn(
+        chat_session=chat_session,
+        persona=persona,
+        options=options,
+        history=history_window,
+        query_vector=query_vector,
+    )
+
+    if turn.cacheable:
+        turn.cached_response = response_cache.lookup(persona.name, turn.cache_variant, query_vector)
+        if turn.cached_response:
+            print(f"Response cache hit for persona '{persona.name}' (similarity {turn.cached_response.similarity:.3f}).")
+            turn.retrieved_context = turn.cached_response.retrieved_context
+            return turn
+
+    if options.use_rag:
+        turn.retrieved_context = await _retrieve_snippets(request.influencer_name, request.user_query, options.rag_k)
+
+    # Most stable first, so consecutive turns share the longest cacheable prompt prefix:
+    # persona (and session) prompt, rolling summary, recent history, then this turn's
+    # retrieved context and the new user query
+    system_prompt = persona.system_prompt(bool(turn.retrieved_context), chat_session.system_prompt)
+    turn.messages = [{"role": "system", "content": system_prompt}]
+    if history_window.summary:
+        turn.messages.append(
+            {"role": "system", "content": f"Summary of the earlier conversation:\n{history_window.summary}"}
         )
-    else:
-        system_prompt = (
-            f"You are an AI assistant embodying this persona:\n\n{persona.description}\n\n"
-            f"Answer in the tone, style, and personality of {persona.name}, "
-            "even if no contextual information is available."
+    turn.messages.extend(history_window.messages)
+    if turn.retrieved_context:
+        turn.messages.append({"role": "system", "content": render_context(turn.retrieved_context)})
+    turn.messages.append({"role": "user", "content": request.user_query})
+    return turn
+
+
+def _schedule_history_summary(turn: ChatTurn, background_tasks: BackgroundTasks) -> None:
+    if settings.HISTORY_SUMMARY_ENABLED and turn.history.truncated and turn.history.oldest_message_id:
+        background_tasks.add_task(summarize_older_turns, turn.chat_session.id, turn.history.oldest_message_id)
+
+
+def _store_cached_response(turn: ChatTurn, ai_message: str | None, finish_reason: str | None) -> None:
+    if turn.cacheable and ai_message and finish_reason == "stop":
+        response_cache.store(
+            turn.persona.name, turn.cache_variant, turn.query_vector, ai_message, turn.retrieved_context
         )
-    
-    # Combine system prompt, chat history and new user query
-    full_chat_history = [{"role": "system", "content": system_prompt}]
-    full_chat_history.extend(history_from_db)
-    full_chat_history.append({"role": "user", "content": request.user_query})
-    
-    # Call the OpenAI chat completion API
-    try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=full_chat_history,
-            temperature=0.7,
-            max_tokens=1000,
+
+async def _save_chat_turn(
+    db: AsyncSession,
+    chat_session: ChatSession,
+    user_query: str,
+    ai_message: str | None,
+    finish_reason: str | None = None,
+    usage: TokenUsage | None = None,
+) -> None:
+    """
+    Saves the user message and, if any text was produced, the AI response.
+
+    The user message records its own token count; the response records the
+    model and the total tokens billed for the turn (prompt plus completion).
+    """
+    messages = [
+        Message(
+            chat_session_id=chat_session.id,
+            user_id=chat_session.user_id,
+            message_type=MessageType.USER,
+            content=user_query,
+            tokens_used=count_tokens(user_query, usage.model if usage else settings.CHAT_DEFAULT_MODEL),
+        )
+    ]
+    if ai_message:
+        messages.append(
+            Message(
+                chat_session_id=chat_session.id,
+                user_id=chat_session.user_id,
+                message_type=MessageType.ASSISTANT,
+                content=ai_message,
+                finish_reason=finish_reason,
+                model_used=usage.model if usage else None,
+                tokens_used=usage.total_tokens if usage else None,
+            )
         )
-        ai_message = response.choices[0].message.content
+    db.add_all(messages)
+    await db.commit()
+
+
+@router.post("/", response_model=ChatResponse)
+async def handle_chat_request(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal),
+):
+    turn = await _prepare_chat_turn(request, db, principal)
+
+    usage = None
+    if turn.cached_response:
+        ai_message = turn.cached_response.answer
+        finish_reason = "cache_hit"
+    else:
+        # Call the OpenAI chat completion API without blocking the event loop
+        try:
+            response = await clients.async_openai.chat.completions.create(
+                messages=turn.messages,
+                **turn.options.completion_kwargs(),
+            )
+            ai_message = response.choices[0].message.content
+            finish_reason = response.choices[0].finish_reason
+            usage = TokenUsage.from_response(response.model, response.usage)
+            usage_recorder.record(usage, turn.chat_session.user_id)
+
+        except Exception as e:
+            print(f"Error calling OpenAI API: {e}")
+            raise HTTPException(status_code=500, detail="Failed to get a response from the AI model.")
+
+        _store_cached_response(turn, ai_message, finish_reason)
 
-    except Exception as e:
-        print(f"Error calling OpenAI API: {e}")
-        raise HTTPException(status_code=500, detail="Failed to get a response from the AI model.")
-    
     # Save user message and AI response messages to DB
-    user_message_db = Message(
-        chat_session_id=chat_session.id,
-        user_id=chat_session.user_id,
-        message_type=MessageType.USER,
-        content=request.user_query
-    )
-    ai_message_db = Message(
-        chat_session_id=chat_session.id,
-        user_id=chat_session.user_id,
-        message_type=MessageType.ASSISTANT,
-        content=ai_message
-    )
-    db.add(user_message_db)
-    db.add(ai_message_db)
-    db.commit()
-    db.refresh(user_message_db)
-    db.refresh(ai_message_db)
+    await _save_chat_turn(db, turn.chat_session, request.user_query, ai_message, finish_reason, usage)
+    _schedule_history_summary(turn, background_tasks)
 
     # Return response with conversation id, AI reply, and retrieved context
     return ChatResponse(
-        conversation_id=chat_session.id,
+        conversation_id=turn.chat_session.id,
         ai_response=ai_message,
-        retrieved_context=retrieved_context_snippets
-    )
\ No newline at end of file
+        retrieved_context=turn.retrieved_context
+    )
+
+
+#####################
+# Streaming Chat Route
+#####################
+
+def _sse_event(data: dict, event: str | None = None) -> str:
+    payload = f"data: {json.dumps(data)}\n\n"
+    return f"event: {event}\n{payload}" if event else payload
+
+
+async def _stream_cached_response(turn: ChatTurn, user_query: str):
+    try:
+        yield _sse_event(
+            {"conversation_id": turn.chat_session.id, "retrieved_context": turn.retrieved_context},
+            event="meta",
+        )
+        yield _sse_event({"token": turn.cached_response.answer})
+        yield _sse_event({"conversation_id": turn.chat_session.id, "finish_reason": "cache_hit"}, event="done")
+    finally:
+        # Like the live stream: the turn is saved even if the client disconnects
+        with anyio.CancelScope(shield=True):
+            async with AsyncSessionLocal() as save_db:
+                await _save_chat_turn(save_db, turn.chat_session, user_query, turn.cached_response.answer, "cache_hit")
+
+
+@router.post("/stream")
+@router.post("/stream/")
+async def handle_chat_stream_request(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal),
+):
+    """
+    Same as the chat route, but streams the reply as Server-Sent Events.
+
+    Events: one `meta` event (conversation id and retrieved context), a `data`
+    event per token delta, then `done` (or `error`). Both turns are saved when
+    the stream ends, including when the client disconnects mid-stream; in that
+    case the partial reply is kept with finish_reason "client_disconnected".
+    """
+    turn = await _prepare_chat_turn(request, db, principal)
+    sse_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    _schedule_history_summary(turn, background_tasks)  # runs after the stream has finished
+
+    if turn.cached_response:
+        return StreamingResponse(
+            _stream_cached_response(turn, request.user_query),
+            media_type="text/event-stream",
+            headers=sse_headers,
+        )
+
+    # Open the upstream stream before responding so setup errors still return a 500
+    try:
+        stream = await clients.async_openai.chat.completions.create(
+            messages=turn.messages,
+            **turn.options.completion_kwargs(),
+            stream=True,
+            stream_options={"include_usage": True},  # final chunk reports token usage
+        )
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get a response from the AI model.")
+
+    async def event_stream():
+        parts = []
+        finish_reason = "client_disconnected"
+        usage = None
+        try:
+            yield _sse_event(
+                {"conversation_id": turn.chat_session.id, "retrieved_context": turn.retrieved_context},
+                event="meta",
+            )
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = TokenUsage.from_response(chunk.model, chunk.usage)
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    parts.append(choice.delta.content)
+                    yield _sse_event({"token": choice.delta.content})
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+            yield _sse_event({"conversation_id": turn.chat_session.id, "finish_reason": finish_reason}, event="done")
+        except Exception as e:
+            print(f"Error while streaming from OpenAI API: {e}")
+            finish_reason = "error"
+            yield _sse_event({"detail": "Failed to get a response from the AI model."}, event="error")
+        finally:
+            # Runs on normal completion and on client disconnect (cancellation), so
+            # shield it: stop the upstream generation and persist what we have.
+            with anyio.CancelScope(shield=True):
+                await stream.close()
+                ai_message = "".join(parts)
+                if usage is None:
+                    # The usage chunk never arrived (disconnect or error); the prompt was still billed
+                    usage = TokenUsage(
+                        model=turn.options.model,
+                        prompt_tokens=count_message_tokens(turn.messages, turn.options.model),
+                        completion_tokens=count_tokens(ai_message, turn.options.model),
+                        estimated=True,
+                    )
+                usage_recorder.record(usage, turn.chat_session.user_id)
+                _store_cached_response(turn, ai_message, finish_reason)
+                async with AsyncSessionLocal() as save_db:
+                    await _save_chat_turn(
+                        save_db, turn.chat_session, request.user_query, ai_message, finish_reason, usage
+                    )
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=sse_headers)
@@ -1,31 +1,67 @@
 # app/routers/onboarding.py
-from fastapi import APIRouter, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from celery.result import AsyncResult
+from celery.utils import uuid
 from typing import List, Optional
+import asyncio
 import tempfile
 import os
-import shutil
-from app.background.tasks import process_all_urls
-from app.background.document_process.rag_builder import add_documents_to_vectorstore 
+from app.config import settings
+from app.background.celery_app import celery_app
+from app.background.tasks import ingest_documents, scrape_urls
+from app.models import UserRole
+from app.services.auth import Principal, get_principal
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Result backend key holding the id of the user who queued a job
+JOB_OWNER_KEY = "onboarding-job-owner-{}"
 
 router = APIRouter(
     prefix="/onboarding",
     tags=["Onboarding"],
 )
 
+async def _save_upload(upload: UploadFile, file_path: str) -> None:
+    # Never holds more than one chunk of the upload in memory, and writes off the event loop
+    with open(file_path, "wb") as f:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            await asyncio.to_thread(f.write, chunk)
+    await upload.close()
+
+
+def _publish(task, args: list, priority: int, owner_id: int) -> AsyncResult:
+    # The owner is recorded before the job exists, so its status is never readable without one
+    task_id = uuid()
+    celery_app.backend.set(JOB_OWNER_KEY.format(task_id), str(owner_id))
+    return task.apply_async(args=args, priority=priority, task_id=task_id)
+
+
+def _job_owner(job_id: str) -> int | None:
+    owner_id = celery_app.backend.get(JOB_OWNER_KEY.format(job_id))
+    return int(owner_id) if owner_id is not None else None
+
+
+async def _enqueue(task, args: list, priority: int, owner_id: int) -> AsyncResult:
+    # Publishing talks to the broker (or runs the job inline in eager mode), so keep it off the event loop
+    return await asyncio.to_thread(_publish, task, args, priority, owner_id)
+
+
 @router.post("/")
 @router.post("")
 async def create_onboarding_profile(
-    background_tasks: BackgroundTasks,
     instagram_urls: Optional[List[str]] = Form(None, description="The user's Instagram URL."),
     x_urls: Optional[List[str]] = Form(None, description="The user's X URL."),
     linkedin_urls: Optional[List[str]] = Form(None, description="The user's LinkedIn URL."),
     substack_urls: Optional[List[str]] = Form(None, description="The user's Substack URL."),
     custom_urls: Optional[List[str]] = Form(None, description="The user's Custom URL."),
     documents: Optional[List[UploadFile]] = File(None, description="Optional onboarding documents."),
+    remove_documents: Optional[List[str]] = Form(None, description="File names of earlier documents to remove."),
+    full_resync: bool = Form(False, description="Treat the uploaded documents as the full corpus, removing any others."),
     influencer_name: str = Form(...),
+    principal: Principal = Depends(get_principal),
 ):
     """
-    Accepts user data and URLs, and triggers a background task to process the URLs.
+    Accepts user data and URLs, and queues background jobs to process the URLs and documents.
     """
     onboarding_data = {
         "instagram_urls": instagram_urls,
@@ -41,30 +77,67 @@ async def create_onboarding_profile(
         if url_list:
             all_submitted_urls.extend(url_list)
 
-    # Add the URL processing function to the background tasks
-    # background_tasks.add_task(process_all_urls, all_submitted_urls)
+    jobs = {}
+
+    # Queue the URL processing job for the scraping workers
+    if all_submitted_urls:
+        job = await _enqueue(
+            scrape_urls,
+            [all_submitted_urls, influencer_name, principal.user_id],
+            settings.SCRAPE_JOB_PRIORITY,
+            principal.user_id,
+        )
+        jobs["urls"] = job.id
 
     saved_document_paths = []
-    if documents:
-        # Create a unique temporary directory to store uploaded files
-        temp_dir = tempfile.mkdtemp()
+    if documents or remove_documents:
+        # Create a unique directory, shared with the workers, to store uploaded files
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        upload_dir = tempfile.mkdtemp(dir=settings.UPLOAD_DIR)
         
-        for doc in documents:
-            # Create a path for each file inside the temporary directory
-            file_path = os.path.join(temp_dir, doc.filename)
+        for doc in documents or []:
+            # Create a path for each file inside the upload directory
+            file_path = os.path.join(upload_dir, os.path.basename(doc.filename))
             saved_document_paths.append(file_path)
             
-            # Save the file content to the temporary path
-            with open(file_path, "wb") as f:
-                shutil.copyfileobj(doc.file, f)
+            # Stream the file content to the upload path in bounded chunks
+            await _save_upload(doc, file_path)
         
-        # Add the document embedding task to the background queue
+        # Queue the document embedding job for the ingestion workers
         # Pass the list of file paths, not the UploadFile objects
-        background_tasks.add_task(add_documents_to_vectorstore, saved_document_paths, influencer_name)
+        job = await _enqueue(
+            ingest_documents,
+            [saved_document_paths, influencer_name, principal.user_id, remove_documents, full_resync],
+            settings.INGEST_JOB_PRIORITY,
+            principal.user_id,
+        )
+        jobs["documents"] = job.id
 
     # --- Prepare and send the immediate API response ---
     response_message = {
-        "status": "Onboarding profile received. Processing has started in the background."
+        "status": "Onboarding profile received. Processing has started in the background.",
+        "jobs": jobs,
     }
 
     return response_message
+
+
+@router.get("/jobs/{job_id}")
+def get_onboarding_job_status(job_id: str, principal: Principal = Depends(get_principal)):
+    """
+    Reports the state of a queued onboarding job: PENDING, STARTED, PROGRESS,
+    RETRY, SUCCESS or FAILURE, with progress details or the result when available.
+    Only the user who queued the job (or an admin) can see it.
+    """
+    # Other users' jobs look exactly like unknown ones
+    if principal.role != UserRole.ADMIN and _job_owner(job_id) != principal.user_id:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    result = AsyncResult(job_id, app=celery_app)
+    response = {"job_id": job_id, "status": result.state}
+    if result.state == "PROGRESS":
+        response["progress"] = result.info
+    elif result.state == "SUCCESS":
+        response["result"] = result.result
+    elif result.state in ("FAILURE", "RETRY"):
+        response["error"] = str(result.info)
+    return response
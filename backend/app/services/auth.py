@@ -1,23 +1,93 @@
-from fastapi import Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
+import datetime
+from dataclasses import dataclass
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from app.config import settings
+from app.database import SessionLocal
 from app.models import User, UserRole
 
-def get_current_user(db: Session = Depends(get_db)) -> User:
-    # Try to get a test user with a known ID or create it if not exists
-    test_user_id = 1
-    user = db.query(User).filter(User.id == test_user_id).first()
-    if not user:
-        user = User(
-            id=test_user_id,
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, taken from a verified token without touching the DB."""
+    user_id: int
+    role: UserRole = UserRole.USER
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def create_access_token(user_id: int, role: UserRole = UserRole.USER, expires_in: int | None = None) -> str:
+    """Issues a signed access token for a user (for login flows, scripts and local testing)."""
+    if not settings.AUTH_JWT_SECRET:
+        raise RuntimeError("AUTH_JWT_SECRET is not configured.")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    claims = {
+        "sub": str(user_id),
+        "role": role.value,
+        "iat": now,
+        "exp": now + datetime.timedelta(seconds=expires_in or settings.AUTH_TOKEN_TTL_SECONDS),
+    }
+    if settings.AUTH_JWT_ISSUER:
+        claims["iss"] = settings.AUTH_JWT_ISSUER
+    if settings.AUTH_JWT_AUDIENCE:
+        claims["aud"] = settings.AUTH_JWT_AUDIENCE
+    return jwt.encode(claims, settings.AUTH_JWT_SECRET, algorithm=settings.AUTH_JWT_ALGORITHM)
+
+
+def decode_access_token(token: str) -> Principal:
+    """Verifies the token's signature and claims locally and returns its principal."""
+    if not settings.AUTH_JWT_SECRET:
+        raise _unauthorized("Token authentication is not configured on the server.")
+    try:
+        claims = jwt.decode(
+            token,
+            settings.AUTH_JWT_SECRET,
+            algorithms=[settings.AUTH_JWT_ALGORITHM],
+            audience=settings.AUTH_JWT_AUDIENCE,
+            issuer=settings.AUTH_JWT_ISSUER,
+            options={"require": ["sub", "exp"]},
+        )
+        return Principal(user_id=int(claims["sub"]), role=UserRole(claims.get("role", UserRole.USER.value)))
+    except (jwt.PyJWTError, ValueError) as e:
+        raise _unauthorized(f"Invalid access token: {e}")
+
+
+def get_principal(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> Principal:
+    """
+    Resolves the caller from the bearer token. Without a token, requests run as
+    AUTH_DEV_USER_ID when that is set (local development), and are rejected otherwise.
+    """
+    if credentials is not None:
+        return decode_access_token(credentials.credentials)
+    if settings.AUTH_DEV_USER_ID is not None:
+        return Principal(user_id=settings.AUTH_DEV_USER_ID)
+    raise _unauthorized("Not authenticated.")
+
+
+def ensure_dev_user() -> None:
+    """Creates the AUTH_DEV_USER_ID user if it is missing, so local requests have an owner."""
+    if settings.AUTH_DEV_USER_ID is None:
+        return
+    db = SessionLocal()
+    try:
+        if db.query(User.id).filter(User.id == settings.AUTH_DEV_USER_ID).first():
+            return
+        db.add(User(
+            id=settings.AUTH_DEV_USER_ID,
             username="testuser",
             email="testuser@example.com",
             password_hash="fakehashedpassword",
             role=UserRole.USER,
             is_active=True,
             display_name="Test User"
-        )
-        db.add(user)
+        ))
         db.commit()
-        db.refresh(user)
-    return user
+        print(f"Created development user {settings.AUTH_DEV_USER_ID}.")
+    finally:
+        db.close()
@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+
+from app.config import settings
+from app.models import ChatSession
+
+
+@dataclass(frozen=True)
+class ChatOptions:
+    """Model and retrieval settings for one chat session, resolved and clamped."""
+    model: str
+    temperature: float
+    max_tokens: int
+    use_rag: bool
+    rag_k: int
+
+    def completion_kwargs(self) -> dict:
+        return {"model": self.model, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+
+def resolve_model(model_name: str | None) -> str:
+    """
+    Maps a session's model name onto a model we serve.
+
+    Tier names ("fast", "standard") resolve through CHAT_MODEL_ALIASES, and the
+    legacy defaults in CHAT_LEGACY_MODELS to the default model those sessions
+    were served with; anything not in CHAT_ALLOWED_MODELS falls back to the
+    default model, so a stored name can never select an arbitrary model.
+    """
+    if not model_name or model_name in settings.CHAT_LEGACY_MODELS:
+        return settings.CHAT_DEFAULT_MODEL
+    model = settings.CHAT_MODEL_ALIASES.get(model_name, model_name)
+    if model not in settings.CHAT_ALLOWED_MODELS:
+        print(f"Warning: Chat model '{model_name}' is not allowed, using '{settings.CHAT_DEFAULT_MODEL}'.")
+        return settings.CHAT_DEFAULT_MODEL
+    return model
+
+
+def _clamp(value, default, low, high):
+    if value is None:
+        return default
+    return min(max(value, low), high)
+
+
+def resolve_chat_options(chat_session: ChatSession) -> ChatOptions:
+    return ChatOptions(
+        model=resolve_model(chat_session.model_name),
+        temperature=float(_clamp(chat_session.temperature, 0.7, 0.0, 2.0)),
+        max_tokens=int(_clamp(chat_session.max_tokens, 1000, 1, settings.CHAT_MAX_TOKENS_LIMIT)),
+        use_rag=chat_session.use_rag is not False,
+        rag_k=int(_clamp(chat_session.rag_k, 5, 1, settings.CHAT_MAX_RAG_K)),
+    )
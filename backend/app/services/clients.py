@@ -0,0 +1,165 @@
+import threading
+from collections import OrderedDict
+
+import chromadb
+from langchain_chroma import Chroma
+from langchain_openai import OpenAIEmbeddings
+from openai import AsyncOpenAI, OpenAI
+
+from app.config import settings
+from app.services.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+def persona_collection_name(persona_name: str) -> str:
+    """Returns the Chroma collection name used for a persona's documents."""
+    return f"persona_{persona_name.lower().replace(' ', '_')}"
+
+
+class ClientRegistry:
+    """
+    Process-wide holder for long-lived backend clients.
+
+    One OpenAI client (sync and async), one embeddings model and one persistent Chroma client are
+    created lazily and reused by every request. Opened per-persona vector stores
+    are kept in an LRU cache so hot personas never re-open their collection.
+    Query embeddings go through an EmbeddingCache that outlives close().
+    """
+
+    def __init__(self, collection_cache_size: int = settings.CHROMA_COLLECTION_CACHE_SIZE):
+        self.collection_cache_size = collection_cache_size
+        self._lock = threading.Lock()
+        self._openai: OpenAI | None = None
+        self._async_openai: AsyncOpenAI | None = None
+        self._embeddings: CachedEmbeddings | None = None
+        self._chroma_client = None
+        self._vectorstores: OrderedDict[str, Chroma] = OrderedDict()
+        self.embedding_cache = EmbeddingCache(
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            redis_url=settings.EMBEDDING_CACHE_REDIS_URL,
+        )
+
+    @property
+    def openai(self) -> OpenAI:
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    self._openai = OpenAI(api_key=settings.OPENAI_API_KEY)
+        return self._openai
+
+    @property
+    def async_openai(self) -> AsyncOpenAI:
+        if self._async_openai is None:
+            with self._lock:
+                if self._async_openai is None:
+                    self._async_openai = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        return self._async_openai
+
+    @property
+    def embeddings(self) -> CachedEmbeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self.create_embeddings()
+        return self._embeddings
+
+    def create_embeddings(self, http_async_client=None) -> CachedEmbeddings:
+        """
+        A new embeddings model sharing the process-wide query cache.
+
+        The shared `embeddings` serve the app's event loop; code that runs its
+        own loop (background ingestion) creates one here with an async HTTP
+        client it owns, since a client's connections are bound to one loop.
+        """
+        return CachedEmbeddings(
+            OpenAIEmbeddings(
+                model=settings.EMBEDDING_MODEL,
+                openai_api_key=settings.OPENAI_API_KEY,
+                http_async_client=http_async_client,
+            ),
+            cache=self.embedding_cache,
+            model=settings.EMBEDDING_MODEL,
+        )
+
+    @property
+    def chroma_client(self):
+        if self._chroma_client is None:
+            with self._lock:
+                if self._chroma_client is None:
+                    self._chroma_client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIRECTORY)
+        return self._chroma_client
+
+    def get_vectorstore(self, persona_name: str) -> Chroma:
+        """Returns the (cached) vector store for a persona's collection."""
+        collection_name = persona_collection_name(persona_name)
+        with self._lock:
+            vectorstore = self._vectorstores.get(collection_name)
+            if vectorstore is not None:
+                self._vectorstores.move_to_end(collection_name)
+                return vectorstore
+
+        vectorstore = Chroma(
+            client=self.chroma_client,
+            collection_name=collection_name,
+            embedding_function=self.embeddings,
+        )
+
+        with self._lock:
+            self._vectorstores[collection_name] = vectorstore
+            self._vectorstores.move_to_end(collection_name)
+            while len(self._vectorstores) > self.collection_cache_size:
+                self._vectorstores.popitem(last=False)
+        return vectorstore
+
+    def get_collection(self, persona_name: str):
+        """Returns the raw Chroma collection, for writes with precomputed embeddings."""
+        return self.chroma_client.get_or_create_collection(
+            name=persona_collection_name(persona_name),
+            embedding_function=None,
+        )
+
+    def evict_vectorstore(self, persona_name: str) -> None:
+        with self._lock:
+            self._vectorstores.pop(persona_collection_name(persona_name), None)
+
+    def warm_up(self) -> None:
+        """Opens the collections of the most recently created personas."""
+        from app.database import SessionLocal
+        from app.models import Persona
+
+        db = SessionLocal()
+        try:
+            persona_names = [
+                name for (name,) in db.query(Persona.name)
+                .order_by(Persona.created_at.desc())
+                .limit(self.collection_cache_size)
+            ]
+        finally:
+            db.close()
+
+        for name in persona_names:
+            try:
+                self.get_vectorstore(name)
+            except Exception as e:
+                print(f"Warning: Could not warm up collection for persona '{name}': {e}")
+        print(f"Warmed up {len(persona_names)} persona collections.")
+
+    def close(self) -> None:
+        with self._lock:
+            self._vectorstores.clear()
+            if self._openai is not None:
+                self._openai.close()
+                self._openai = None
+            self._embeddings = None
+            self._chroma_client = None
+
+    async def aclose(self) -> None:
+        """Closes the async OpenAI client, then everything else."""
+        async_openai, self._async_openai = self._async_openai, None
+        if async_openai is not None:
+            await async_openai.close()
+        self.close()
+
+
+# Create a single, importable registry shared by the whole process
+clients = ClientRegistry()
@@ -0,0 +1,174 @@
+import hashlib
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.tokens import count_tokens
+from app.services.usage import TokenUsage, usage_recorder
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Folds case, whitespace and trailing punctuation so near-identical questions share a key."""
+    return _WHITESPACE_RE.sub(" ", text).strip().rstrip("?!. ").lower()
+
+
+class EmbeddingCache:
+    """
+    Bounded cache of query embeddings keyed by embedding model and normalized text.
+
+    Entries live in an in-process LRU with a TTL. When a Redis URL is given,
+    vectors are also written through to Redis so other workers (and restarts)
+    can reuse them; Redis errors only disable that tier, never the request.
+    Redis holds the vectors as packed float64, so both tiers return the same values.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, redis_url: str | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, List[float]]] = OrderedDict()
+        self._redis = None
+        if redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        digest = hashlib.sha256(f"{model}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+        return f"emb:d:{digest}"  # "d": float64 vectors; older float32 entries are never read
+
+    def get(self, model: str, text: str) -> List[float] | None:
+        key = self.make_key(model, text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, vector = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+
+        vector = self._redis_get(key)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.redis_hits += 1
+        self._store_local(key, vector)
+        return vector
+
+    def set(self, model: str, text: str, vector: List[float]) -> None:
+        key = self.make_key(model, text)
+        self._store_local(key, vector)
+        self._redis_set(key, vector)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "redis_enabled": self._redis is not None,
+                "redis_hits": self.redis_hits,
+                "redis_errors": self.redis_errors,
+            }
+
+    def _store_local(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _redis_get(self, key: str) -> List[float] | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(key)
+        except Exception as e:
+            self._record_redis_error(e)
+            return None
+        if raw is None:
+            return None
+        return array("d", raw).tolist()
+
+    def _redis_set(self, key: str, vector: List[float]) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.setex(key, self.ttl_seconds, array("d", vector).tobytes())
+        except Exception as e:
+            self._record_redis_error(e)
+
+    def _record_redis_error(self, error: Exception) -> None:
+        with self._lock:
+            self.redis_errors += 1
+        print(f"Warning: Embedding cache Redis tier unavailable: {error}")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves query embeddings from an EmbeddingCache.
+
+    Document embeddings (ingestion) are passed straight through; only the
+    per-turn query embedding is worth caching. Every call that reaches the API
+    is recorded for usage accounting, with tokens counted locally (the
+    embeddings client does not surface the API's usage block).
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def _record_usage(self, texts: List[str]) -> None:
+        prompt_tokens = sum(count_tokens(text, self.model) for text in texts)
+        usage_recorder.record(TokenUsage(model=self.model, prompt_tokens=prompt_tokens))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.embeddings.embed_documents(texts)
+        self._record_usage(texts)
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await self.embeddings.aembed_documents(texts)
+        self._record_usage(texts)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model, text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set(self.model, text, vector)
+            self._record_usage([text])
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model, text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.set(self.model, text, vector)
+            self._record_usage([text])
+        return vector
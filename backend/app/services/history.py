@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import ChatSession, Message
+from app.services.clients import clients
+from app.services.tokens import MESSAGE_TOKEN_OVERHEAD, count_tokens
+from app.services.usage import TokenUsage, usage_recorder
+
+
+@dataclass
+class HistoryWindow:
+    """The recent part of a conversation that is sent to the model."""
+    messages: List[dict]
+    summary: str | None = None
+    oldest_message_id: int | None = None
+    truncated: bool = False  # older, not yet summarized messages were left out
+
+
+async def load_history_window(
+    db: AsyncSession,
+    chat_session: ChatSession,
+    max_messages: int = settings.HISTORY_MAX_MESSAGES,
+    token_budget: int = settings.HISTORY_TOKEN_BUDGET,
+    model: str = "gpt-4o",
+) -> HistoryWindow:
+    """
+    Loads the most recent messages of a session in a single query and trims
+    them to a token budget. Messages already folded into the session's rolling
+    summary are skipped; the summary itself counts against the budget.
+    """
+    query = select(Message.id, Message.message_type, Message.content).where(
+        Message.chat_session_id == chat_session.id
+    )
+    if chat_session.summary_through_message_id:
+        query = query.where(Message.id > chat_session.summary_through_message_id)
+    query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(max_messages + 1)
+    rows = (await db.execute(query)).all()
+
+    truncated = len(rows) > max_messages
+    remaining = token_budget - count_tokens(chat_session.history_summary, model)
+    kept = []
+    for row in rows[:max_messages]:
+        cost = count_tokens(row.content, model) + MESSAGE_TOKEN_OVERHEAD
+        if cost > remaining:
+            truncated = True
+            break
+        remaining -= cost
+        kept.append(row)
+    kept.reverse()
+
+    return HistoryWindow(
+        messages=[{"role": row.message_type.value, "content": row.content} for row in kept],
+        summary=chat_session.history_summary,
+        oldest_message_id=kept[0].id if kept else None,
+        truncated=truncated,
+    )
+
+
+async def summarize_older_turns(chat_session_id: int, before_message_id: int) -> None:
+    """
+    Folds the messages that fell out of the history window into the session's
+    rolling summary. Meant to run as a background task after the response.
+    """
+    async with AsyncSessionLocal() as db:
+        chat_session = await db.get(ChatSession, chat_session_id)
+        if not chat_session:
+            return
+
+        query = select(Message.id, Message.message_type, Message.content).where(
+            Message.chat_session_id == chat_session_id,
+            Message.id < before_message_id,
+        )
+        if chat_session.summary_through_message_id:
+            query = query.where(Message.id > chat_session.summary_through_message_id)
+        rows = (await db.execute(query.order_by(Message.id))).all()
+        if not rows:
+            return
+
+        # Fold the messages in oldest first, in chunks bounded by the input budget,
+        # so the watermark only ever covers messages the summarizer has seen
+        start = 0
+        while start < len(rows):
+            transcript_lines = []
+            remaining = settings.HISTORY_SUMMARY_INPUT_TOKENS
+            end = start
+            while end < len(rows):
+                line = f"{rows[end].message_type.value}: {rows[end].content}"
+                cost = count_tokens(line)
+                if transcript_lines and cost > remaining:
+                    break
+                transcript_lines.append(line)
+                remaining -= cost
+                end += 1
+
+            summary = await _update_summary(chat_session, "\n".join(transcript_lines))
+            if summary is None:
+                return  # retried with the remaining messages on a later turn
+            chat_session.history_summary = summary
+            chat_session.summary_through_message_id = rows[end - 1].id
+            await db.commit()
+            print(f"Updated rolling summary for chat session {chat_session_id} through message {rows[end - 1].id}.")
+            start = end
+
+
+async def _update_summary(chat_session: ChatSession, transcript: str) -> str | None:
+    """The session's summary updated with the transcript, or None if the model call failed."""
+    previous_summary = chat_session.history_summary or "(none)"
+    try:
+        response = await clients.async_openai.chat.completions.create(
+            model=settings.HISTORY_SUMMARY_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You maintain a running summary of a conversation between a fan and an AI persona. "
+                        "Update the existing summary with the new messages. Keep names, facts, preferences "
+                        "and open questions; drop small talk. Reply with the updated summary only."
+                    ),
+                },
+                {
+                    "role": "user",
+                    "content": f"Existing summary:\n{previous_summary}\n\nNew messages:\n{transcript}",
+                },
+            ],
+            temperature=0.2,
+            max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+        )
+    except Exception as e:
+        print(f"Warning: Could not summarize history for chat session {chat_session.id}. Error: {e}")
+        return None
+    usage_recorder.record(TokenUsage.from_response(response.model, response.usage), chat_session.user_id)
+    return response.choices[0].message.content.strip()
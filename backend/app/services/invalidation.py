@@ -0,0 +1,70 @@
+import asyncio
+from typing import Callable, List
+
+from app.config import settings
+
+PERSONA_CHANNEL = "persona-changed"
+
+_handlers: List[Callable[[str], None]] = []
+
+
+def on_persona_changed(handler: Callable[[str], None]) -> Callable[[str], None]:
+    """Registers a callback that drops in-process state derived from a persona."""
+    _handlers.append(handler)
+    return handler
+
+
+def _run_handlers(persona_name: str) -> None:
+    for handler in _handlers:
+        try:
+            handler(persona_name)
+        except Exception as e:
+            print(f"Warning: Invalidation handler {handler.__name__} failed for persona '{persona_name}': {e}")
+
+
+def _events_redis_url() -> str | None:
+    if settings.CELERY_TASK_ALWAYS_EAGER:
+        return None  # jobs run in the API process, local handlers are enough
+    url = settings.PERSONA_EVENTS_REDIS_URL or settings.CELERY_BROKER_URL
+    return url if url.startswith(("redis://", "rediss://")) else None
+
+
+def notify_persona_changed(persona_name: str) -> None:
+    """
+    Invalidates caches for a persona in this process and, when jobs run in
+    separate workers, publishes the change so API processes drop theirs too.
+    """
+    _run_handlers(persona_name)
+
+    redis_url = _events_redis_url()
+    if not redis_url:
+        return
+    try:
+        import redis
+
+        with redis.Redis.from_url(redis_url) as connection:
+            connection.publish(PERSONA_CHANNEL, persona_name)
+    except Exception as e:
+        print(f"Warning: Could not publish persona change for '{persona_name}': {e}")
+
+
+async def listen_for_persona_changes() -> None:
+    """Applies persona changes published by other processes. Runs for the app's lifetime."""
+    redis_url = _events_redis_url()
+    if not redis_url:
+        return
+    import redis.asyncio as aioredis
+
+    while True:
+        try:
+            async with aioredis.Redis.from_url(redis_url) as connection:
+                async with connection.pubsub() as pubsub:
+                    await pubsub.subscribe(PERSONA_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            _run_handlers(message["data"].decode("utf-8"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Warning: Persona change listener disconnected, retrying in 5s. Error: {e}")
+            await asyncio.sleep(5)
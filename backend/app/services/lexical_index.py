@@ -0,0 +1,314 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Iterable, List
+
+import numpy as np
+from filelock import FileLock
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.models import Content, ContentChunk, Persona
+from app.services.clients import persona_collection_name
+from app.services.invalidation import on_persona_changed
+
+INDEX_FORMAT_VERSION = 1
+
+# Words, plus hashtags, @mentions and codes such as "xj-200" or "v2.1" kept whole
+TOKEN_RE = re.compile(r"[#@]?\w+(?:[-.]\w+)*")
+QUOTED_RE = re.compile(r'"[^"]+"')
+
+# Words that carry no lookup intent when deciding whether a query is lexical
+STOPWORDS = frozenset(
+    "a an and are about did do does for from has have how i in is it me my of on or so tell "
+    "that the their them they this to was were what when where which who why with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; hashtags and mentions are indexed both with and without their prefix."""
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        terms.append(token)
+        if token[0] in "#@" and len(token) > 1:
+            terms.append(token[1:])
+    return terms
+
+
+def _is_exact_term(term: str) -> bool:
+    # Hashtags, mentions, and anything with a digit in it (codes, years, versions)
+    return term[0] in "#@" or any(c.isdigit() for c in term)
+
+
+def is_lexical_query(query: str) -> bool:
+    """
+    True when the query is an exact lookup that embeddings add nothing to: a
+    quoted phrase, or only hashtags, mentions and product codes (stopwords aside).
+    """
+    if QUOTED_RE.fullmatch(query.strip()):
+        return True
+    terms = [term for term in TOKEN_RE.findall(query.lower()) if term not in STOPWORDS]
+    return bool(terms) and all(_is_exact_term(term) for term in terms)
+
+
+def _collect_postings(chunks, doc_ids: list, texts: list, metadatas: list, doc_lengths: list) -> dict:
+    """Appends (chunk_id, text, metadata) rows to the lists; returns the rows' postings by term."""
+    postings: dict[str, tuple[list, list]] = {}
+    for chunk_id, text, metadata in chunks:
+        doc_index = len(doc_ids)
+        terms = tokenize(text)
+        doc_ids.append(chunk_id)
+        texts.append(text)
+        metadatas.append(metadata)
+        doc_lengths.append(len(terms))
+        for term, frequency in Counter(terms).items():
+            doc_indexes, frequencies = postings.setdefault(term, ([], []))
+            doc_indexes.append(doc_index)
+            frequencies.append(frequency)
+    return postings
+
+
+class BM25Index:
+    """
+    In-memory BM25 (Okapi) inverted index over a persona's chunks.
+
+    Postings are kept as numpy arrays per term, so a query costs one vectorized
+    update per query term instead of a pass over every chunk. The chunk text and
+    metadata are stored alongside, so lexical hits need no database or Chroma call.
+    """
+
+    def __init__(self, doc_ids, texts, metadatas, doc_lengths, postings, k1: float = 1.5, b: float = 0.75):
+        self.doc_ids: List[str] = doc_ids
+        self.texts: List[str] = texts
+        self.metadatas: List[dict] = metadatas
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.postings = {
+            term: (np.asarray(doc_indexes, dtype=np.int32), np.asarray(frequencies, dtype=np.float32))
+            for term, (doc_indexes, frequencies) in postings.items()
+        }
+        self.k1 = k1
+        self.b = b
+        self.average_length = float(self.doc_lengths.mean()) if len(doc_ids) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, chunks: Iterable[tuple[str, str, dict]]) -> "BM25Index":
+        """Builds the index from (chunk_id, text, metadata) rows."""
+        doc_ids, texts, metadatas, doc_lengths = [], [], [], []
+        postings = _collect_postings(chunks, doc_ids, texts, metadatas, doc_lengths)
+        return cls(doc_ids, texts, metadatas, doc_lengths, postings)
+
+    def extended(self, chunks: Iterable[tuple[str, str, dict]]) -> "BM25Index":
+        """
+        A new index with (chunk_id, text, metadata) rows appended.
+
+        Only the new chunks are tokenized, and only the postings of their terms
+        are copied; this index is left untouched for readers still using it.
+        """
+        doc_ids, texts, metadatas = list(self.doc_ids), list(self.texts), list(self.metadatas)
+        doc_lengths = self.doc_lengths.tolist()
+        new_postings = _collect_postings(chunks, doc_ids, texts, metadatas, doc_lengths)
+        postings = dict(self.postings)
+        for term, (doc_indexes, frequencies) in new_postings.items():
+            if term in postings:
+                # New chunks come after every existing one, so postings stay sorted
+                old_indexes, old_frequencies = postings[term]
+                doc_indexes = np.concatenate([old_indexes, doc_indexes])
+                frequencies = np.concatenate([old_frequencies, frequencies])
+            postings[term] = (doc_indexes, frequencies)
+        return type(self)(doc_ids, texts, metadatas, doc_lengths, postings, self.k1, self.b)
+
+    def search(self, query: str, k: int) -> List[tuple[int, float]]:
+        """Returns up to k (chunk position, score) pairs, best first; only chunks sharing a term."""
+        if not self.doc_ids:
+            return []
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        doc_count = len(self.doc_ids)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_indexes, frequencies = posting
+            idf = math.log(1 + (doc_count - len(doc_indexes) + 0.5) / (len(doc_indexes) + 0.5))
+            length_norm = 1 - self.b + self.b * self.doc_lengths[doc_indexes] / self.average_length
+            scores[doc_indexes] += idf * frequencies * (self.k1 + 1) / (frequencies + self.k1 * length_norm)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def documents(self, hits: List[tuple[int, float]]) -> List[Document]:
+        return [
+            Document(id=self.doc_ids[i], page_content=self.texts[i], metadata=self.metadatas[i])
+            for i, _ in hits
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "doc_ids": self.doc_ids,
+            "texts": self.texts,
+            "metadatas": self.metadatas,
+            "doc_lengths": self.doc_lengths.astype(int).tolist(),
+            "postings": {
+                term: [doc_indexes.tolist(), frequencies.astype(int).tolist()]
+                for term, (doc_indexes, frequencies) in self.postings.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index version {data.get('version')}")
+        return cls(data["doc_ids"], data["texts"], data["metadatas"], data["doc_lengths"], data["postings"])
+
+
+class LexicalIndexStore:
+    """
+    Per-persona BM25 indexes persisted as files next to the Chroma data.
+
+    Ingestion workers write a new file atomically; API processes keep a bounded
+    LRU of loaded indexes and reload one when its file's mtime changes.
+    """
+
+    def __init__(self, directory: str, cache_size: int):
+        self.directory = directory
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[str, tuple[float, BM25Index]] = OrderedDict()
+
+    def path(self, persona_name: str) -> str:
+        return os.path.join(self.directory, f"{persona_collection_name(persona_name)}.json")
+
+    def exists(self, persona_name: str) -> bool:
+        return os.path.exists(self.path(persona_name))
+
+    def get(self, persona_name: str) -> BM25Index | None:
+        path = self.path(persona_name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._indexes.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._indexes.move_to_end(path)
+                return cached[1]
+
+        with open(path, encoding="utf-8") as f:
+            index = BM25Index.from_dict(json.load(f))
+
+        with self._lock:
+            self._indexes[path] = (mtime, index)
+            self._indexes.move_to_end(path)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def write(self, persona_name: str, index: BM25Index) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(persona_name)
+        # A unique temp file per write, so concurrent writers never interleave into one file
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=self.directory, suffix=".tmp", delete=False
+        ) as f:
+            temp_path = f.name
+            try:
+                json.dump(index.to_dict(), f)
+            except BaseException:
+                f.close()
+                os.unlink(temp_path)
+                raise
+        os.replace(temp_path, path)  # readers never see a half-written index
+        self.evict(persona_name)
+
+    def evict(self, persona_name: str) -> None:
+        with self._lock:
+            self._indexes.pop(self.path(persona_name), None)
+
+    @contextmanager
+    def locked(self, persona_name: str):
+        """Serializes read-modify-write updates of a persona's index, across threads and worker processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        # filelock picks the platform's lock (flock on POSIX, msvcrt.locking on Windows)
+        with FileLock(f"{self.path(persona_name)}.lock"):
+            yield
+
+
+def _index_rows(db, persona: Persona, content_ids: list[int] | None = None):
+    query = (
+        db.query(
+            ContentChunk.chroma_chunk_id,
+            ContentChunk.chunk_text,
+            ContentChunk.id,
+            ContentChunk.content_id,
+            ContentChunk.content_hash,
+        )
+        .join(Content, ContentChunk.content_id == Content.id)
+        .filter(Content.influencer_id == persona.id)
+    )
+    if content_ids is not None:
+        query = query.filter(ContentChunk.content_id.in_(content_ids))
+    # Same metadata as the chunk's vector in Chroma
+    return (
+        (
+            chroma_chunk_id or str(chunk_id),
+            chunk_text,
+            {
+                "content_chunk_id": str(chunk_id),
+                "content_id": str(content_id),
+                "persona_name": persona.name,
+                "content_hash": content_hash,
+            },
+        )
+        for chroma_chunk_id, chunk_text, chunk_id, content_id, content_hash
+        in query.order_by(ContentChunk.id).yield_per(1000)
+    )
+
+
+def _rebuild(db, persona: Persona) -> int:
+    index = BM25Index.build(_index_rows(db, persona))
+    lexical_indexes.write(persona.name, index)
+    return len(index)
+
+
+def rebuild_persona_index(db, persona: Persona) -> int:
+    """Rebuilds a persona's lexical index from its stored chunks; returns the number of chunks."""
+    with lexical_indexes.locked(persona.name):
+        return _rebuild(db, persona)
+
+
+def add_to_persona_index(db, persona: Persona, content_ids: list[int]) -> int:
+    """
+    Appends the committed chunks of new contents to a persona's lexical index;
+    returns the number of chunks in the index. Falls back to a full rebuild
+    when the persona has no (readable) index yet.
+    """
+    with lexical_indexes.locked(persona.name):
+        try:
+            index = lexical_indexes.get(persona.name)
+        except ValueError as e:
+            print(f"Warning: Rebuilding unreadable lexical index for '{persona.name}'. Error: {e}")
+            index = None
+        if index is None:
+            return _rebuild(db, persona)
+        index = index.extended(_index_rows(db, persona, content_ids))
+        lexical_indexes.write(persona.name, index)
+        return len(index)
+
+
+lexical_indexes = LexicalIndexStore(
+    settings.LEXICAL_INDEX_DIRECTORY or os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "lexical"),
+    cache_size=settings.CHROMA_COLLECTION_CACHE_SIZE,
+)
+on_persona_changed(lexical_indexes.evict)
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Persona
+from app.services.invalidation import on_persona_changed
+
+
+@dataclass(frozen=True)
+class PersonaPrompt:
+    """A persona row and its system prompts, rendered once when the persona is loaded."""
+    id: int
+    name: str
+    description: str
+    grounded_prompt: str  # used when context was retrieved for the turn
+    ungrounded_prompt: str
+
+    def system_prompt(self, grounded: bool, session_prompt: str | None = None) -> str:
+        """
+        The static head of every request for this persona (and session).
+
+        It never contains per-turn text, so identical prefixes across turns and
+        fans can be served from the provider's prompt cache.
+        """
+        prompt = self.grounded_prompt if grounded else self.ungrounded_prompt
+        if session_prompt:
+            prompt = f"{prompt}\n\nAdditional instructions for this conversation:\n{session_prompt}"
+        return prompt
+
+
+def render_persona_prompt(persona: Persona) -> PersonaPrompt:
+    grounded_prompt = (
+        f"You are an AI assistant embodying this persona:\n\n{persona.description}\n\n"
+        f"Base all your answers on the retrieved context given with the latest message where possible. "
+        f"If the context doesn't fully answer the user's question, respond using the tone, "
+        f"style, and personality of {persona.name}.\n\n"
+        "Instructions:\n"
+        f"- Stay in character as {persona.name}\n"
+        "- Answer primarily using the provided context\n"
+        "- If context is insufficient, acknowledge it and extrapolate\n"
+        "- Be conversational and engaging"
+    )
+    ungrounded_prompt = (
+        f"You are an AI assistant embodying this persona:\n\n{persona.description}\n\n"
+        f"Answer in the tone, style, and personality of {persona.name}, "
+        "even if no contextual information is available."
+    )
+    return PersonaPrompt(
+        id=persona.id,
+        name=persona.name,
+        description=persona.description or "",
+        grounded_prompt=grounded_prompt,
+        ungrounded_prompt=ungrounded_prompt,
+    )
+
+
+def render_context(snippets: List[str]) -> str:
+    """The per-turn context block; sent after the history, right before the user message."""
+    return (
+        "--- Relevant Context ---\n"
+        + "\n".join(f"Context {i+1}: {snippet}" for i, snippet in enumerate(snippets))
+        + "\n--- End Context ---"
+    )
+
+
+class PersonaRegistry:
+    """
+    In-process cache of personas and their rendered prompts, keyed by name.
+
+    Entries are dropped when the persona changes (locally or via the persona
+    change channel) and otherwise expire after a TTL as a safety net, so the
+    hot path does neither the persona query nor the prompt assembly. At most
+    `max_entries` personas are kept, least recently used first out.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, PersonaPrompt]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, persona_name: str) -> PersonaPrompt | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(persona_name)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(persona_name)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        result = await db.execute(select(Persona).where(Persona.name == persona_name))
+        persona = result.scalars().first()
+        if persona is None:
+            return None
+
+        prompt = render_persona_prompt(persona)
+        with self._lock:
+            self._entries[persona_name] = (now + self.ttl_seconds, prompt)
+            self._entries.move_to_end(persona_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return prompt
+
+    def invalidate(self, persona_name: str) -> None:
+        with self._lock:
+            self._entries.pop(persona_name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+persona_registry = PersonaRegistry(
+    ttl_seconds=settings.PERSONA_CACHE_TTL_SECONDS,
+    max_entries=settings.PERSONA_CACHE_MAX_ENTRIES,
+)
+on_persona_changed(persona_registry.invalidate)
@@ -0,0 +1,130 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from app.config import settings
+from app.services.invalidation import on_persona_changed
+
+
+@dataclass
+class CachedResponse:
+    answer: str
+    retrieved_context: List[str]
+    similarity: float = 0.0
+
+
+@dataclass
+class _PersonaEntries:
+    vectors: List[np.ndarray] = field(default_factory=list)
+    responses: List[CachedResponse] = field(default_factory=list)
+    expires_at: List[float] = field(default_factory=list)
+    matrix: np.ndarray | None = None
+
+
+def response_variant(model: str, system_prompt: str | None) -> str:
+    """Cache partition for answers written by `model` under a session's extra system prompt."""
+    prompt_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+    return f"{model}:{prompt_hash}"
+
+
+class SemanticResponseCache:
+    """
+    Per-persona cache of first-turn answers, matched by query embedding similarity.
+
+    A lookup returns the stored answer whose query embedding has the highest
+    cosine similarity to the new query, if it is at or above the threshold.
+    Answers are only shared between sessions with the same model and system
+    prompt override (the `variant`, see response_variant). Each persona and
+    variant keeps its own bounded FIFO of entries with a TTL, and all of a
+    persona's entries are dropped when its documents are re-ingested.
+    """
+
+    def __init__(self, similarity_threshold: float, max_entries_per_persona: int, ttl_seconds: int):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_persona = max_entries_per_persona
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._personas: dict[str, dict[str, _PersonaEntries]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(self, persona_name: str, variant: str, query_vector: List[float]) -> CachedResponse | None:
+        query = self._normalize(query_vector)
+        with self._lock:
+            entries = self._personas.get(persona_name, {}).get(variant)
+            if entries is not None:
+                self._drop_expired(entries)
+            if not entries or not entries.vectors:
+                self.misses += 1
+                return None
+            if entries.matrix is None:
+                entries.matrix = np.vstack(entries.vectors)
+            similarities = entries.matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.similarity_threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            cached = entries.responses[best]
+        return CachedResponse(cached.answer, cached.retrieved_context, similarity)
+
+    def store(
+        self, persona_name: str, variant: str, query_vector: List[float], answer: str, retrieved_context: List[str]
+    ) -> None:
+        vector = self._normalize(query_vector)
+        with self._lock:
+            entries = self._personas.setdefault(persona_name, {}).setdefault(variant, _PersonaEntries())
+            entries.vectors.append(vector)
+            entries.responses.append(CachedResponse(answer, list(retrieved_context)))
+            entries.expires_at.append(time.monotonic() + self.ttl_seconds)
+            overflow = len(entries.vectors) - self.max_entries_per_persona
+            if overflow > 0:
+                del entries.vectors[:overflow], entries.responses[:overflow], entries.expires_at[:overflow]
+            entries.matrix = None
+
+    def invalidate(self, persona_name: str) -> None:
+        with self._lock:
+            self._personas.pop(persona_name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": settings.RESPONSE_CACHE_ENABLED,
+                "personas": len(self._personas),
+                "entries": sum(
+                    len(entries.vectors) for variants in self._personas.values() for entries in variants.values()
+                ),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    @staticmethod
+    def _drop_expired(entries: _PersonaEntries) -> None:
+        # Entries are appended in expiry order, so expired ones form a prefix
+        now = time.monotonic()
+        expired = 0
+        while expired < len(entries.expires_at) and entries.expires_at[expired] <= now:
+            expired += 1
+        if expired:
+            del entries.vectors[:expired], entries.responses[:expired], entries.expires_at[:expired]
+            entries.matrix = None
+
+
+# Create a single, importable cache shared by the whole process
+response_cache = SemanticResponseCache(
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    max_entries_per_persona=settings.RESPONSE_CACHE_MAX_ENTRIES_PER_PERSONA,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+on_persona_changed(response_cache.invalidate)
@@ -0,0 +1,65 @@
+import asyncio
+from typing import List
+
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.clients import clients
+from app.services.lexical_index import is_lexical_query, lexical_indexes
+
+
+def _similarity_search(persona_name: str, query: str, k: int) -> List[Document]:
+    vectorstore = clients.get_vectorstore(persona_name)
+    return vectorstore.similarity_search(query, k=k)
+
+
+def _lexical_search(persona_name: str, query: str, k: int) -> List[Document]:
+    try:
+        index = lexical_indexes.get(persona_name)
+    except Exception as e:
+        print(f"Warning: Could not load lexical index for persona '{persona_name}'. Error: {e}")
+        return []
+    if index is None:
+        return []
+    return index.documents(index.search(query, k))
+
+
+def _document_key(doc: Document) -> str:
+    return doc.id or (doc.metadata or {}).get("content_chunk_id") or doc.page_content
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int, rrf_k: int = settings.RRF_K) -> List[Document]:
+    """Merges ranked result lists by summing 1 / (rrf_k + rank) per document."""
+    scores: dict[str, float] = {}
+    documents: dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = _document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)  # stable: ties keep first-seen order
+    return [documents[key] for key in ranked[:k]]
+
+
+async def retrieve_context(persona_name: str, query: str, k: int = 3) -> List[Document]:
+    """
+    Retrieves a persona's most relevant chunks off the event loop.
+
+    The local BM25 index is searched first. Exact lookups (hashtags, mentions,
+    codes, quoted phrases) that it answers are returned without embedding the
+    query; otherwise the vector search runs too (opening the collection,
+    embedding the query and querying Chroma, all blocking, in a worker thread)
+    and both rankings are merged with reciprocal rank fusion.
+    """
+    if not settings.HYBRID_RETRIEVAL_ENABLED:
+        return await asyncio.to_thread(_similarity_search, persona_name, query, k)
+
+    candidates = max(k, settings.HYBRID_CANDIDATES)
+    lexical_docs = await asyncio.to_thread(_lexical_search, persona_name, query, candidates)
+    if lexical_docs and is_lexical_query(query):
+        return lexical_docs[:k]
+    if not lexical_docs:
+        return await asyncio.to_thread(_similarity_search, persona_name, query, k)
+
+    dense_docs = await asyncio.to_thread(_similarity_search, persona_name, query, candidates)
+    return reciprocal_rank_fusion([dense_docs, lexical_docs], k)
@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Iterable
+
+import tiktoken
+
+# Rough per-message framing overhead of the chat format (role, separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+# Fallback ratio when the tokenizer files cannot be loaded (e.g. offline hosts)
+CHARS_PER_TOKEN = 4
+# After a failed tokenizer load, estimate for this long before trying again
+ENCODING_RETRY_SECONDS = 300
+
+_encodings: dict[str, tiktoken.Encoding] = {}
+_encoding_failures: dict[str, float] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str) -> tiktoken.Encoding | None:
+    """
+    The model's tokenizer, or None while it cannot be loaded.
+
+    Only loaded tokenizers are cached; a failed download (tiktoken fetches the
+    files on first use) is retried after ENCODING_RETRY_SECONDS rather than
+    leaving the process on estimates for good.
+    """
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+        if time.monotonic() < _encoding_failures.get(model, 0.0):
+            return None
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"Warning: Could not load tokenizer for '{model}', estimating token counts. Error: {e}")
+            _encoding_failures[model] = time.monotonic() + ENCODING_RETRY_SECONDS
+            return None
+        _encodings[model] = encoding
+        _encoding_failures.pop(model, None)
+        return encoding
+
+
+def count_tokens(text: str | None, model: str = "gpt-4o") -> int:
+    """Counts tokens locally with the model's tokenizer."""
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: Iterable[dict], model: str = "gpt-4o") -> int:
+    return sum(count_tokens(message["content"], model) + MESSAGE_TOKEN_OVERHEAD for message in messages)
@@ -0,0 +1,203 @@
+import asyncio
+import datetime
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from app.config import settings
+from app.database import SessionLocal, upsert_insert
+from app.models import Usage
+
+# USD per 1M tokens (input, output); models are matched by longest name prefix
+MODEL_PRICES_PER_MILLION = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+# User that calls made without an explicit user_id are billed to (e.g. ingestion jobs)
+usage_user_id: ContextVar[int | None] = ContextVar("usage_user_id", default=None)
+
+
+@contextmanager
+def bill_usage_to(user_id: int | None):
+    """Attributes model calls made inside the block (and threads it starts) to a user."""
+    token = usage_user_id.set(user_id)
+    try:
+        yield
+    finally:
+        usage_user_id.reset(token)
+
+
+@dataclass
+class TokenUsage:
+    """Tokens consumed by one model call."""
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    estimated: bool = False  # counted locally because the API reported no usage
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @classmethod
+    def from_response(cls, model: str, usage) -> "TokenUsage | None":
+        """Reads the `usage` block of an OpenAI response, if it has one."""
+        if usage is None:
+            return None
+        return cls(model=model, prompt_tokens=usage.prompt_tokens or 0, completion_tokens=usage.completion_tokens or 0)
+
+    @property
+    def cost_cents(self) -> float:
+        prices = next(
+            (price for name, price in sorted(MODEL_PRICES_PER_MILLION.items(), key=lambda item: -len(item[0]))
+             if self.model.startswith(name)),
+            None,
+        )
+        if prices is None:
+            return 0.0
+        input_price, output_price = prices
+        return (self.prompt_tokens * input_price + self.completion_tokens * output_price) / 1_000_000 * 100
+
+
+def _usage_day(now: datetime.datetime | None = None) -> datetime.datetime:
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return datetime.datetime.combine(now.date(), datetime.time())  # naive UTC midnight
+
+
+class UsageRecorder:
+    """
+    Aggregates token usage in memory and writes it to the daily Usage rows in batches.
+
+    Recording a call only updates a per (user, day) counter; `flush` turns all
+    pending counters into a single multi-row INSERT .. ON CONFLICT DO UPDATE
+    that adds to the stored totals, so each process writes at most one row
+    per user and day per flush interval. Fractions of a cent are carried over
+    to the next flush rather than rounded away.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[int, datetime.datetime], dict] = {}
+        self._cost_remainder: dict[tuple[int, datetime.datetime], float] = {}
+        self.totals_by_model: dict[str, dict] = {}
+        self.unattributed_calls = 0
+        self.estimated_calls = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def record(self, usage: TokenUsage | None, user_id: int | None = None) -> None:
+        if usage is None:
+            return
+        user_id = user_id if user_id is not None else usage_user_id.get()
+        with self._lock:
+            model_totals = self.totals_by_model.setdefault(
+                usage.model, {"api_calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+            )
+            model_totals["api_calls"] += 1
+            model_totals["prompt_tokens"] += usage.prompt_tokens
+            model_totals["completion_tokens"] += usage.completion_tokens
+            if usage.estimated:
+                self.estimated_calls += 1
+            if user_id is None:
+                self.unattributed_calls += 1
+                return
+
+            entry = self._pending.setdefault(
+                (user_id, _usage_day()), {"tokens_used": 0, "api_calls": 0, "cost_cents": 0.0}
+            )
+            entry["tokens_used"] += usage.total_tokens
+            entry["api_calls"] += 1
+            entry["cost_cents"] += usage.cost_cents
+
+    def _take_pending(self) -> list[dict]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            rows = []
+            for key, entry in pending.items():
+                cost_cents = entry["cost_cents"] + self._cost_remainder.pop(key, 0.0)
+                whole_cents = int(cost_cents)
+                if cost_cents - whole_cents:
+                    self._cost_remainder[key] = cost_cents - whole_cents
+                user_id, date = key
+                rows.append({
+                    "user_id": user_id,
+                    "date": date,
+                    "tokens_used": entry["tokens_used"],
+                    "api_calls": entry["api_calls"],
+                    "cost_cents": whole_cents,
+                })
+            return rows
+
+    def _restore_pending(self, rows: list[dict]) -> None:
+        with self._lock:
+            for row in rows:
+                entry = self._pending.setdefault(
+                    (row["user_id"], row["date"]), {"tokens_used": 0, "api_calls": 0, "cost_cents": 0.0}
+                )
+                entry["tokens_used"] += row["tokens_used"]
+                entry["api_calls"] += row["api_calls"]
+                entry["cost_cents"] += row["cost_cents"]
+
+    def flush(self) -> int:
+        """Adds all pending usage to the Usage table; returns the number of rows written."""
+        rows = self._take_pending()
+        if not rows:
+            return 0
+
+        insert = upsert_insert()
+        statement = insert(Usage).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Usage.user_id, Usage.date],
+            set_={
+                "tokens_used": Usage.tokens_used + statement.excluded.tokens_used,
+                "api_calls": Usage.api_calls + statement.excluded.api_calls,
+                "cost_cents": Usage.cost_cents + statement.excluded.cost_cents,
+            },
+        )
+        db = SessionLocal()
+        try:
+            db.execute(statement)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._restore_pending(rows)  # try again on the next flush
+            with self._lock:
+                self.flush_errors += 1
+            print(f"Warning: Could not write usage to the database, keeping it for the next flush. Error: {e}")
+            return 0
+        finally:
+            db.close()
+
+        with self._lock:
+            self.flushes += 1
+        return len(rows)
+
+    async def run_periodic_flush(self, interval_seconds: float = settings.USAGE_FLUSH_INTERVAL_SECONDS) -> None:
+        """Flushes pending usage every interval until cancelled, then flushes once more."""
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                await asyncio.to_thread(self.flush)
+        finally:
+            await asyncio.to_thread(self.flush)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_rows": len(self._pending),
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "unattributed_calls": self.unattributed_calls,
+                "estimated_calls": self.estimated_calls,
+                "by_model": {model: dict(totals) for model, totals in self.totals_by_model.items()},
+            }
+
+
+usage_recorder = UsageRecorder()
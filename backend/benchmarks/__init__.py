@@ -0,0 +1,16 @@
+"""
+Standalone benchmarks, run from backend/ with e.g. `python -m benchmarks.chat_load`.
+
+They use local stubs instead of OpenAI and a throwaway SQLite database and
+Chroma directory, so they need no credentials or running services.
+"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="fan-bench-")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("PINECONE_API_KEY", "unused")
+os.environ.setdefault("PINECONE_INDEX_NAME", "unused")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_workdir, 'app.db')}")
+os.environ.setdefault("CHROMA_PERSIST_DIRECTORY", os.path.join(_workdir, "chroma"))
+os.environ.setdefault("SCRAPE_OUTPUT_DIR", os.path.join(_workdir, "scraped"))
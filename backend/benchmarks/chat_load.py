@@ -0,0 +1,92 @@
+"""
+Load test for the async chat route with a stubbed LLM.
+
+Every completion takes --latency seconds (an asyncio sleep standing in for
+OpenAI), so a non-blocking route serves `concurrency` requests in about one
+latency period, while a route that blocked the event loop would serialise
+them. Reports throughput and latency percentiles per concurrency level.
+
+    python -m benchmarks.chat_load --latency 0.5 --concurrency 1 10 50 --requests 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import benchmarks  # noqa: F401  (throwaway environment)
+
+os.environ.setdefault("AUTH_DEV_USER_ID", "1")
+
+import httpx
+
+from app.database import SessionLocal
+from app.main import app
+from app.models import Persona
+from app.services.auth import ensure_dev_user
+from app.services.clients import clients
+from tests.fakes import FakeEmbeddings, StubAsyncOpenAI
+
+PERSONA_NAME = "Load Test Persona"
+
+
+def _setup(latency: float) -> StubAsyncOpenAI:
+    ensure_dev_user()
+    db = SessionLocal()
+    if not db.query(Persona).filter(Persona.name == PERSONA_NAME).first():
+        db.add(Persona(name=PERSONA_NAME, description="A cheerful test persona."))
+        db.commit()
+    db.close()
+    stub = StubAsyncOpenAI(latency=latency)
+    clients._async_openai = stub
+    clients._embeddings = FakeEmbeddings()
+    return stub
+
+
+async def _run_level(client: httpx.AsyncClient, concurrency: int, total: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/chat/", json={"user_query": f"Question {i}?", "influencer_name": PERSONA_NAME})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def main(latency: float, levels: list[int], total: int) -> None:
+    _setup(latency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        await _run_level(client, 1, 3)  # warm-up
+        print(f"Stub LLM latency {latency * 1000:.0f} ms; a blocking route would top out at {1 / latency:.1f} req/s")
+        for concurrency in levels:
+            result = await _run_level(client, concurrency, total)
+            ideal = min(concurrency, total) / latency
+            print(
+                f"concurrency {result['concurrency']:>4}: {result['throughput_rps']:7.1f} req/s "
+                f"({result['throughput_rps'] / ideal:5.0%} of ideal), "
+                f"p50 {result['p50_ms']:6.0f} ms, p95 {result['p95_ms']:6.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.concurrency, args.requests))
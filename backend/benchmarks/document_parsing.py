@@ -0,0 +1,65 @@
+"""
+Document parsing throughput per core over a generated corpus.
+
+Writes --documents plain-text files of --size-mb each (paragraphs of mixed
+length with multi-byte characters), then parses and splits the whole corpus
+with iter_document_chunks at each worker count. One worker is the in-process
+sequential path; more use the process pool. Reports MB/s, chunks/s and MB/s
+per worker, so scaling across cores is visible at a glance.
+
+    python -m benchmarks.document_parsing --documents 16 --size-mb 4 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  (throwaway environment)
+
+from app.background.document_process.loaders import iter_document_chunks
+
+WORDS = "fans persona creator stream merch café ünïcode tour release livestream community".split()
+
+
+def _write_corpus(directory: str, documents: int, size_mb: float) -> list[str]:
+    target = int(size_mb * 1024 * 1024)
+    paths = []
+    for d in range(documents):
+        path = os.path.join(directory, f"document-{d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            written, i = 0, 0
+            while written < target:
+                paragraph = " ".join(WORDS[(i + k) % len(WORDS)] for k in range(20 + i % 140))
+                paragraph += "\n\n" if i % 4 == 0 else "\n"
+                written += f.write(paragraph)
+                i += 1
+        paths.append(path)
+    return paths
+
+
+def main(documents: int, size_mb: float, levels: list[int]) -> None:
+    with tempfile.TemporaryDirectory(prefix="fan-parse-bench-") as directory:
+        paths = _write_corpus(directory, documents, size_mb)
+        total_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+        print(f"Corpus: {documents} documents, {total_mb:.0f} MB; {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in levels:
+            started = time.perf_counter()
+            chunks = sum(1 for _, document_chunks in iter_document_chunks(paths, max_workers=workers)
+                         for _ in document_chunks)
+            elapsed = time.perf_counter() - started
+            throughput = total_mb / elapsed
+            baseline = baseline or throughput
+            print(
+                f"workers {workers:>3}: {throughput:7.1f} MB/s, {chunks / elapsed:9.0f} chunks/s, "
+                f"{throughput / workers:6.1f} MB/s per core, speedup {throughput / baseline:4.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=16)
+    parser.add_argument("--size-mb", type=float, default=4.0, help="size of each generated document")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    main(args.documents, args.size_mb, args.workers)
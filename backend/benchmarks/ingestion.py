@@ -0,0 +1,68 @@
+"""
+Ingestion throughput with a fake embedder.
+
+Every embedding call takes --latency seconds (an asyncio sleep standing in for
+the OpenAI round trip) and producing each chunk takes --produce-ms of blocking
+work (standing in for parsing and chunk bookkeeping). With batches embedded
+concurrently and chunks produced off the event loop, a run should take about
+max(embedding time / concurrency, production time) rather than their sum.
+Chunks are written to a throwaway Chroma collection.
+
+    python -m benchmarks.ingestion --chunks 2000 --batch-size 100 --latency 0.3 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import time
+
+import benchmarks  # noqa: F401  (throwaway environment)
+
+from langchain_core.documents import Document
+
+from app.background.document_process.ingestion import ChunkIngestor
+from tests.fakes import FakeEmbeddings
+
+
+def _chunks(count: int, produce_seconds: float, run: int):
+    for i in range(count):
+        time.sleep(produce_seconds)
+        yield Document(
+            id=f"bench-{run}-{i}",
+            page_content=f"Benchmark chunk {i} of run {run}. " * 20,
+            metadata={"source": "benchmark", "chunk": i},
+        )
+
+
+def main(chunks: int, batch_size: int, latency: float, produce_ms: float, levels: list[int]) -> None:
+    batches = -(-chunks // batch_size)
+    produce_seconds = produce_ms / 1000
+    print(
+        f"{chunks} chunks in {batches} batches; fake embedder latency {latency * 1000:.0f} ms, "
+        f"production {produce_seconds * chunks:.2f} s in total"
+    )
+    for run, concurrency in enumerate(levels):
+        embeddings = FakeEmbeddings(latency=latency)
+        ingestor = ChunkIngestor(
+            "Benchmark Persona",
+            embeddings=embeddings,
+            batch_size=batch_size,
+            concurrency=concurrency,
+        )
+        started = time.perf_counter()
+        written = asyncio.run(ingestor.run(_chunks(chunks, produce_seconds, run), total=chunks))
+        elapsed = time.perf_counter() - started
+        ideal = max(latency * -(-batches // concurrency), produce_seconds * chunks)
+        print(
+            f"concurrency {concurrency:>3}: {written / elapsed:8.0f} chunks/s, {elapsed:6.2f} s "
+            f"(ideal ~{ideal:.2f} s), {embeddings.calls} embedding calls"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated embedding latency in seconds")
+    parser.add_argument("--produce-ms", type=float, default=0.5, help="blocking work per produced chunk")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+    main(args.chunks, args.batch_size, args.latency, args.produce_ms, args.concurrency)
@@ -0,0 +1,72 @@
+"""
+Social page parsing throughput per core, over saved HTML fixtures.
+
+benchmarks/fixtures holds a saved X profile page (20 tweets in the site's
+markup, plus its inline state blob) and an Instagram post page (bootstrap
+scripts ahead of the media JSON). Each worker process builds Scrapy responses
+from them and runs the scraper's parsers, as a crawl does per page. Reports
+pages/s per fixture at each worker count, in total and per worker.
+
+    python -m benchmarks.page_parsing --pages 400 --workers 1 2 4
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import benchmarks  # noqa: F401  (throwaway environment)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+FIXTURES = {
+    "x_profile": ("https://x.com/fixturefan", "x_profile.html"),
+    "instagram_post": ("https://www.instagram.com/p/Cfixture/", "instagram_post.html"),
+}
+
+
+def _parse_pages(fixture: str, pages: int) -> int:
+    """Parses the fixture `pages` times in this worker; returns the items found in the last pass."""
+    from scrapy.http import HtmlResponse
+
+    from app.background.scraper.parsers import instagram_media, next_page_url, parse_tweets
+
+    url, file_name = FIXTURES[fixture]
+    with open(os.path.join(FIXTURES_DIR, file_name), "rb") as f:
+        body = f.read()
+    items = 0
+    for _ in range(pages):
+        root = HtmlResponse(url, body=body, encoding="utf-8").selector.root
+        if fixture == "x_profile":
+            items = sum(1 for _ in parse_tweets(root))
+            next_page_url(root)
+        else:
+            items = sum(len(urls) for _, urls in instagram_media(root))
+    return items
+
+
+def main(pages: int, levels: list[int]) -> None:
+    print(f"{os.cpu_count()} CPUs; {pages} pages per worker")
+    context = multiprocessing.get_context("spawn")
+    for fixture in FIXTURES:
+        baseline = None
+        for workers in levels:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                list(pool.map(_parse_pages, [fixture] * workers, [5] * workers))  # start and warm up the workers
+                started = time.perf_counter()
+                items = list(pool.map(_parse_pages, [fixture] * workers, [pages] * workers))
+                elapsed = time.perf_counter() - started
+            throughput = workers * pages / elapsed
+            baseline = baseline or throughput
+            print(
+                f"{fixture:>15}, workers {workers:>3}: {throughput:8.0f} pages/s, "
+                f"{throughput / workers:7.0f} pages/s per core, speedup {throughput / baseline:4.1f}x "
+                f"({items[0]} items per page)"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400, help="pages parsed by each worker")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    main(args.pages, args.workers)
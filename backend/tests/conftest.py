@@ -0,0 +1,85 @@
+"""
+Test configuration: a throwaway SQLite database and Chroma directory, and
+Celery running jobs inline against in-memory transports (no Redis needed).
+The environment is set before any app module reads the settings.
+"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="fan-tests-")
+os.environ.update({
+    "OPENAI_API_KEY": "sk-test",
+    "PINECONE_API_KEY": "unused",
+    "PINECONE_INDEX_NAME": "unused",
+    "DATABASE_URL": f"sqlite:///{os.path.join(_workdir, 'app.db')}",
+    "CHROMA_PERSIST_DIRECTORY": os.path.join(_workdir, "chroma"),
+    "UPLOAD_DIR": os.path.join(_workdir, "uploads"),
+    "SCRAPE_OUTPUT_DIR": os.path.join(_workdir, "scraped"),
+    "CELERY_BROKER_URL": "memory://",
+    "CELERY_RESULT_BACKEND": "cache+memory://",
+    "CELERY_TASK_ALWAYS_EAGER": "true",
+    "AUTH_DEV_USER_ID": "1",
+})
+
+import pytest
+
+from app.database import create_db_and_tables
+from app.services.auth import ensure_dev_user
+from tests.fakes import FakeEmbeddings
+
+create_db_and_tables()
+ensure_dev_user()
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch) -> FakeEmbeddings:
+    """Routes ingestion's embedding calls and persona extraction away from OpenAI."""
+    from app.background.document_process import rag_builder
+    from app.services.clients import clients
+
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(clients, "create_embeddings", lambda **kwargs: embeddings)
+    monkeypatch.setattr(rag_builder, "extract_persona_from_docs", lambda text, name: f"{name}, a test persona.")
+    return embeddings
+
+
+@pytest.fixture
+def upload_dir() -> str:
+    os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+    return tempfile.mkdtemp(dir=os.environ["UPLOAD_DIR"])
+
+
+def write_document(directory: str, name: str, words: int = 400) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(" ".join(f"{name}-word{i}" for i in range(words)))
+    return path
+
+
+def ensure_user(user_id: int) -> int:
+    """Creates a plain user with this id unless it exists; returns the id."""
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        if db.get(User, user_id) is None:
+            db.add(User(
+                id=user_id,
+                username=f"user{user_id}",
+                email=f"user{user_id}@example.com",
+                password_hash="unused",
+            ))
+            db.commit()
+        return user_id
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def jwt_secret(monkeypatch) -> str:
+    from app.config import settings
+
+    secret = "test-secret-" + "x" * 32  # HS256 wants at least 32 bytes
+    monkeypatch.setattr(settings, "AUTH_JWT_SECRET", secret)
+    return secret
@@ -0,0 +1,98 @@
+"""Local stand-ins for OpenAI, shared by the tests and the benchmarks."""
+import asyncio
+import hashlib
+import time
+from types import SimpleNamespace
+from typing import List
+
+EMBEDDING_DIMENSIONS = 16
+
+
+def fake_vector(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Deterministic unit-ish vector derived from the text."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(digest[i % len(digest)] - 128) / 128 for i in range(dimensions)]
+
+
+class FakeEmbeddings:
+    """Embeddings with a configurable per-call latency, counting the texts it embeds."""
+
+    def __init__(self, latency: float = 0.0, fail_first: int = 0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.calls = 0
+        self.texts = 0
+
+    def _record(self, texts: List[str]) -> None:
+        self.calls += 1
+        if self.calls <= self.fail_first:
+            raise RuntimeError("simulated embedding failure")
+        self.texts += len(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        self._record(texts)
+        return [fake_vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        self._record(texts)
+        return [fake_vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class _StubCompletions:
+    def __init__(self, latency: float, reply: str):
+        self.latency = latency
+        self.reply = reply
+        self.calls = 0
+
+    async def create(self, messages, model, stream=False, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)  # simulated model latency, without blocking the loop
+        usage = SimpleNamespace(prompt_tokens=sum(len(m["content"]) // 4 for m in messages), completion_tokens=8)
+        if stream:
+            return _StubStream(model, self.reply, usage)
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(
+            model=model, usage=usage, choices=[SimpleNamespace(message=message, finish_reason="stop")]
+        )
+
+
+class _StubStream:
+    def __init__(self, model: str, reply: str, usage):
+        self._chunks = [
+            SimpleNamespace(model=model, usage=None, choices=[
+                SimpleNamespace(delta=SimpleNamespace(content=word), finish_reason=None)
+            ])
+            for word in reply.split(" ")
+        ]
+        self._chunks.append(SimpleNamespace(model=model, usage=None, choices=[
+            SimpleNamespace(delta=None, finish_reason="stop")
+        ]))
+        self._chunks.append(SimpleNamespace(model=model, usage=usage, choices=[]))
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+class StubAsyncOpenAI:
+    """Just enough of AsyncOpenAI for the chat routes: chat.completions.create, streaming or not."""
+
+    def __init__(self, latency: float = 0.0, reply: str = "Hello from the stub model"):
+        self.chat = SimpleNamespace(completions=_StubCompletions(latency, reply))
+
+    async def close(self):
+        pass
@@ -0,0 +1,116 @@
+"""
+A local stand-in for the sites the scraper crawls.
+
+FixtureSite is an HTTP server that crawls reach as their HTTP proxy, so
+spiders request the real URLs (http://x.com/...) and site routing works as
+in production, while every response comes from the pages registered here.
+Pages carry an ETag and answer conditional requests with 304 Not Modified.
+Dropped URLs close the connection without answering, like a failing CDN.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image, ImageDraw
+
+
+class FixtureSite:
+    def __init__(self):
+        self.pages: dict[str, tuple[bytes | None, str]] = {}
+        self.requests = Counter()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def proxy_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FixtureSite":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add(self, url: str, body: str | bytes, content_type: str = "text/html; charset=utf-8") -> None:
+        self.pages[url] = (body.encode("utf-8") if isinstance(body, str) else body, content_type)
+
+    def remove(self, url: str) -> None:
+        self.pages.pop(url, None)
+
+    def drop(self, url: str) -> None:
+        self.pages[url] = (None, "")
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                # Proxied requests carry the absolute URL
+                site.requests[self.path] += 1
+                page = site.pages.get(self.path)
+                if page is None:
+                    self.send_error(404)
+                    return
+                body, content_type = page
+                if body is None:
+                    self.close_connection = True
+                    return
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def tweet_page(handle: str, tweets: list[tuple[int, str, str]], next_url: str | None = None) -> str:
+    """An X profile page with (status id, ISO time, text) tweets, newest first."""
+    articles = "".join(
+        f'<article data-testid="tweet"><div data-testid="User-Name"><span>Fan</span><span>@{handle}</span></div>'
+        f'<a href="/{handle}/status/{status_id}"><time datetime="{posted_at}"></time></a>'
+        f'<div data-testid="tweetText"><span>{text}</span></div></article>'
+        for status_id, posted_at, text in tweets
+    )
+    more = f'<a rel="next" href="{next_url}">Show more</a>' if next_url else ""
+    return f"<html><body>{articles}{more}</body></html>"
+
+
+def instagram_post_page(items: list[tuple[int, list[str]]]) -> str:
+    """An Instagram post page embedding (taken_at, image URLs) items the way the site's web info script does."""
+    data = {"xdt_api__v1__media__shortcode__web_info": {"items": [
+        {
+            "taken_at": taken_at,
+            "carousel_media": [{"image_versions2": {"candidates": [{"url": url}]}} for url in urls],
+        }
+        for taken_at, urls in items
+    ]}}
+    return f'<html><body><script type="application/json">{json.dumps(data)}</script></body></html>'
+
+
+def image_bytes(seed: int, size: int = 96, image_format: str = "JPEG") -> bytes:
+    """A small image whose content (and perceptual hash) differs per seed."""
+    image = Image.new("RGB", (size, size), (seed * 40 % 256, 90, 160))
+    draw = ImageDraw.Draw(image)
+    for i in range(seed % 5 + 2):
+        offset = (seed * 13 + i * 17) % (size // 2)
+        draw.rectangle((offset, i * 9, offset + size // 3, i * 9 + size // 4), fill=(255 - i * 30, seed * 20 % 256, i * 50))
+    buffer = io.BytesIO()
+    image.save(buffer, image_format)
+    return buffer.getvalue()
@@ -0,0 +1,63 @@
+import datetime
+
+import jwt
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.auth import create_access_token
+from tests.conftest import ensure_user
+
+client = TestClient(app)
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _start_session(token: str) -> int:
+    response = client.post("/chat/start", headers=_auth(token))
+    assert response.status_code == 200
+    return response.json()["conversation_id"]
+
+
+def test_missing_bad_and_expired_tokens_are_rejected(jwt_secret, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_DEV_USER_ID", None)
+    expired = jwt.encode(
+        {"sub": "1", "exp": datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)},
+        jwt_secret,
+        algorithm=settings.AUTH_JWT_ALGORITHM,
+    )
+    forged = jwt.encode({"sub": "1", "exp": 4102444800}, "some-other-secret-" + "y" * 32, algorithm=settings.AUTH_JWT_ALGORITHM)
+
+    for headers in ({}, _auth("not-a-token"), _auth(expired), _auth(forged)):
+        response = client.post("/chat/start", headers=headers)
+        assert response.status_code == 401, headers
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_other_users_sessions_are_not_found(jwt_secret):
+    owner = create_access_token(ensure_user(11))
+    other = create_access_token(ensure_user(12))
+    conversation_id = _start_session(owner)
+
+    assert client.get(f"/chat/history/{conversation_id}", headers=_auth(owner)).status_code == 200
+    assert client.get(f"/chat/history/{conversation_id}", headers=_auth(other)).status_code == 404
+    response = client.post(
+        "/chat/",
+        headers=_auth(other),
+        json={"conversation_id": conversation_id, "user_query": "Hi", "influencer_name": "Anyone"},
+    )
+    assert response.status_code == 404
+
+
+def test_dev_user_fallback_only_when_configured(jwt_secret, monkeypatch):
+    conversation_id = client.post("/chat/start").json()["conversation_id"]  # AUTH_DEV_USER_ID=1 in the test env
+    assert client.get(f"/chat/history/{conversation_id}").status_code == 200
+
+    monkeypatch.setattr(settings, "AUTH_DEV_USER_ID", None)
+    assert client.post("/chat/start").status_code == 401
+    assert client.get(f"/chat/history/{conversation_id}").status_code == 401
+    # A token still wins over the fallback, and is all that works without it
+    token = create_access_token(ensure_user(13))
+    assert client.get(f"/chat/history/{conversation_id}", headers=_auth(token)).status_code == 404
@@ -0,0 +1,14 @@
+from app.config import settings
+from app.services.chat_engine import resolve_model
+
+
+def test_legacy_sessions_keep_the_default_model(capsys):
+    assert resolve_model("gpt-3.5-turbo") == settings.CHAT_DEFAULT_MODEL
+    assert capsys.readouterr().out == ""  # an expected name, not a rejected one
+
+
+def test_tiers_and_unknown_models():
+    assert resolve_model("fast") == "gpt-4o-mini"
+    assert resolve_model("gpt-4.1") == "gpt-4.1"
+    assert resolve_model("some-other-model") == settings.CHAT_DEFAULT_MODEL
+    assert resolve_model(None) == settings.CHAT_DEFAULT_MODEL
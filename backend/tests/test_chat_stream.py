@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal, async_engine
+from app.main import app
+from app.models import Message, MessageType, Persona
+from app.services.clients import clients
+from tests.fakes import StubAsyncOpenAI
+
+PERSONA_NAME = "Stream Persona"
+client = TestClient(app)  # runs as AUTH_DEV_USER_ID
+
+
+@pytest.fixture
+def stub_openai(monkeypatch) -> StubAsyncOpenAI:
+    db = SessionLocal()
+    try:
+        if not db.query(Persona).filter(Persona.name == PERSONA_NAME).first():
+            db.add(Persona(name=PERSONA_NAME, description="A persona that streams."))
+            db.commit()
+    finally:
+        db.close()
+    stub = StubAsyncOpenAI(reply="one two three four")
+    monkeypatch.setattr(clients, "_async_openai", stub)
+    return stub
+
+
+def _start_session() -> int:
+    # Without RAG, turns need nothing but the stub model
+    return client.post("/chat/start", json={"use_rag": False}).json()["conversation_id"]
+
+
+def _parse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.split("\n\n"):
+        if not block.strip():
+            continue
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return events
+
+
+def _saved_messages(conversation_id: int) -> list[Message]:
+    db = SessionLocal()
+    try:
+        return db.query(Message).filter(Message.chat_session_id == conversation_id).order_by(Message.id).all()
+    finally:
+        db.close()
+
+
+def test_stream_sends_meta_tokens_then_done(stub_openai):
+    conversation_id = _start_session()
+
+    response = client.post(
+        "/chat/stream",
+        json={"conversation_id": conversation_id, "user_query": "Count for me", "influencer_name": PERSONA_NAME},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_events(response.text)
+    assert [name for name, _ in events] == ["meta", "message", "message", "message", "message", "done"]
+    assert events[0][1]["conversation_id"] == conversation_id
+    assert "".join(data["token"] for name, data in events if name == "message") == "onetwothreefour"
+    assert events[-1][1] == {"conversation_id": conversation_id, "finish_reason": "stop"}
+    saved = _saved_messages(conversation_id)
+    assert [(m.message_type, m.content, m.finish_reason) for m in saved] == [
+        (MessageType.USER, "Count for me", None),
+        (MessageType.ASSISTANT, "onetwothreefour", "stop"),
+    ]
+
+
+async def _stream_then_disconnect(conversation_id: int, after_tokens: int) -> list[bytes]:
+    """Calls the ASGI app directly and disconnects once `after_tokens` token events have arrived."""
+    request_body = json.dumps(
+        {"conversation_id": conversation_id, "user_query": "Stop me early", "influencer_name": PERSONA_NAME}
+    ).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat/stream",
+        "raw_path": b"/chat/stream",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"testserver")],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    disconnected = asyncio.Event()
+    request_sent = False
+    chunks = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": request_body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] != "http.response.body" or not message.get("body"):
+            return
+        chunks.append(message["body"])
+        if sum(b'"token"' in chunk for chunk in chunks) >= after_tokens:
+            disconnected.set()
+            await asyncio.sleep(1)  # the client is gone; the response is cancelled here
+
+    # The async engine's pooled connections belong to the TestClient's loop
+    await async_engine.dispose(close=False)
+    try:
+        await app(scope, receive, send)
+    finally:
+        await async_engine.dispose(close=False)
+    return chunks
+
+
+def test_disconnect_mid_stream_still_saves_the_partial_reply(stub_openai):
+    conversation_id = _start_session()
+
+    # asyncio.run closes the abandoned stream generator before returning, running its shielded save
+    chunks = asyncio.run(_stream_then_disconnect(conversation_id, after_tokens=2))
+
+    events = _parse_events(b"".join(chunks).decode())
+    assert [name for name, _ in events] == ["meta", "message", "message"]
+    saved = _saved_messages(conversation_id)
+    assert [(m.message_type, m.content, m.finish_reason) for m in saved] == [
+        (MessageType.USER, "Stop me early", None),
+        (MessageType.ASSISTANT, "onetwo", "client_disconnected"),
+    ]
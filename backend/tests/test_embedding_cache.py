@@ -0,0 +1,28 @@
+from app.services.embedding_cache import EmbeddingCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+
+def test_redis_tier_returns_the_vectors_the_local_tier_holds():
+    redis = FakeRedis()
+    writer = EmbeddingCache(max_entries=10, ttl_seconds=60)
+    writer._redis = redis
+    vector = [0.1, -0.2, 1 / 3, 1e-9]
+
+    writer.set("test-model", "What is your favourite song?", vector)
+
+    # Another worker, with only the shared Redis tier to go on
+    reader = EmbeddingCache(max_entries=10, ttl_seconds=60)
+    reader._redis = redis
+    assert reader.get("test-model", "what is your favourite song") == vector
+    assert writer.get("test-model", "What is your favourite song?") == vector
+    assert reader.redis_hits == 1
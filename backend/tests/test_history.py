@@ -0,0 +1,73 @@
+import datetime
+import json
+
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal
+from app.main import app
+from app.models import Message, MessageType
+
+client = TestClient(app)  # runs as AUTH_DEV_USER_ID
+
+
+def _session_with_messages(count: int, distinct_times: int) -> tuple[int, list[str]]:
+    """A session of `count` messages whose created_at only takes `distinct_times` values."""
+    conversation_id = client.post("/chat/start").json()["conversation_id"]
+    start = datetime.datetime(2026, 1, 1, 12, 0)
+    db = SessionLocal()
+    try:
+        db.add_all(
+            Message(
+                chat_session_id=conversation_id,
+                user_id=1,
+                message_type=MessageType.USER if i % 2 == 0 else MessageType.ASSISTANT,
+                content=f"message {i}",
+                created_at=start + datetime.timedelta(seconds=i * distinct_times // count),
+            )
+            for i in range(count)
+        )
+        db.commit()
+    finally:
+        db.close()
+    return conversation_id, [f"message {i}" for i in range(count)]
+
+
+def test_pages_follow_the_cursor_across_equal_timestamps():
+    conversation_id, expected = _session_with_messages(23, distinct_times=3)
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/chat/history/{conversation_id}", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        pages.append([message["content"] for message in body["messages"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert [content for page in pages for content in page] == expected
+
+
+def test_malformed_cursor_is_rejected():
+    conversation_id, _ = _session_with_messages(3, distinct_times=1)
+
+    for cursor in ("not-a-cursor", "bm90LWEtdGltZXw0Mg=="):  # the second is "not-a-time|42"
+        response = client.get(f"/chat/history/{conversation_id}", params={"cursor": cursor})
+        assert response.status_code == 400
+
+
+def test_ndjson_export_streams_every_message():
+    conversation_id, expected = _session_with_messages(1200, distinct_times=40)
+
+    with client.stream("GET", f"/chat/history/{conversation_id}", params={"format": "ndjson"}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert [row["content"] for row in rows] == expected
+    assert rows[0]["role"] == "user" and rows[1]["role"] == "assistant"
+    # Each row's cursor resumes right after it
+    resumed = client.get(f"/chat/history/{conversation_id}", params={"cursor": rows[599]["cursor"], "limit": 1})
+    assert resumed.json()["messages"][0]["content"] == "message 600"
@@ -0,0 +1,53 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.lexical_index import BM25Index, LexicalIndexStore
+
+
+def _index(n: int) -> BM25Index:
+    return BM25Index.build(
+        (f"chunk-{n}-{i}", f"writer {n} chunk {i} " + "filler " * 200, {"writer": n}) for i in range(50)
+    )
+
+
+def test_concurrent_writes_leave_a_complete_index(tmp_path):
+    store = LexicalIndexStore(str(tmp_path), cache_size=4)
+    indexes = [_index(n) for n in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda index: store.write("Busy Persona", index), indexes * 4))
+
+    loaded = store.get("Busy Persona")
+    assert len(loaded) == 50
+    assert len({metadata["writer"] for metadata in loaded.metadatas}) == 1
+    assert os.listdir(tmp_path) == [os.path.basename(store.path("Busy Persona"))]
+
+
+def test_extending_an_index_matches_a_full_build():
+    chunks = [
+        (f"chunk-{i}", f"post {i} about #tour{i % 3} and merch code XJ-{i % 5}00 " + "word " * (i % 7), {"i": i})
+        for i in range(40)
+    ]
+
+    extended = BM25Index.build(chunks[:25]).extended(chunks[25:])
+
+    assert extended.to_dict() == BM25Index.build(chunks).to_dict()
+    assert extended.search("#tour1 xj-300", k=5) == BM25Index.build(chunks).search("#tour1 xj-300", k=5)
+
+
+def test_locked_updates_run_one_at_a_time(tmp_path):
+    store = LexicalIndexStore(str(tmp_path), cache_size=4)
+    active, overlaps = [], []
+
+    def update(n: int) -> None:
+        with store.locked("Busy Persona"):
+            active.append(n)
+            overlaps.append(len(active))
+            time.sleep(0.01)
+            active.remove(n)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(update, range(8)))
+
+    assert overlaps == [1] * 8
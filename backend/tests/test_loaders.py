@@ -0,0 +1,84 @@
+import os
+
+from app.background.document_process import loaders
+
+
+def _write_corpus_file(directory: str, name: str, paragraphs: int) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(paragraphs):
+            # Mixed line lengths, blank lines and multi-byte characters
+            f.write(f"Paragraph {i} of {name}: café ünïcode — " + "word " * (i % 90) + "\n")
+            if i % 3 == 0:
+                f.write("\n")
+    return path
+
+
+def _read_text(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _chunk_tuples(chunks) -> list[tuple]:
+    return [
+        (chunk.page_content, chunk.metadata["page"], chunk.metadata["start_position"], chunk.metadata["end_position"])
+        for chunk in chunks
+    ]
+
+
+def test_text_chunk_offsets_match_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(loaders, "TEXT_SEGMENT_BYTES", 4096)
+    path = _write_corpus_file(str(tmp_path), "notes.txt", paragraphs=600)
+    text = _read_text(path)
+
+    chunks = list(loaders.iter_chunks(path))
+
+    assert len({chunk.metadata["page"] for chunk in chunks}) > 5
+    for chunk in chunks:
+        assert text[chunk.metadata["start_position"]:chunk.metadata["end_position"]] == chunk.page_content
+    assert chunks[-1].metadata["end_position"] == len(text.rstrip())
+
+
+def test_text_segments_tile_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(loaders, "TEXT_SEGMENT_BYTES", 1000)
+    path = _write_corpus_file(str(tmp_path), "tiles.txt", paragraphs=300)
+
+    segments = [page.page_content for page in loaders.iter_pages(path)]
+
+    assert len(segments) > 10
+    assert "".join(segments) == _read_text(path)
+
+
+def test_parallel_parsing_matches_sequential(tmp_path):
+    # Large enough to take the process pool path, with several parts per document
+    paragraphs = 11000
+    paths = [_write_corpus_file(str(tmp_path), f"doc{i}.txt", paragraphs) for i in range(2)]
+    assert sum(os.path.getsize(path) for path in paths) >= loaders.PARALLEL_PARSE_MIN_BYTES
+    assert len(loaders.document_parts(paths[0])) > 1
+
+    parallel = [(path, _chunk_tuples(chunks)) for path, chunks in loaders.iter_document_chunks(paths, max_workers=2)]
+
+    assert [path for path, _ in parallel] == paths
+    for path, chunks in parallel:
+        assert chunks == _chunk_tuples(loaders.iter_chunks(path))
+        text = _read_text(path)
+        assert all(text[start:end] == content for content, _, start, end in chunks)
+
+
+def test_single_large_document_is_parsed_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.setattr(loaders, "TEXT_SEGMENT_BYTES", 64 * 1024)
+    monkeypatch.setattr(loaders, "PARALLEL_PARSE_MIN_BYTES", 128 * 1024)
+    path = _write_corpus_file(str(tmp_path), "memoir.txt", paragraphs=2000)
+    pools = []
+
+    class RecordingPool(loaders.ProcessPoolExecutor):
+        def __init__(self, max_workers, **kwargs):
+            pools.append(max_workers)
+            super().__init__(max_workers=max_workers, **kwargs)
+
+    monkeypatch.setattr(loaders, "ProcessPoolExecutor", RecordingPool)
+
+    parsed = [(path, _chunk_tuples(chunks)) for path, chunks in loaders.iter_document_chunks([path], max_workers=4)]
+
+    assert pools == [4]  # one document, but more parts than workers
+    assert parsed == [(path, _chunk_tuples(loaders.iter_chunks(path)))]
@@ -0,0 +1,33 @@
+from app.background.scraper.media import MediaIndex, get_or_create_persona_id, store_image
+from app.database import SessionLocal
+from app.models import MediaAsset
+from tests.fixture_site import image_bytes
+
+
+def _store(body: bytes, url: str, persona_id: int, index: MediaIndex, store_dir: str) -> dict:
+    return store_image(body, url, persona_id, index, store_dir, thumbnail_size=32)
+
+
+def test_duplicates_link_to_a_row_another_crawl_recorded(tmp_path):
+    persona_id = get_or_create_persona_id("Media Race Persona")
+    original_url = "https://cdn.fixture.test/media/original.jpg"
+    _store(image_bytes(3), original_url, persona_id, MediaIndex(near_duplicate_bits=4), str(tmp_path))
+
+    # A second crawl that loaded its index before the first one stored the image
+    index = MediaIndex(near_duplicate_bits=4)
+    _store(image_bytes(3), original_url, persona_id, index, str(tmp_path))
+    repost = _store(
+        image_bytes(3, image_format="PNG"), "https://cdn.fixture.test/media/repost.png", persona_id, index, str(tmp_path)
+    )
+
+    db = SessionLocal()
+    try:
+        assets = {
+            asset.source_key: asset
+            for asset in db.query(MediaAsset).filter(MediaAsset.persona_id == persona_id)
+        }
+    finally:
+        db.close()
+    assert set(assets) == {"original.jpg", "repost.png"}
+    assert repost["duplicate"]
+    assert assets["repost.png"].duplicate_of_id == assets["original.jpg"].id
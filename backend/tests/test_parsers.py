@@ -0,0 +1,38 @@
+import datetime
+
+from scrapy.http import HtmlResponse
+
+from app.background.scraper.parsers import extract_json_value, instagram_media, next_page_url, parse_tweets
+from benchmarks.page_parsing import FIXTURES, FIXTURES_DIR
+
+
+def _fixture_root(fixture: str):
+    url, file_name = FIXTURES[fixture]
+    with open(f"{FIXTURES_DIR}/{file_name}", "rb") as f:
+        return HtmlResponse(url, body=f.read(), encoding="utf-8").selector.root
+
+
+def test_saved_x_profile_parses():
+    root = _fixture_root("x_profile")
+
+    tweets = list(parse_tweets(root))
+
+    assert len(tweets) == 20
+    assert all(tweet["user"] == "@fixturefan" and tweet["tweet_text"] for tweet in tweets)
+    assert tweets[0]["tweet_id"] == 1790000000000000000
+    assert tweets[0]["posted_at"] == datetime.datetime(2026, 5, 28, 10, 0)
+    assert [tweet["tweet_id"] for tweet in tweets] == sorted((tweet["tweet_id"] for tweet in tweets), reverse=True)
+    assert next_page_url(root) == "/fixturefan?cursor=DAABCgABGN"
+
+
+def test_saved_instagram_post_yields_the_largest_image_of_each_carousel_entry():
+    [(posted_at, urls)] = instagram_media(_fixture_root("instagram_post"))
+
+    assert posted_at == datetime.datetime(2026, 5, 27, 16, 40)
+    assert len(urls) == 6
+    assert all("_0_n.jpg" in url for url in urls)
+
+
+def test_extract_json_value_decodes_only_the_requested_value():
+    text = 'prefix {"other": [1, 2], "items": [{"a": "}"}], "broken": ' + "{" * 3
+    assert extract_json_value(text, "items") == [{"a": "}"}]
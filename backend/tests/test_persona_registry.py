@@ -0,0 +1,33 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.models import Persona
+from app.services.persona_registry import PersonaRegistry
+
+
+class _PersonaDB:
+    """Answers the registry's persona query from a dict, counting the queries."""
+
+    def __init__(self, names: list[str]):
+        self.personas = {name: Persona(id=i, name=name, description=f"{name} persona") for i, name in enumerate(names)}
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        name = statement.whereclause.right.value
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(first=lambda: self.personas.get(name)))
+
+
+def test_registry_keeps_the_most_recently_used_personas():
+    db = _PersonaDB(["a", "b", "c"])
+    registry = PersonaRegistry(ttl_seconds=60, max_entries=2)
+
+    async def lookups(names):
+        return [(await registry.get(db, name)).name for name in names]
+
+    assert asyncio.run(lookups(["a", "b", "a", "c"])) == ["a", "b", "a", "c"]
+    assert registry.stats()["size"] == 2
+    assert db.queries == 3  # "a" was served from the cache
+
+    asyncio.run(lookups(["a", "b"]))  # "b" was evicted as least recently used, "a" was not
+    assert db.queries == 4
@@ -0,0 +1,87 @@
+import os
+
+from app.background.document_process.rag_builder import add_documents_to_vectorstore
+from app.database import SessionLocal
+from app.models import Content, ContentChunk, Persona
+from app.services.clients import clients
+
+
+def _write_paragraphs(directory: str, name: str, paragraphs: list[str]) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write("\n\n".join(paragraphs))
+    return path
+
+
+def _paragraph(label: str) -> str:
+    # Well under the 1000-character chunk size, so each paragraph is a chunk of its own
+    return " ".join(f"{label}-word{i}" for i in range(60))
+
+
+def _stored_chunks(persona_name: str) -> dict[str, set[str]]:
+    """Chroma chunk ids per document title, from the SQL rows."""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Content.title, ContentChunk.chroma_chunk_id)
+            .join(ContentChunk, ContentChunk.content_id == Content.id)
+            .join(Persona, Content.influencer_id == Persona.id)
+            .filter(Persona.name == persona_name)
+        )
+        chunks = {}
+        for title, chroma_chunk_id in rows:
+            chunks.setdefault(title, set()).add(chroma_chunk_id)
+        return chunks
+    finally:
+        db.close()
+
+
+def _vector_ids(persona_name: str) -> set[str]:
+    return set(clients.get_collection(persona_name).get(include=[])["ids"])
+
+
+def test_reingest_embeds_only_what_changed(fake_embeddings, upload_dir):
+    persona_name = "Incremental Persona"
+    paragraphs = [_paragraph(f"p{i}") for i in range(8)]
+    add_documents_to_vectorstore([_write_paragraphs(upload_dir, "bio.txt", paragraphs)], persona_name)
+    original = _stored_chunks(persona_name)["bio.txt"]
+    assert len(original) == 8
+    assert fake_embeddings.texts == 8
+    assert _vector_ids(persona_name) == original
+
+    # The same file again embeds nothing
+    add_documents_to_vectorstore([_write_paragraphs(upload_dir, "bio.txt", paragraphs)], persona_name)
+    assert fake_embeddings.texts == 8
+    assert _stored_chunks(persona_name)["bio.txt"] == original
+
+    # One changed paragraph re-embeds its chunk only, and its old chunk is deleted everywhere
+    paragraphs[3] = _paragraph("edited")
+    add_documents_to_vectorstore([_write_paragraphs(upload_dir, "bio.txt", paragraphs)], persona_name)
+    updated = _stored_chunks(persona_name)["bio.txt"]
+    assert fake_embeddings.texts == 9
+    assert len(updated) == 8
+    assert len(original - updated) == 1
+    assert _vector_ids(persona_name) == updated
+
+
+def test_remove_documents_deletes_rows_and_vectors(fake_embeddings, upload_dir):
+    persona_name = "Removal Persona"
+    add_documents_to_vectorstore(
+        [
+            _write_paragraphs(upload_dir, "keep.txt", [_paragraph("keep")]),
+            _write_paragraphs(upload_dir, "drop.txt", [_paragraph("drop1"), _paragraph("drop2")]),
+        ],
+        persona_name,
+    )
+    kept = _stored_chunks(persona_name)["keep.txt"]
+    assert len(_vector_ids(persona_name)) == 3
+
+    add_documents_to_vectorstore([], persona_name, remove_documents=["drop.txt"])
+
+    assert _stored_chunks(persona_name) == {"keep.txt": kept}
+    assert _vector_ids(persona_name) == kept
+    db = SessionLocal()
+    try:
+        assert db.query(Content).filter(Content.title == "drop.txt").count() == 0
+    finally:
+        db.close()
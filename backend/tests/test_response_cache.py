@@ -0,0 +1,26 @@
+from app.services.response_cache import SemanticResponseCache, response_variant
+
+
+def test_answers_are_only_shared_within_a_model_and_system_prompt():
+    cache = SemanticResponseCache(similarity_threshold=0.95, max_entries_per_persona=10, ttl_seconds=60)
+    default = response_variant("gpt-4o-mini", None)
+    vector = [0.3, 0.4, 0.5]
+    cache.store("Cached Persona", default, vector, "Hi there!", ["context"])
+
+    assert cache.lookup("Cached Persona", response_variant("gpt-4o-mini", None), vector).answer == "Hi there!"
+    assert cache.lookup("Cached Persona", response_variant("gpt-4o", None), vector) is None
+    assert cache.lookup("Cached Persona", response_variant("gpt-4o-mini", "Answer in French."), vector) is None
+    assert cache.lookup("Other Persona", default, vector) is None
+
+
+def test_invalidating_a_persona_drops_every_variant():
+    cache = SemanticResponseCache(similarity_threshold=0.95, max_entries_per_persona=10, ttl_seconds=60)
+    variants = [response_variant("gpt-4o-mini", None), response_variant("gpt-4o", "Be brief.")]
+    for variant in variants:
+        cache.store("Cached Persona", variant, [1.0, 0.0], "Answer", [])
+    assert cache.stats()["entries"] == 2
+
+    cache.invalidate("Cached Persona")
+
+    assert all(cache.lookup("Cached Persona", variant, [1.0, 0.0]) is None for variant in variants)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,218 @@
+import json
+import os
+
+import pytest
+
+from app.background.scraper.runner import ScrapeRunner, _run_crawl
+from app.database import SessionLocal
+from app.models import Content, ContentType, MediaAsset, Persona, SourceCursor, Usage
+from app.services.lexical_index import lexical_indexes
+from tests.fakes import FakeEmbeddings
+from tests.fixture_site import FixtureSite, image_bytes, instagram_post_page, tweet_page
+
+PROFILE_URL = "http://x.com/fixturefan"
+POST_URL = "http://instagram.com/p/fixture/"
+
+
+def _crawl_offline(persona_name: str, urls: list[str], profile: str | None, user_id: int | None) -> dict:
+    """Runs in the spawned crawl process: the runner's crawl with OpenAI stubbed out."""
+    from app.background.document_process import rag_builder
+    from app.config import settings
+    from app.services.clients import clients
+    from app.services.embedding_cache import CachedEmbeddings
+
+    # Still wrapped like the real embeddings, so their usage is recorded
+    clients.create_embeddings = lambda **kwargs: CachedEmbeddings(
+        FakeEmbeddings(), clients.embedding_cache, settings.EMBEDDING_MODEL
+    )
+    rag_builder.extract_persona_from_docs = lambda text, name: f"{name}, a test persona."
+    return _run_crawl(persona_name, urls, profile, user_id)
+
+
+def crawl(persona_name: str, urls: list[str], user_id: int | None = None) -> dict:
+    # Each crawl gets a fresh process, like ScrapeRunner's; the fixture site is its HTTP proxy
+    runner = ScrapeRunner(max_parallel=1)
+    try:
+        return runner.executor.submit(_crawl_offline, persona_name, urls, "fast", user_id).result(timeout=120)
+    finally:
+        runner.shutdown()
+
+
+@pytest.fixture
+def site(monkeypatch):
+    site = FixtureSite().start()
+    monkeypatch.setenv("http_proxy", site.proxy_url)
+    monkeypatch.delenv("no_proxy", raising=False)
+    yield site
+    site.stop()
+
+
+def _posts(persona_name: str) -> list[str]:
+    db = SessionLocal()
+    try:
+        return sorted(
+            title for (title,) in db.query(Content.title).join(Persona, Content.influencer_id == Persona.id)
+            .filter(Persona.name == persona_name, Content.content_type == ContentType.SOCIAL_POST)
+        )
+    finally:
+        db.close()
+
+
+def _media(persona_name: str) -> list[MediaAsset]:
+    db = SessionLocal()
+    try:
+        return (
+            db.query(MediaAsset).join(Persona, MediaAsset.persona_id == Persona.id)
+            .filter(Persona.name == persona_name).order_by(MediaAsset.id).all()
+        )
+    finally:
+        db.close()
+
+
+def _tokens_billed(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return sum(tokens for (tokens,) in db.query(Usage.tokens_used).filter(Usage.user_id == user_id))
+    finally:
+        db.close()
+
+
+def _cursor(persona_name: str, source_url: str) -> SourceCursor | None:
+    db = SessionLocal()
+    try:
+        return (
+            db.query(SourceCursor).join(Persona, SourceCursor.persona_id == Persona.id)
+            .filter(Persona.name == persona_name, SourceCursor.source_url == source_url).first()
+        )
+    finally:
+        db.close()
+
+
+def test_crawl_ingests_posts_across_pages(site):
+    site.add(PROFILE_URL, tweet_page("fixturefan", [
+        (103, "2026-03-03T10:00:00Z", "Tour dates are out"),
+        (102, "2026-03-02T10:00:00Z", "New single on Friday"),
+    ], next_url="/fixturefan?page=2"))
+    site.add(f"{PROFILE_URL}?page=2", tweet_page("fixturefan", [
+        (101, "2026-03-01T10:00:00Z", "Thank you all for the support"),
+    ]))
+
+    tokens_before = _tokens_billed(1)
+
+    summary = crawl("Crawl Persona", [PROFILE_URL], user_id=1)
+
+    assert summary["finish_reason"] == "finished"
+    assert summary["items"] == 3
+    assert summary["posts_ingested"] == 3
+    assert summary["errors"] == 0
+    assert _posts("Crawl Persona") == [
+        "@fixturefan: New single on Friday",
+        "@fixturefan: Thank you all for the support",
+        "@fixturefan: Tour dates are out",
+    ]
+    with open(summary["output"], encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+    assert int(_cursor("Crawl Persona", PROFILE_URL).last_item_id) == 103
+    # Embedding the posts was billed to the job's user before the crawl process exited
+    assert _tokens_billed(1) > tokens_before
+
+
+def test_recrawl_only_fetches_what_is_new(site):
+    site.add(PROFILE_URL, tweet_page("fixturefan", [
+        (202, "2026-04-02T10:00:00Z", "Rehearsal day"),
+        (201, "2026-04-01T10:00:00Z", "Back in the studio"),
+    ], next_url="/fixturefan?page=2"))
+    site.add(f"{PROFILE_URL}?page=2", tweet_page("fixturefan", [(200, "2026-03-31T10:00:00Z", "Older post")]))
+    crawl("Recrawl Persona", [PROFILE_URL])
+
+    unchanged = crawl("Recrawl Persona", [PROFILE_URL])
+    assert unchanged["items"] == 0
+    assert unchanged["posts_ingested"] == 0
+
+    site.add(PROFILE_URL, tweet_page("fixturefan", [
+        (203, "2026-04-03T10:00:00Z", "Surprise show tonight"),
+        (202, "2026-04-02T10:00:00Z", "Rehearsal day"),
+    ], next_url="/fixturefan?page=2"))
+    page_two_requests = site.requests[f"{PROFILE_URL}?page=2"]
+
+    delta = crawl("Recrawl Persona", [PROFILE_URL])
+
+    assert delta["items"] == 1
+    assert delta["posts_ingested"] == 1
+    assert delta["seen_items_skipped"] == 1
+    assert site.requests[f"{PROFILE_URL}?page=2"] == page_two_requests  # pagination stopped at seen content
+    assert len(_posts("Recrawl Persona")) == 4
+    index = lexical_indexes.get("Recrawl Persona")  # the new post was appended to the existing index
+    assert len(index) == 4
+    assert index.documents(index.search("surprise show", k=1))[0].page_content == "Surprise show tonight"
+
+
+def test_crawl_stores_media_once(site):
+    images = {f"http://cdn.fixture.test/media/{name}.jpg": image_bytes(seed) for seed, name in enumerate("abc")}
+    for url, body in images.items():
+        site.add(url, body, "image/jpeg")
+    # The same file from another CDN host, and a re-encoded copy of the first image
+    site.add("http://cdn2.fixture.test/media/a.jpg", images["http://cdn.fixture.test/media/a.jpg"], "image/jpeg")
+    site.add("http://cdn.fixture.test/media/a_copy.jpg", image_bytes(0, image_format="PNG"), "image/png")
+    urls = list(images)
+    site.add(POST_URL, instagram_post_page([
+        (1767000000, urls[:2] + ["http://cdn2.fixture.test/media/a.jpg"]),
+        (1767000100, [urls[2], "http://cdn.fixture.test/media/a_copy.jpg"]),
+    ]))
+
+    summary = crawl("Media Persona", [POST_URL])
+
+    assert summary["finish_reason"] == "finished"
+    assert summary["media_stored"] == 3
+    assert summary["media_duplicates"] == 1
+    assert summary["media_skipped"] == 1
+    assert site.requests["http://cdn2.fixture.test/media/a.jpg"] == 0
+    media = _media("Media Persona")
+    assert len(media) == 4
+    copy = next(asset for asset in media if asset.source_key == "a_copy.jpg")
+    assert copy.duplicate_of_id == next(asset.id for asset in media if asset.source_key == "a.jpg")
+    media_dir = os.path.join(os.environ["SCRAPE_OUTPUT_DIR"], "media")
+    assert all(os.path.exists(os.path.join(media_dir, asset.storage_path)) for asset in media)
+
+    again = crawl("Media Persona", [POST_URL])
+    assert again["not_modified"] + again["cache_hits"] + again["cache_revalidations"] >= 1
+    assert again["media_stored"] == 0
+    assert len(_media("Media Persona")) == 4
+
+
+def test_failed_source_keeps_its_cursor(site):
+    missing_url = "http://x.com/missingfan"
+    site.add(PROFILE_URL, tweet_page("fixturefan", [(301, "2026-05-01T10:00:00Z", "Hello again")]))
+
+    summary = crawl("Partial Persona", [PROFILE_URL, missing_url])
+
+    assert summary["finish_reason"] == "finished"
+    assert summary["statuses"].get("404") == 1
+    assert _cursor("Partial Persona", PROFILE_URL) is not None
+    assert _cursor("Partial Persona", missing_url) is None
+    with open(summary["stats_file"], encoding="utf-8") as f:
+        assert json.load(f)["urls"] == [PROFILE_URL, missing_url]
+
+
+def test_failed_media_holds_back_only_its_source(site):
+    good_image, broken_image = "http://cdn.fixture.test/media/ok.jpg", "http://cdn.fixture.test/media/broken.jpg"
+    site.add(good_image, image_bytes(7), "image/jpeg")
+    site.drop(broken_image)
+    site.add(POST_URL, instagram_post_page([(1768000000, [good_image, broken_image])]))
+    site.add(PROFILE_URL, tweet_page("fixturefan", [(401, "2026-06-01T10:00:00Z", "Meet and greet")]))
+
+    summary = crawl("Flaky Media Persona", [POST_URL, PROFILE_URL])
+
+    assert summary["finish_reason"] == "finished"
+    assert summary["media_stored"] == 1
+    assert _cursor("Flaky Media Persona", POST_URL) is None
+    assert int(_cursor("Flaky Media Persona", PROFILE_URL).last_item_id) == 401
+
+    # The post is not seen yet, so the next crawl picks up the image once the CDN serves it
+    site.add(broken_image, image_bytes(8), "image/jpeg")
+    retried = crawl("Flaky Media Persona", [POST_URL, PROFILE_URL])
+
+    assert retried["media_stored"] == 1
+    assert retried["media_skipped"] == 1
+    assert {asset.source_key for asset in _media("Flaky Media Persona")} == {"ok.jpg", "broken.jpg"}
+    assert _cursor("Flaky Media Persona", POST_URL) is not None
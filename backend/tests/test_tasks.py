@@ -0,0 +1,109 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from app.background.tasks import ingest_documents
+from app.database import SessionLocal
+from app.main import app
+from app.models import Content, ContentChunk, Persona, UserRole
+from app.services.auth import Principal, get_principal
+from app.services.clients import clients
+from tests.conftest import write_document
+
+
+def _chunk_count(persona_name: str) -> int:
+    db = SessionLocal()
+    try:
+        return (
+            db.query(ContentChunk).join(Content).join(Persona, Content.influencer_id == Persona.id)
+            .filter(Persona.name == persona_name).count()
+        )
+    finally:
+        db.close()
+
+
+def test_ingest_documents_embeds_chunks_and_cleans_up(fake_embeddings, upload_dir):
+    path = write_document(upload_dir, "bio.txt")
+
+    result = ingest_documents.apply_async(args=[[path], "Task Persona"])
+
+    assert result.successful(), result.traceback
+    assert result.result == {"persona_name": "Task Persona", "documents": 1}
+    chunks = _chunk_count("Task Persona")
+    assert chunks > 0
+    assert fake_embeddings.texts == chunks
+    assert clients.get_collection("Task Persona").count() == chunks
+    assert not os.path.exists(path)
+
+
+def test_ingest_documents_reports_progress(fake_embeddings, upload_dir, monkeypatch):
+    path = write_document(upload_dir, "progress.txt", words=3000)
+    states = []
+    monkeypatch.setattr(ingest_documents, "update_state", lambda **kwargs: states.append(kwargs))
+
+    ingest_documents.apply_async(args=[[path], "Progress Persona"])
+
+    assert states, "no progress was reported"
+    assert all(state["state"] == "PROGRESS" for state in states)
+    embedded = [state["meta"]["embedded_chunks"] for state in states]
+    assert embedded == sorted(embedded)
+    assert embedded[-1] == _chunk_count("Progress Persona")
+
+
+def test_ingest_documents_retries_then_fails_and_cleans_up(upload_dir, monkeypatch):
+    from app.background.document_process import rag_builder
+
+    attempts = []
+
+    def failing_ingest(*args, **kwargs):
+        attempts.append(args)
+        raise RuntimeError("embedding service unavailable")
+
+    monkeypatch.setattr(rag_builder, "extract_persona_from_docs", lambda text, name: "A test persona.")
+    monkeypatch.setattr(rag_builder, "ingest_chunks", failing_ingest)
+    path = write_document(upload_dir, "fails.txt")
+
+    result = ingest_documents.apply_async(args=[[path], "Failing Persona"])
+
+    assert result.failed()
+    assert len(attempts) == ingest_documents.max_retries + 1
+    assert not os.path.exists(path)
+
+
+def test_onboarding_upload_runs_job_and_reports_status(fake_embeddings):
+    client = TestClient(app)
+
+    response = client.post(
+        "/onboarding/",
+        data={"influencer_name": "Upload Persona"},
+        files={"documents": ("notes.txt", b"Upload persona notes. " * 200, "text/plain")},
+    )
+    assert response.status_code == 200
+    job_id = response.json()["jobs"]["documents"]
+
+    status = client.get(f"/onboarding/jobs/{job_id}").json()
+    assert status["status"] == "SUCCESS"
+    assert status["result"] == {"persona_name": "Upload Persona", "documents": 1}
+    assert _chunk_count("Upload Persona") > 0
+
+
+def test_job_status_is_only_visible_to_its_owner(fake_embeddings):
+    client = TestClient(app)
+    response = client.post(
+        "/onboarding/",
+        data={"influencer_name": "Private Persona"},
+        files={"documents": ("private.txt", b"Private persona notes. " * 50, "text/plain")},
+    )
+    job_id = response.json()["jobs"]["documents"]
+
+    try:
+        app.dependency_overrides[get_principal] = lambda: Principal(user_id=2)
+        assert client.get(f"/onboarding/jobs/{job_id}").status_code == 404
+        app.dependency_overrides[get_principal] = lambda: Principal(user_id=2, role=UserRole.ADMIN)
+        assert client.get(f"/onboarding/jobs/{job_id}").json()["status"] == "SUCCESS"
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_unknown_job_is_not_found():
+    assert TestClient(app).get("/onboarding/jobs/no-such-job").status_code == 404
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from app.services import tokens
+
+
+def test_failed_tokenizer_load_is_retried(monkeypatch):
+    monkeypatch.setattr(tokens, "_encodings", {})
+    monkeypatch.setattr(tokens, "_encoding_failures", {})
+    loads = []
+
+    def encoding_for_model(model):
+        loads.append(model)
+        if len(loads) == 1:
+            raise ConnectionError("tokenizer download failed")
+        return SimpleNamespace(encode=lambda text, disallowed_special=(): text.split())
+
+    monkeypatch.setattr(tokens.tiktoken, "encoding_for_model", encoding_for_model)
+
+    assert tokens.count_tokens("one two three four five six seven eight", "test-model") == 10  # estimated
+    assert tokens.count_tokens("one two", "test-model") == 2  # still within the retry window
+    assert len(loads) == 1
+
+    tokens._encoding_failures["test-model"] = 0.0  # the retry window has passed
+    assert tokens.count_tokens("one two three", "test-model") == 3
+    assert tokens.count_tokens("one two three four", "test-model") == 4
+    assert len(loads) == 2  # the loaded tokenizer is cached
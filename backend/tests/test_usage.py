@@ -0,0 +1,52 @@
+from app.database import SessionLocal
+from app.models import Usage
+from app.services.usage import TokenUsage, UsageRecorder, bill_usage_to
+from tests.conftest import ensure_user
+
+
+def _usage_rows(user_id: int) -> list[tuple[int, int, int]]:
+    db = SessionLocal()
+    try:
+        return [
+            (row.tokens_used, row.api_calls, row.cost_cents)
+            for row in db.query(Usage).filter(Usage.user_id == user_id)
+        ]
+    finally:
+        db.close()
+
+
+def test_flushes_add_to_the_days_row():
+    user_id = ensure_user(21)
+    recorder = UsageRecorder()
+
+    recorder.record(TokenUsage(model="gpt-4o", prompt_tokens=300_000, completion_tokens=50_000), user_id)
+    recorder.record(TokenUsage(model="gpt-4o", prompt_tokens=100_000), user_id)
+    assert recorder.flush() == 1
+    assert _usage_rows(user_id) == [(450_000, 2, 150)]  # 75 + 50 + 25 cents
+
+    # A later batch (or another process) adds to the same (user, day) row
+    with bill_usage_to(user_id):
+        recorder.record(TokenUsage(model="gpt-4o-mini", prompt_tokens=1_000_000))
+    assert UsageRecorder().flush() == 0  # other recorders have nothing of this
+    assert recorder.flush() == 1
+    assert _usage_rows(user_id) == [(1_450_000, 3, 165)]
+
+
+def test_fractions_of_a_cent_carry_over():
+    user_id = ensure_user(22)
+    recorder = UsageRecorder()
+
+    for _ in range(3):
+        recorder.record(TokenUsage(model="text-embedding-3-small", prompt_tokens=200_000), user_id)  # 0.4 cents
+        recorder.flush()
+
+    assert _usage_rows(user_id) == [(600_000, 3, 1)]
+
+
+def test_empty_flush_writes_nothing():
+    recorder = UsageRecorder()
+    recorder.record(TokenUsage(model="gpt-4o", prompt_tokens=10))  # no user to bill
+
+    assert recorder.flush() == 0
+    assert recorder.stats()["flushes"] == 0
+    assert recorder.stats()["unattributed_calls"] == 1